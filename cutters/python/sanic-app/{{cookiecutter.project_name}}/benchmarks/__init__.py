@@ -0,0 +1,5 @@
+"""Load and micro benchmarks for the app.
+
+Run them with 'make bench' (see scripts/bench.sh). Results are saved
+to benchmarks/results, and compared against benchmarks/baselines.
+"""
@@ -0,0 +1,89 @@
+"""Benchmark of the JSON backends on list pages.
+
+Times serializing and encoding pages of greeting-like rows with each
+installed backend (see encoding.py), against the previous approach of
+converting UUIDs and datetimes with str() and encoding with the
+standard library. Decoding the encoded page is timed too.
+
+    python -m benchmarks.encoding
+"""
+import sys
+import json
+import argparse
+from {{cookiecutter.module_name}} import utils
+from {{cookiecutter.module_name}} import encoding
+from benchmarks import results as bench_results
+from benchmarks.micro import make_flat_row, time_call
+
+METRICS = {
+    'us_per_call': False,
+}
+
+PAGE_SIZES = (20, 100, 1000)
+
+DATA_TYPES = {
+    'root': utils.ResponseDataType('greetings', 'example.com/greetings'),
+}
+
+
+def str_dumps(page: list[dict]) -> str:
+    """Encodes a serialized page the way it was before encoding.py."""
+    for item in page:
+        attributes = item['data'].get('attributes', {})
+        for key, value in attributes.items():
+            if isinstance(value, encoding.NATIVE_TYPES):
+                attributes[key] = str(value)
+    return json.dumps(page)
+
+
+def make_cases() -> dict:
+    serializer = utils.jsonapi_serializer(DATA_TYPES)
+    cases = {}
+    for size in PAGE_SIZES:
+        rows = [make_flat_row() for _ in range(size)]
+
+        def str_json(rows=rows):
+            return str_dumps(serializer.serialize_many(rows))
+
+        cases[f'dumps_page_{size}_str_json'] = str_json
+        for backend in encoding.available_backends():
+            def dumps(rows=rows, dumps=encoding.get_dumps(backend)):
+                return dumps(serializer.serialize_many(rows))
+
+            body = encoding.get_dumps(backend)(serializer.serialize_many(rows))
+
+            def loads(body=encoding.as_bytes(body),
+                      loads=encoding.get_loads(backend)):
+                return loads(body)
+
+            cases[f'dumps_page_{size}_{backend}'] = dumps
+            cases[f'loads_page_{size}_{backend}'] = loads
+    return cases
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Fraction a metric may worsen by vs baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    print(f'Installed backends: {", ".join(encoding.available_backends())} '
+          f'(app uses {encoding.BACKEND})')
+    cases = {}
+    for name, fn in make_cases().items():
+        cases[name] = {'us_per_call': time_call(fn, args.repeat)}
+        print(f'{name:<40} {cases[name]["us_per_call"]:>10.2f} us/call')
+
+    path = bench_results.save(
+        'encoding', {'cases': cases}, args.update_baseline)
+    print(f'Saved results to {path}')
+
+    regressions = bench_results.compare(
+        'encoding', cases, METRICS, args.tolerance)
+    return bench_results.report_regressions('encoding', regressions)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Benchmark of random (uuid4) vs time-ordered (uuid7) primary keys.
+
+Inserts rows into a table keyed by each kind of id, in batches, and
+reports the insert throughput (overall, and for the first and last
+tenth of the rows, to show it degrading as the index grows) and the
+size of the primary key index afterwards.
+
+The difference only really shows once the index outgrows the database's
+cache (shared_buffers, 128MB by default), so use plenty of rows.
+
+    python -m benchmarks.ids --rows 2000000
+"""
+import sys
+import time
+import asyncio
+import argparse
+import sqlalchemy as sa
+from {{cookiecutter.module_name}}.db import schema
+from {{cookiecutter.module_name}}.db import engine as dbengine
+from benchmarks import results as bench_results
+
+METRICS = {
+    'rows_per_s': True,
+    'last_tenth_rows_per_s': True,
+    'index_mb': False,
+}
+
+PAYLOAD = 'x' * 100
+
+
+def make_table(name: str, time_ordered: bool) -> sa.Table:
+    return sa.Table(
+        name,
+        sa.MetaData(),
+        *schema.standard_colums(time_ordered_ids=time_ordered),
+        sa.Column('payload', sa.String(100), nullable=False),
+    )
+
+
+async def run_case(engine, table: sa.Table, rows: int,
+                   batch_size: int) -> dict:
+    async with engine.begin() as conn:
+        await conn.run_sync(table.drop, checkfirst=True)
+        await conn.run_sync(table.create)
+
+    # Ids are made by the column default (see schema.id_column).
+    batch = [{'payload': PAYLOAD}] * batch_size
+    n_batches = max(rows // batch_size, 1)
+    tenth = max(n_batches // 10, 1)
+    durations = []
+    async with engine.connect() as conn:
+        for _ in range(n_batches):
+            started_at = time.perf_counter()
+            await conn.execute(table.insert(), batch)
+            await conn.commit()
+            durations.append(time.perf_counter() - started_at)
+
+        index_bytes = (await conn.execute(
+            sa.text('SELECT pg_relation_size(to_regclass(:index))'),
+            {'index': f'{table.name}_pkey'})).scalar()
+        table_bytes = (await conn.execute(
+            sa.text('SELECT pg_relation_size(to_regclass(:table))'),
+            {'table': table.name})).scalar()
+
+    def rate(batch_durations):
+        return len(batch_durations) * batch_size / sum(batch_durations)
+
+    return {
+        'rows': n_batches * batch_size,
+        'rows_per_s': rate(durations),
+        'first_tenth_rows_per_s': rate(durations[:tenth]),
+        'last_tenth_rows_per_s': rate(durations[-tenth:]),
+        'index_mb': index_bytes / 2**20,
+        'table_mb': table_bytes / 2**20,
+    }
+
+
+async def run(args) -> dict:
+    engine = dbengine.create_engine()
+    tables = {
+        'uuid4': make_table('bench_ids_uuid4', time_ordered=False),
+        'uuid7': make_table('bench_ids_uuid7', time_ordered=True),
+    }
+    cases = {}
+    try:
+        for name, table in tables.items():
+            cases[name] = await run_case(
+                engine, table, args.rows, args.batch_size)
+            values = cases[name]
+            print(f'{name}: {values["rows_per_s"]:>10.0f} rows/s '
+                  f'(first tenth {values["first_tenth_rows_per_s"]:.0f}, '
+                  f'last tenth {values["last_tenth_rows_per_s"]:.0f}), '
+                  f'index {values["index_mb"]:.1f} MB, '
+                  f'table {values["table_mb"]:.1f} MB')
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                for table in tables.values():
+                    await conn.run_sync(table.drop, checkfirst=True)
+        await engine.dispose()
+    return cases
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--keep', action='store_true',
+                        help="Don't drop the benchmark tables afterwards")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Fraction a metric may worsen by vs baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    cases = asyncio.run(run(args))
+
+    path = bench_results.save('ids', {'cases': cases}, args.update_baseline)
+    print(f'Saved results to {path}')
+
+    regressions = bench_results.compare('ids', cases, METRICS, args.tolerance)
+    return bench_results.report_regressions('ids', regressions)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Load test of the hello_world routes.
+
+Drives each route of a running server at a fixed concurrency, and
+reports throughput and latency percentiles. Results are saved, and
+compared against the stored baseline (see benchmarks.results).
+
+    python -m benchmarks.load --url http://localhost:8001
+
+Notes:
+    The driver is a single python process, so at high concurrency it
+    can become the bottleneck. Keep an eye on its CPU use, or run it
+    on a different machine from the server.
+"""
+import sys
+import random
+import asyncio
+import argparse
+import time
+from collections import namedtuple
+import httpx
+from benchmarks import results as bench_results
+
+# A route to benchmark. 'path' and 'body' may be functions
+# (of the seeded state), so that each request can vary.
+Case = namedtuple('Case', ['name', 'method', 'path', 'body', 'status'])
+
+SEED_GREETINGS = 2000
+SEED_BATCH_SIZE = 500
+
+METRICS = {
+    'rps': True,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+}
+
+
+def make_cases(state: dict) -> list[Case]:
+    ids = state['ids']
+    return [
+        Case('hello_world', 'GET', '/hello_world', None, 200),
+        Case('query_error', 'GET', '/hello_world/query_error', None, 400),
+        Case('internal_error', 'GET', '/hello_world/internal_error',
+             None, 500),
+        Case('list_greetings', 'GET', '/hello_world/greetings', None, 200),
+        Case('list_greetings_last_page', 'GET',
+             lambda: state['last_page'], None, 200),
+        Case('export_greetings', 'GET',
+             '/hello_world/greetings/export?limit=1000', None, 200),
+        Case('get_greeting', 'GET',
+             lambda: f'/hello_world/greetings/{random.choice(ids)}',
+             None, 200),
+        Case('new_greeting', 'POST', '/hello_world/greetings',
+             lambda: {'name': 'Bench'}, 200),
+        Case('new_greetings_batch', 'POST', '/hello_world/greetings/batch',
+             lambda: {'data': [{'name': 'Bench'}] * 100}, 200),
+    ]
+
+
+async def seed(client: httpx.AsyncClient) -> dict:
+    """Creates greetings to read back, and finds the last page."""
+    ids = []
+    for _ in range(SEED_GREETINGS // SEED_BATCH_SIZE):
+        resp = await client.post(
+            '/hello_world/greetings/batch',
+            json={'data': [{'name': 'Seed'}] * SEED_BATCH_SIZE})
+        resp.raise_for_status()
+        ids.extend(item['data']['id'] for item in resp.json()['data'])
+
+    resp = await client.get('/hello_world/greetings')
+    resp.raise_for_status()
+    links = resp.json()['links']
+    last_page = links.get('last', links['self'])
+    last_page = last_page[last_page.index('/hello_world'):]
+    return {'ids': ids, 'last_page': last_page}
+
+
+def _resolve(value):
+    return value() if callable(value) else value
+
+
+async def run_case(client: httpx.AsyncClient, case: Case,
+                   concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            path = _resolve(case.path)
+            body = _resolve(case.body)
+            start = time.perf_counter()
+            try:
+                resp = await client.request(case.method, path, json=body)
+                ok = resp.status_code == case.status
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': bench_results.percentile(latencies, 50) * 1000,
+        'p95_ms': bench_results.percentile(latencies, 95) * 1000,
+        'p99_ms': bench_results.percentile(latencies, 99) * 1000,
+    }
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency,
+                          max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits,
+                                 timeout=30) as client:
+        state = await seed(client)
+        cases = make_cases(state)
+        if args.routes:
+            cases = [case for case in cases if case.name in args.routes]
+
+        results = {}
+        for case in cases:
+            if args.warmup > 0:
+                await run_case(client, case, args.concurrency, args.warmup)
+            results[case.name] = await run_case(
+                client, case, args.concurrency, args.duration)
+            res = results[case.name]
+            print(f'{case.name:<28} {res["rps"]:>9.1f} rps  '
+                  f'p50 {res["p50_ms"]:>7.2f}ms  '
+                  f'p95 {res["p95_ms"]:>7.2f}ms  '
+                  f'p99 {res["p99_ms"]:>7.2f}ms  '
+                  f'errors {res["errors"]}')
+        return results
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', default='http://localhost:8001')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10,
+                        help='Seconds to drive each route for')
+    parser.add_argument('--warmup', type=float, default=2,
+                        help='Seconds to drive each route for before measuring')
+    parser.add_argument('--routes', nargs='*',
+                        help='Only benchmark these routes')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Fraction a metric may worsen by vs baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    cases = asyncio.run(run(args))
+    results = {
+        'config': {
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+        },
+        'cases': cases,
+    }
+    path = bench_results.save('load', results, args.update_baseline)
+    print(f'Saved results to {path}')
+
+    failed = [name for name, res in cases.items() if res['errors'] > 0]
+    if failed:
+        print(f'Routes with unexpected responses: {", ".join(failed)}',
+              file=sys.stderr)
+    regressions = bench_results.compare(
+        'load', cases, METRICS, args.tolerance)
+    return bench_results.report_regressions('load', regressions) or int(
+        bool(failed))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
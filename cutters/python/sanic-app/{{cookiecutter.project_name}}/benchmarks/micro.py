@@ -0,0 +1,128 @@
+"""Micro benchmarks of the request/response helpers in utils (and validate).
+
+Times each helper on synthetic payloads, and compares the per-call
+times against the stored baseline (see benchmarks.results).
+
+    python -m benchmarks.micro
+"""
+import sys
+import uuid
+import timeit
+import argparse
+from datetime import datetime
+from collections import namedtuple
+from {{cookiecutter.module_name}} import utils
+from {{cookiecutter.module_name}} import validate
+from benchmarks import results as bench_results
+
+METRICS = {
+    'us_per_call': False,
+}
+
+MockReq = namedtuple('MockReq', ['args'])
+
+DATA_TYPES = {
+    'root': utils.ResponseDataType('people', 'example.com/people'),
+    'town': utils.ResponseDataType('towns', 'example.com/towns'),
+    'pets': utils.ResponseDataType('pets', 'example.com/pets'),
+}
+
+
+def make_row(n_pets: int = 3) -> dict:
+    """Makes a row shaped like the examples in jsonapi_response."""
+    now = datetime.utcnow()
+    return {
+        'id': uuid.uuid4(),
+        'created_at': now,
+        'updated_at': now,
+        'name': 'Alice',
+        'age': 30,
+        'color': {'r': 10, 'g': 10, 'b': 10},
+        'town': {
+            'id': uuid.uuid4(),
+            'name': 'Funville',
+            'prefecture': 'Shinyland',
+        },
+        'pets': [
+            {'id': uuid.uuid4(), 'species': 'dog', 'age': i}
+            for i in range(n_pets)
+        ],
+    }
+
+
+def make_flat_row() -> dict:
+    """Makes a row shaped like a greeting."""
+    now = datetime.utcnow()
+    return {
+        'id': uuid.uuid4(),
+        'created_at': now,
+        'updated_at': now,
+        'name': 'Bob',
+        'message': 'Hello Bob!',
+    }
+
+
+def make_cases() -> dict:
+    nested_row = make_row()
+    nested_page = [make_row() for _ in range(20)]
+    flat_page = [make_flat_row() for _ in range(100)]
+    flat_types = {'root': DATA_TYPES['root']}
+    offset_req = MockReq({'offset': '400', 'limit': '20'})
+    cursor = utils.Cursor(datetime.utcnow(), uuid.uuid4(), False)
+    cursor_req = MockReq({'cursor': utils.encode_cursor(cursor),
+                          'limit': '20'})
+    greeting_id = str(uuid.uuid4())
+
+    return {
+        'jsonapi_response_nested': lambda: utils.jsonapi_response(
+            nested_row, DATA_TYPES),
+        'jsonapi_response_nested_page_20': lambda: [
+            utils.jsonapi_response(row, DATA_TYPES) for row in nested_page],
+        'jsonapi_serialize_many_flat_page_100': lambda: utils.jsonapi_serializer(
+            flat_types).serialize_many(flat_page),
+        'get_offset_limit': lambda: utils.get_offset_limit(offset_req),
+        'make_pagination_links': lambda: utils.make_pagination_links(
+            'example.com/people', 400, 20, count=1000),
+        'parse_cursor': lambda: utils.parse_cursor(cursor_req.args['cursor']),
+        'validate_uuid': lambda: validate.validate_uuid(greeting_id),
+        'make_cursor_pagination_links': lambda: utils.make_cursor_pagination_links(
+            'example.com/people', flat_page[:20], 20, cursor, True),
+    }
+
+
+def time_call(fn, repeat: int) -> float:
+    """Best time per call of fn, in microseconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1e6
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cases', nargs='*',
+                        help='Only benchmark these cases')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Fraction a metric may worsen by vs baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    cases = {}
+    for name, fn in make_cases().items():
+        if args.cases and name not in args.cases:
+            continue
+        cases[name] = {'us_per_call': time_call(fn, args.repeat)}
+        print(f'{name:<40} {cases[name]["us_per_call"]:>10.2f} us/call')
+
+    path = bench_results.save(
+        'micro', {'cases': cases}, args.update_baseline)
+    print(f'Saved results to {path}')
+
+    regressions = bench_results.compare(
+        'micro', cases, METRICS, args.tolerance)
+    return bench_results.report_regressions('micro', regressions)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Saving benchmark results and comparing them against baselines."""
+import os
+import sys
+import json
+import time
+import platform
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINES_DIR = os.path.join(BENCH_DIR, 'baselines')
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if len(sorted_values) == 0:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def save(name: str, results: dict, update_baseline: bool = False) -> str:
+    """Saves results (as <name>-<timestamp>.json), and optionally
+    as the new baseline for name.
+
+    Returns:
+        The path of the saved results.
+    """
+    results = {
+        'meta': {
+            'name': name,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        **results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(
+        RESULTS_DIR, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}.json')
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if update_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        with open(os.path.join(BASELINES_DIR, f'{name}.json'), 'w') as f:
+            json.dump(results, f, indent=2)
+    return path
+
+
+def load_baseline(name: str) -> dict:
+    path = os.path.join(BASELINES_DIR, f'{name}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(name: str, results: dict, metrics: dict[str, bool],
+            tolerance: float) -> list[str]:
+    """Compares results against the stored baseline.
+
+    Args:
+        name:
+            The benchmark name (e.g. 'load').
+        results:
+            The 'cases' of the results, as {case: {metric: value}}.
+        metrics:
+            The metrics to compare, mapped to whether higher is better.
+        tolerance:
+            The fraction a metric may worsen by before it counts as
+            a regression.
+
+    Returns:
+        A description of each regression.
+    """
+    baseline = load_baseline(name)
+    if baseline is None:
+        print(f'No {name} baseline stored; skipping comparison. '
+              'Run with --update-baseline to store one.', file=sys.stderr)
+        return []
+
+    regressions = []
+    for case, values in results.items():
+        base_values = baseline['cases'].get(case)
+        if base_values is None:
+            continue
+        for metric, higher_is_better in metrics.items():
+            value = values.get(metric)
+            base = base_values.get(metric)
+            if not value or not base:
+                continue
+            if higher_is_better:
+                regressed = value < base * (1 - tolerance)
+            else:
+                regressed = value > base * (1 + tolerance)
+            if regressed:
+                change = (value - base) / base * 100
+                regressions.append(
+                    f'{case}: {metric} {value:.2f} vs baseline '
+                    f'{base:.2f} ({change:+.1f}%)')
+    return regressions
+
+
+def report_regressions(name: str, regressions: list[str]) -> int:
+    """Prints regressions loudly.
+
+    Returns:
+        An exit code (1 if there were regressions).
+    """
+    if not regressions:
+        print(f'No {name} regressions against baseline.')
+        return 0
+    print(f'\n!!! {len(regressions)} {name} REGRESSION(S) !!!',
+          file=sys.stderr)
+    for regression in regressions:
+        print(f'  {regression}', file=sys.stderr)
+    return 1
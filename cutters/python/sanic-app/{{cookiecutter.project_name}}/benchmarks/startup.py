@@ -0,0 +1,96 @@
+"""Benchmark of worker startup time.
+
+Times importing the app (which registers the routes, and documents
+them) in fresh interpreters, as each worker does when it starts, with
+the API docs on and off (see DOCS in env.py). The app's dependencies
+(sanic, SQLAlchemy etc.) are imported first, and timed on their own,
+as they take most of the time but vary a lot between runs. Building the
+spec, on the first request for it, is timed too.
+
+    python -m benchmarks.startup
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from benchmarks import results as bench_results
+
+METRICS = {
+    'ms': False,
+}
+
+DEPENDENCIES = ['sanic', 'sqlalchemy.ext.asyncio', 'asyncpg']
+
+TIME_IMPORT = """
+import time
+import importlib
+started = time.perf_counter()
+for module in {dependencies!r}:
+    importlib.import_module(module)
+imported = time.perf_counter()
+importlib.import_module('{{cookiecutter.module_name}}.app')
+print(imported - started, time.perf_counter() - imported)
+"""
+
+TIME_SPEC = """
+import time
+from types import SimpleNamespace
+from {{cookiecutter.module_name}}.app import app
+# As when the server starts.
+app.router.finalize()
+route = app.router.routes_all[('swagger', 'swagger.json')]
+request = SimpleNamespace(app=app, headers=dict())
+started = time.perf_counter()
+route.handler(request)
+print(time.perf_counter() - started)
+"""
+
+
+def time_script(script: str, repeat: int, **env) -> list[float]:
+    """Runs a script printing times (in s) in fresh interpreters, and
+    gives the median of each time (in ms).
+    """
+    env = {**os.environ, **env}
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', script], env=env, check=True,
+            capture_output=True, text=True).stdout
+        runs.append([float(t) * 1000 for t in out.split()])
+    return [statistics.median(times) for times in zip(*runs)]
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=11)
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Fraction a metric may worsen by vs baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    script = TIME_IMPORT.format(dependencies=DEPENDENCIES)
+    dependencies, with_docs = time_script(script, args.repeat, DOCS='true')
+    _, without_docs = time_script(script, args.repeat, DOCS='false')
+    first_spec, = time_script(TIME_SPEC, args.repeat, DOCS='true')
+    cases = {
+        'import_dependencies': dependencies,
+        'import_app_docs': with_docs,
+        'import_app_no_docs': without_docs,
+        'first_spec_request': first_spec,
+    }
+    cases = {name: {'ms': ms} for name, ms in cases.items()}
+    for name, case in cases.items():
+        print(f'{name:<40} {case["ms"]:>10.1f} ms')
+
+    path = bench_results.save(
+        'startup', {'cases': cases}, args.update_baseline)
+    print(f'Saved results to {path}')
+
+    regressions = bench_results.compare(
+        'startup', cases, METRICS, args.tolerance)
+    return bench_results.report_regressions('startup', regressions)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Micro benchmark of the per-call cost of repository statements.
+
+Times what SQLAlchemy does for each statement a repository function
+executes, before anything is sent to the database: building the
+statement, and finding its compiled form in the compiled cache (which
+needs the statement's cache key). Statements built on every call (as
+the repositories used to) are compared with the prebuilt ones in
+db.repositories.greetings.
+
+    python -m benchmarks.statements
+"""
+import sys
+import uuid
+import argparse
+from datetime import datetime
+import sqlalchemy as sa
+from sqlalchemy.util import LRUCache
+from sqlalchemy.dialects.postgresql import asyncpg
+from {{cookiecutter.module_name}}.db import env as dbenv
+from {{cookiecutter.module_name}}.db import schema
+from {{cookiecutter.module_name}}.db.repositories import greetings as greet_repo
+from {{cookiecutter.module_name}}.db.repositories.pagination import (
+    keyset_statement,
+    keyset_shape,
+    keyset_params)
+from {{cookiecutter.module_name}}.utils import Cursor
+from benchmarks import results as bench_results
+from benchmarks.micro import time_call
+
+METRICS = {
+    'us_per_call': False,
+}
+
+CURSOR = Cursor(datetime.utcnow(), uuid.uuid4(), False)
+ID = str(uuid.uuid4())
+COLUMNS = ('id', 'created_at', 'updated_at', 'name')
+
+
+def built_get_greeting():
+    stmt = schema.greetings.select()
+    stmt = stmt.where(schema.greetings.c.id == ID)
+    return stmt.limit(1), {}
+
+
+def prebuilt_get_greeting():
+    return greet_repo._GET_GREETING, {'id': ID}
+
+
+def built_page():
+    stmt = sa.select(*[schema.greetings.c[name] for name in COLUMNS])
+    backwards, from_key = keyset_shape(CURSOR)
+    stmt = keyset_statement(
+        stmt, schema.greetings, backwards, from_key, limit=True)
+    return stmt.params(keyset_params(CURSOR, 21)), {}
+
+
+def prebuilt_page():
+    stmt = greet_repo._keyset_statement(COLUMNS, *keyset_shape(CURSOR), True)
+    return stmt, keyset_params(CURSOR, 21)
+
+
+def built_add_greeting():
+    stmt = schema.greetings.insert()
+    stmt = stmt.returning(sa.literal_column('*'))
+    return stmt, {'name': 'Bob', 'message': 'Hello Bob!'}
+
+
+def prebuilt_add_greeting():
+    return greet_repo._ADD_GREETING, {'name': 'Bob', 'message': 'Hello Bob!'}
+
+
+CASES = {
+    'get_greeting': (built_get_greeting, prebuilt_get_greeting),
+    'get_greetings_page': (built_page, prebuilt_page),
+    'add_greeting': (built_add_greeting, prebuilt_add_greeting),
+}
+
+
+def make_call(make_statement, dialect, compiled_cache):
+    """Makes a function doing what Connection.execute does with a
+    statement up to running it.
+    """
+    def call():
+        stmt, params = make_statement()
+        compiled, _, cache_hit = stmt._compile_w_cache(
+            dialect, compiled_cache=compiled_cache,
+            column_keys=sorted(params), for_executemany=False,
+            schema_translate_map=None)
+        return compiled.construct_params(params)
+    return call
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Fraction a metric may worsen by vs baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    dialect = asyncpg.dialect()
+    compiled_cache = LRUCache(dbenv.DB_COMPILED_CACHE_SIZE)
+    cases = {}
+    for name, (built, prebuilt) in CASES.items():
+        for variant, make_statement in [('built', built),
+                                        ('prebuilt', prebuilt)]:
+            case = f'{name}_{variant}'
+            cases[case] = {'us_per_call': time_call(
+                make_call(make_statement, dialect, compiled_cache),
+                args.repeat)}
+            print(f'{case:<40} {cases[case]["us_per_call"]:>10.2f} us/call')
+
+    path = bench_results.save(
+        'statements', {'cases': cases}, args.update_baseline)
+    print(f'Saved results to {path}')
+
+    regressions = bench_results.compare(
+        'statements', cases, METRICS, args.tolerance)
+    return bench_results.report_regressions('statements', regressions)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,33 @@
+#!/bin/bash
+# Runs the load, micro, encoding and statement benchmarks (see benchmarks/).
+# Pass --update-baseline to store the results as the new baselines.
+BENCH_WORKERS=${BENCH_WORKERS:-$(nproc)}
+BENCH_PORT=${BENCH_PORT:-8001}
+BENCH_CONCURRENCY=${BENCH_CONCURRENCY:-32}
+BENCH_DURATION=${BENCH_DURATION:-10}
+
+# Benchmark the production start mode.
+PYTHON_ENV=production \
+    PORT=${BENCH_PORT} \
+    WORKERS=${BENCH_WORKERS} \
+    ACCESS_LOG=false \
+    ./scripts/start.sh &
+SERVER_PID=$!
+trap "kill ${SERVER_PID}" EXIT
+
+echo "Waiting for server on port ${BENCH_PORT}..."
+until curl -s -o /dev/null http://localhost:${BENCH_PORT}/hello_world; do
+    sleep 1
+done
+
+STATUS=0
+poetry run python -m benchmarks.load \
+    --url http://localhost:${BENCH_PORT} \
+    --concurrency ${BENCH_CONCURRENCY} \
+    --duration ${BENCH_DURATION} \
+    "$@" || STATUS=1
+poetry run python -m benchmarks.micro "$@" || STATUS=1
+poetry run python -m benchmarks.encoding "$@" || STATUS=1
+poetry run python -m benchmarks.statements "$@" || STATUS=1
+poetry run python -m benchmarks.startup "$@" || STATUS=1
+exit ${STATUS}
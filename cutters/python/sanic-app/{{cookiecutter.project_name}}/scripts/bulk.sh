@@ -0,0 +1,3 @@
+#!/bin/bash
+# Bulk load/export tables, e.g. ./scripts/bulk.sh load greetings greetings.csv
+poetry run python -m {{cookiecutter.module_name}}.db.bulk "$@"
\ No newline at end of file
@@ -0,0 +1,8 @@
+#!/bin/bash
+# Lets read replicas (see start-replica.sh) stream from the primary.
+# Run by the postgres image when it first initializes the database.
+set -e
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-EOSQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD '$REPLICATION_PASSWORD';
+EOSQL
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"
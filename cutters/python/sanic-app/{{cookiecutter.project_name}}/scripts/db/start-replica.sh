@@ -0,0 +1,15 @@
+#!/bin/bash
+# Starts a streaming read replica of the primary (PRIMARY_HOST). On first
+# start its data directory is cloned from the primary. The replication
+# password is given by PGPASSWORD (which the replica also streams with).
+set -e
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_basebackup --host=${PRIMARY_HOST:-db} --username=replicator \
+            --pgdata="$PGDATA" --wal-method=stream --write-recovery-conf; do
+        echo "Waiting for the primary..."
+        rm -rf "$PGDATA"/*
+        sleep 1
+    done
+    chmod 0700 "$PGDATA"
+fi
+exec postgres
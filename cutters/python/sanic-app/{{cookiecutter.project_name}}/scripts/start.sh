@@ -1,2 +1,15 @@
 #!/bin/bash
-poetry run python {{cookiecutter.module_name}}/app.py
\ No newline at end of file
+# Starts the server. Settings (workers, timeouts, ...) come from the
+# environment, see {{cookiecutter.module_name}}/env.py.
+# Set SERVER=uvicorn to run the app as ASGI under uvicorn instead
+# (uvicorn needs to be installed, e.g. with 'poetry add uvicorn').
+if [ "${SERVER:-sanic}" = "uvicorn" ]; then
+    exec poetry run uvicorn {{cookiecutter.module_name}}.app:app \
+        --host ${HOST:-0.0.0.0} \
+        --port ${PORT:-8000} \
+        --workers ${WORKERS:-$(nproc)} \
+        --backlog ${BACKLOG:-100} \
+        --timeout-keep-alive ${KEEP_ALIVE_TIMEOUT:-5} \
+        --no-access-log
+fi
+exec poetry run python {{cookiecutter.module_name}}/app.py
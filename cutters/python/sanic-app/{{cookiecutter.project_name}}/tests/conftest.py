@@ -4,6 +4,8 @@ import pytest_asyncio
 from sqlalchemy.ext.asyncio import create_async_engine
 import {{cookiecutter.module_name}}.db.env as dbenv
 import {{cookiecutter.module_name}}.db.schema as dbschema
+import {{cookiecutter.module_name}}.db.repositories.greetings as greet_repo
+import {{cookiecutter.module_name}}.db.repositories.counts as counts
 from {{cookiecutter.module_name}}.app import app
 
 
@@ -31,6 +33,8 @@ async def reset_db(engine):
         async with engine.connect() as conn:
             await conn.execute(table.delete())
             await conn.commit()
+        await counts.invalidate(table)
+    await greet_repo.greeting_cache.clear()
 
 
 @pytest_asyncio.fixture(scope='module')
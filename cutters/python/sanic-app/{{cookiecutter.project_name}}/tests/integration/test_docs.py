@@ -0,0 +1,33 @@
+import pytest
+from types import SimpleNamespace
+from {{cookiecutter.module_name}} import docs
+from {{cookiecutter.module_name}}.app import app
+
+
+@pytest.mark.asyncio
+async def test_spec(rest_api):
+    """The spec is served (compressed), and documents the app's routes."""
+    _, resp = await rest_api.get(
+        '/swagger/swagger.json', headers={'accept-encoding': 'gzip'})
+    assert resp.status_code == 200
+    assert resp.headers['content-encoding'] == 'gzip'
+    assert '/hello_world/greetings' in resp.json['paths']
+
+
+@pytest.mark.asyncio
+async def test_small_responses_not_compressed(rest_api):
+    _, resp = await rest_api.get(
+        '/hello_world', headers={'accept-encoding': 'gzip'})
+    assert resp.status_code == 200
+    assert 'content-encoding' not in resp.headers
+
+
+def test_spec_built_once(mocker):
+    """The spec is built on the first request for it, then reused."""
+    add_routes = mocker.Mock()
+    spec = docs.LazySpec(add_routes)
+    request = SimpleNamespace(app=app, headers={})
+    first = spec.response(request)
+    second = spec.response(request)
+    assert first.body == second.body
+    add_routes.assert_called_once_with(app, None)
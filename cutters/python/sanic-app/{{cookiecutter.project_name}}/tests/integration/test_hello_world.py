@@ -1,4 +1,6 @@
 import pytest
+from {{cookiecutter.module_name}}.utils import Cursor, encode_cursor
+from {{cookiecutter.module_name}}.db import env as dbenv
 import {{cookiecutter.module_name}}.exceptions as expns
 import uuid
 import json
@@ -21,6 +23,18 @@ async def test_not_found(rest_api):
     assert resp_data['status'] == 404
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize('query', ['offset=0&limit=5', 'offset=5'])
+async def test_offset_page_size(rest_api, query):
+    """Offset pages keep to multiples of the page size, with the same
+    error as before the args were declared with validate.Param.
+    """
+    _, resp = await rest_api.get(f'/hello_world/greetings?{query}')
+    assert resp.status_code == 400
+    assert resp.json['errors'][0]['detail'] == \
+        'Pagination args must be a multiple of 20'
+
+
 class TestErrors:
     @pytest.mark.asyncio
     async def test_internal_error(self, rest_api, mocker):
@@ -72,7 +86,7 @@ class TestGreetings:
         body = resp.json
         assert isinstance(body['data'], list)
         assert len(body['data']) == 0
-        self_link = '/hello_world/greetings?offset=0&limit=20'
+        self_link = '/hello_world/greetings?limit=20'
         assert self_link in body['links']['self']
 
     @pytest.mark.asyncio
@@ -117,6 +131,27 @@ class TestGreetings:
         assert resp_data['attributes']['message'] == 'Hello Bob!'
         assert f'/hello_world/greetings/{new_id}' in resp.json['links']['self']
 
+    @pytest.mark.asyncio
+    async def test_get_greeting_not_modified(self, rest_api, continued_db,
+                                             db_results):
+        """Requests with a current ETag should get a 304"""
+        new_id = db_results['test_new_greeting']['id']
+        _, resp = await rest_api.get(
+            f'/hello_world/greetings/{new_id}')
+        etag = resp.headers['etag']
+        assert 'last-modified' in resp.headers
+
+        _, resp = await rest_api.get(
+            f'/hello_world/greetings/{new_id}',
+            headers={'if-none-match': etag})
+        assert resp.status_code == 304
+        assert resp.headers['etag'] == etag
+
+        _, resp = await rest_api.get(
+            f'/hello_world/greetings/{new_id}',
+            headers={'if-none-match': '"stale"'})
+        assert resp.status_code == 200
+
     @pytest.mark.asyncio
     async def test_list_created_greetings(self, rest_api,
                                           continued_db, db_results):
@@ -127,3 +162,214 @@ class TestGreetings:
         resp_data = resp.json['data']
         assert len(resp_data) == 1
         assert resp_data[0]['data']['id'] == new_id
+
+    @pytest.mark.asyncio
+    async def test_cursor_pagination(self, rest_api, continued_db):
+        """Following next/prev links should walk the listing
+        without skipping or repeating greetings.
+        """
+        for name in ['Carol', 'Dave', 'Erin']:
+            await rest_api.post(
+                '/hello_world/greetings',
+                content=json.dumps({'name': name}),
+                headers={
+                    'content_type': 'application/json',
+                }
+            )
+
+        _, resp = await rest_api.get('/hello_world/greetings?limit=2')
+        assert resp.status_code == 200
+        first_page = resp.json
+        assert len(first_page['data']) == 2
+        assert 'count' in first_page['meta']
+        assert 'prev' not in first_page['links']
+
+        next_link = first_page['links']['next']
+        _, resp = await rest_api.get(next_link[next_link.index('/hello_world'):])
+        assert resp.status_code == 200
+        second_page = resp.json
+        assert len(second_page['data']) == 2
+        assert 'next' not in second_page['links']
+
+        first_ids = [item['data']['id'] for item in first_page['data']]
+        second_ids = [item['data']['id'] for item in second_page['data']]
+        assert len(set(first_ids + second_ids)) == 4
+
+        prev_link = second_page['links']['prev']
+        _, resp = await rest_api.get(prev_link[prev_link.index('/hello_world'):])
+        prev_ids = [item['data']['id'] for item in resp.json['data']]
+        assert prev_ids == first_ids
+
+        last_link = first_page['links']['last']
+        _, resp = await rest_api.get(last_link[last_link.index('/hello_world'):])
+        last_ids = [item['data']['id'] for item in resp.json['data']]
+        assert last_ids == second_ids
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('query', [
+        'offset=-2',
+        'offset=1&limit=2',
+        'offset=2&limit=2',
+        'offset=0&cursor=' + encode_cursor(Cursor(None, None, True)),
+    ])
+    async def test_invalid_offset(self, rest_api, continued_db, query):
+        _, resp = await rest_api.get(f'/hello_world/greetings?{query}')
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, rest_api, continued_db):
+        """Malformed cursors should be rejected with a 400."""
+        _, resp = await rest_api.get('/hello_world/greetings?cursor=abc')
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_invalid_greeting_id(self, rest_api, continued_db):
+        """Ids that aren't UUIDs should be rejected with a 400."""
+        _, resp = await rest_api.get('/hello_world/greetings/abc')
+        assert resp.status_code == 400
+        assert resp.json['errors'][0]['title'] == 'Invalid URL Argument'
+
+    @pytest.mark.asyncio
+    async def test_new_greeting_without_name(self, rest_api, continued_db):
+        """Greetings without a name should be rejected with a 400."""
+        _, resp = await rest_api.post(
+            '/hello_world/greetings',
+            content=json.dumps({}),
+            headers={
+                'content_type': 'application/json',
+            }
+        )
+        assert resp.status_code == 400
+        assert resp.json['errors'][0]['detail'] == '"name" arg not set'
+
+    @pytest.mark.asyncio
+    async def test_new_greeting_respond_async(self, rest_api, continued_db,
+                                              monkeypatch):
+        """Greetings POSTed with "Prefer: respond-async" are queued, and
+        can be got from their Location once written.
+        """
+        monkeypatch.setattr(dbenv, 'DB_WRITE_BEHIND_QUEUE_SIZE', 100)
+        _, resp = await rest_api.post(
+            '/hello_world/greetings',
+            content=json.dumps({'name': 'Judy'}),
+            headers={
+                'content_type': 'application/json',
+                'prefer': 'respond-async',
+            }
+        )
+        assert resp.status_code == 202
+        assert resp.headers['preference-applied'] == 'respond-async'
+        new_id = resp.json['data']['id']
+        location = resp.headers['location']
+        assert location.endswith(f'/hello_world/greetings/{new_id}')
+
+        # The queue is drained when the (test) server stops.
+        _, resp = await rest_api.get(f'/hello_world/greetings/{new_id}')
+        assert resp.status_code == 200
+        assert resp.json['data']['attributes']['message'] == 'Hello Judy!'
+
+    @pytest.mark.asyncio
+    async def test_sparse_fieldsets(self, rest_api, continued_db):
+        """Only the asked for fields are given, and links keep asking
+        for them.
+        """
+        _, resp = await rest_api.get(
+            '/hello_world/greetings?fields[greetings]=name&limit=1')
+        assert resp.status_code == 200
+        for item in resp.json['data']:
+            assert list(item['data']['attributes']) == ['name']
+        assert resp.json['links']['self'].endswith(
+            '?limit=1&fields%5Bgreetings%5D=name')
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('query', [
+        'fields[greetings]=age',
+        'include=town',
+    ])
+    async def test_invalid_fieldsets(self, rest_api, continued_db, query):
+        _, resp = await rest_api.get(f'/hello_world/greetings?{query}')
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_export_greetings(self, rest_api, continued_db):
+        """Exporting should stream every greeting in listing order."""
+        _, resp = await rest_api.get('/hello_world/greetings?limit=100')
+        listed_ids = [item['data']['id'] for item in resp.json['data']]
+
+        _, resp = await rest_api.get('/hello_world/greetings/export')
+        assert resp.status_code == 200
+        body = resp.json
+        assert '/hello_world/greetings/export?limit=1000' in body['links']['self']
+        exported_ids = [item['data']['id'] for item in body['data']]
+        assert exported_ids == listed_ids
+
+    @pytest.mark.asyncio
+    async def test_new_greetings_batch(self, rest_api, continued_db):
+        """It should be possible to POST many greetings at once"""
+        names = ['Frank', 'Grace', 'Heidi']
+        body = {'data': [{'name': name} for name in names]}
+        _, resp = await rest_api.post(
+            '/hello_world/greetings/batch',
+            content=json.dumps(body),
+            headers={
+                'content_type': 'application/json',
+            }
+        )
+        assert resp.status_code == 200
+        resp_data = resp.json['data']
+        assert len(resp_data) == len(names)
+        for name, item in zip(names, resp_data):
+            assert item['data']['type'] == 'greetings'
+            assert item['data']['attributes']['name'] == name
+            assert item['data']['attributes']['message'] == f'Hello {name}!'
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('body', [
+        {'data': {'name': 'Ivan'}},
+        {'data': [{'name': 'Ivan'}, {}]},
+        {'data': [{'name': 'Ivan'}] * 1001},
+    ])
+    async def test_invalid_greetings_batch(self, rest_api, continued_db, body):
+        """Malformed or oversized batches should be rejected with a 400"""
+        _, resp = await rest_api.post(
+            '/hello_world/greetings/batch',
+            content=json.dumps(body),
+            headers={
+                'content_type': 'application/json',
+            }
+        )
+        assert resp.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_list_greetings_not_modified(self, rest_api, continued_db):
+        """Listing requests with a current ETag should get a 304,
+        until the page changes.
+        """
+        _, resp = await rest_api.get('/hello_world/greetings')
+        etag = resp.headers['etag']
+
+        _, resp = await rest_api.get(
+            '/hello_world/greetings', headers={'if-none-match': etag})
+        assert resp.status_code == 304
+
+        await rest_api.post(
+            '/hello_world/greetings',
+            content=json.dumps({'name': 'Zoe'}),
+            headers={
+                'content_type': 'application/json',
+            }
+        )
+        _, resp = await rest_api.get(
+            '/hello_world/greetings', headers={'if-none-match': etag})
+        assert resp.status_code == 200
+        assert resp.headers['etag'] != etag
+
+    @pytest.mark.asyncio
+    async def test_offset_page_not_modified(self, rest_api, continued_db):
+        """Offset pages get 304s too, with the same ETag as their 200."""
+        url = '/hello_world/greetings?offset=0&limit=20'
+        _, resp = await rest_api.get(url)
+        etag = resp.headers['etag']
+        _, resp = await rest_api.get(url, headers={'if-none-match': etag})
+        assert resp.status_code == 304
+        assert resp.headers['etag'] == etag
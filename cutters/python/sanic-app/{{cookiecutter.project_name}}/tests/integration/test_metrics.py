@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_metrics(rest_api):
+    """Requests are counted and timed per route."""
+    await rest_api.get('/hello_world')
+    _, resp = await rest_api.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('text/plain')
+    assert (
+        'http_requests_total{method="GET",route="/hello_world",status="200"}'
+        in resp.text)
+    assert (
+        'http_request_duration_seconds_count'
+        '{method="GET",route="/hello_world"}'
+        in resp.text)
+    assert 'db_pool_connections{state="checked_out"} 0' in resp.text
+    assert 'cache_entries{cache="greetings"}' in resp.text
+
+
+@pytest.mark.asyncio
+async def test_server_timing(rest_api):
+    """Responses report the time spent in the database."""
+    _, resp = await rest_api.get('/hello_world')
+    assert resp.headers['server-timing'] == 'db;dur=0.0;desc="0 queries"'
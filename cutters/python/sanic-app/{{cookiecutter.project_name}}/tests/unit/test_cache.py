@@ -0,0 +1,78 @@
+import pytest
+from {{cookiecutter.module_name}}.cache import CacheBackend, LRUCache
+
+
+class MockClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    """Tests for LRUCache."""
+
+    @pytest.mark.asyncio
+    async def test_hits_and_misses(self):
+        """Cached values are returned, and lookups counted."""
+        cache = LRUCache(max_entries=2)
+        assert await cache.get('a') is None
+        await cache.set('a', 1)
+        assert await cache.get('a') == 1
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self):
+        """Adding beyond max_entries evicts the least recently used key."""
+        cache = LRUCache(max_entries=2)
+        await cache.set('a', 1)
+        await cache.set('b', 2)
+        await cache.get('a')
+        await cache.set('c', 3)
+        assert await cache.get('b') is None
+        assert await cache.get('a') == 1
+        assert await cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    @pytest.mark.asyncio
+    async def test_expires_after_ttl(self):
+        """Values are not returned once their TTL has passed."""
+        clock = MockClock()
+        cache = LRUCache(max_entries=2, ttl=10, clock=clock)
+        await cache.set('a', 1)
+        clock.now = 9
+        assert await cache.get('a') == 1
+        clock.now = 10
+        assert await cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+        assert cache.stats()['entries'] == 0
+
+    @pytest.mark.asyncio
+    async def test_delete_and_clear(self):
+        """Deleted and cleared keys are no longer cached."""
+        cache = LRUCache(max_entries=3)
+        await cache.set('a', 1)
+        await cache.set('b', 2)
+        await cache.delete('a')
+        assert await cache.get('a') is None
+        await cache.clear()
+        assert await cache.get('b') is None
+
+
+def test_incomplete_backend():
+    """Backends missing a method fail when made, not when used."""
+    class NoClear(CacheBackend):
+        async def get(self, key):
+            pass
+
+        async def set(self, key, value):
+            pass
+
+        async def delete(self, key):
+            pass
+
+    with pytest.raises(TypeError):
+        NoClear()
@@ -0,0 +1,139 @@
+import gzip
+import pytest
+from types import SimpleNamespace
+from sanic.response import HTTPResponse, json
+from {{cookiecutter.module_name}} import compression
+from {{cookiecutter.module_name}} import env
+from {{cookiecutter.module_name}} import utils
+
+
+def make_request(accept_encoding='gzip', method='GET'):
+    return SimpleNamespace(
+        method=method, headers={'accept-encoding': accept_encoding})
+
+
+def make_body(n_items=100) -> dict:
+    return {'data': [
+        {'type': 'greetings', 'attributes': {'name': 'Bob'}}
+        for _ in range(n_items)
+    ]}
+
+
+class TestChooseEncoding:
+    @pytest.mark.parametrize('accept_encoding, expected', [
+        ('', None),
+        ('identity', None),
+        ('gzip', 'gzip'),
+        ('GZIP', 'gzip'),
+        ('deflate, gzip;q=0.5', 'gzip'),
+        ('gzip;q=0', None),
+        ('*', 'br'),
+        ('*;q=0', None),
+        ('br;q=0.5, gzip', 'gzip'),
+        ('br, gzip', 'br'),
+        ('gzip, br', 'br'),
+        ('gzip;q=nope', None),
+    ])
+    def test_choose_encoding(self, accept_encoding, expected):
+        encodings = ['br', 'gzip']
+        assert compression.choose_encoding(
+            accept_encoding, encodings) == expected
+
+    def test_without_brotli(self):
+        assert compression.choose_encoding('br', ['gzip']) is None
+
+
+@pytest.mark.parametrize('content_type, expected', [
+    ('application/json', True),
+    ('application/vnd.api+json', True),
+    ('text/html; charset=utf-8', True),
+    ('image/png', False),
+    (None, False),
+])
+def test_is_compressible(content_type, expected):
+    assert compression.is_compressible(content_type) == expected
+
+
+class TestCompressResponse:
+    @pytest.mark.asyncio
+    async def test_compresses(self):
+        response = json(make_body(), headers={'ETag': '"abc"'})
+        body = response.body
+        await compression.compress_response(make_request(), response)
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.headers['vary'] == 'Accept-Encoding'
+        assert response.headers['etag'] == 'W/"abc"'
+        assert gzip.decompress(response.body) == body
+        assert len(response.body) < len(body) / 5
+
+    @pytest.mark.asyncio
+    async def test_app_etags_kept(self):
+        """The app's (weak) ETags are the same compressed or not, so
+        they match those of 304s.
+        """
+        etag = utils.make_etag('id', 'updated_at')
+        response = json(make_body(), headers={'ETag': etag})
+        await compression.compress_response(make_request(), response)
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.headers['etag'] == etag
+
+    @pytest.mark.asyncio
+    async def test_offloads_large_bodies(self, monkeypatch):
+        monkeypatch.setattr(env, 'COMPRESS_OFFLOAD_SIZE', 100)
+        response = json(make_body())
+        body = response.body
+        await compression.compress_response(make_request(), response)
+        assert gzip.decompress(response.body) == body
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('request_, response', [
+        # Not accepted.
+        (make_request(''), json(make_body())),
+        # Too small.
+        (make_request(), json(make_body(1))),
+        # Not text.
+        (make_request(), HTTPResponse(
+            b'0' * 10000, content_type='image/png')),
+        # No body.
+        (make_request(), HTTPResponse(status=204)),
+        (make_request(method='HEAD'), json(make_body())),
+        # Already encoded.
+        (make_request(), json(
+            make_body(), headers={'Content-Encoding': 'br'})),
+    ])
+    async def test_skips(self, request_, response):
+        """Bodies are left as is unless they're worth compressing."""
+        body = response.body
+        await compression.compress_response(request_, response)
+        assert response.body == body
+        assert response.headers.get('content-encoding') in (None, 'br')
+
+    @pytest.mark.asyncio
+    async def test_skips_streams(self):
+        """Streamed responses (which have no body yet) are left as is."""
+        response = HTTPResponse(content_type='application/json')
+        response.body = None
+        await compression.compress_response(make_request(), response)
+        assert 'content-encoding' not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_vary_kept(self):
+        response = json(make_body(), headers={'Vary': 'Origin'})
+        await compression.compress_response(make_request(''), response)
+        assert response.headers['vary'] == 'Origin, Accept-Encoding'
+
+
+class TestPrecompressed:
+    @pytest.mark.parametrize('accept_encoding', ['gzip', ''])
+    def test_response(self, accept_encoding):
+        body = b'{"openapi":"3.0.0"}' * 100
+        precompressed = compression.Precompressed(body, 'application/json')
+        response = precompressed.response(make_request(accept_encoding))
+        assert response.content_type == 'application/json'
+        assert response.headers['vary'] == 'Accept-Encoding'
+        if accept_encoding:
+            assert response.headers['content-encoding'] == 'gzip'
+            assert gzip.decompress(response.body) == body
+        else:
+            assert 'content-encoding' not in response.headers
+            assert response.body == body
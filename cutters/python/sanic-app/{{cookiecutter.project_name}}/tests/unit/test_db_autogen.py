@@ -0,0 +1,56 @@
+import pytest
+import sqlalchemy as sa
+from alembic.autogenerate import produce_migrations, render_python_code
+from alembic.migration import MigrationContext
+from {{cookiecutter.module_name}}.db import autogen
+
+
+def make_metadata(indexed=True) -> sa.MetaData:
+    metadata = sa.MetaData()
+    sa.Table(
+        'pets', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.String, index=indexed))
+    return metadata
+
+
+def autogenerate(metadata, existing=None):
+    """Autogenerates the (processed) upgrade and downgrade code going
+    from the existing metadata to metadata, against an empty database.
+    """
+    engine = sa.create_engine('sqlite://')
+    with engine.connect() as conn:
+        if existing is not None:
+            existing.create_all(conn)
+        context = MigrationContext.configure(conn)
+        script = produce_migrations(context, metadata)
+    autogen.process_revision_directives(context, None, [script])
+    return (render_python_code(script.upgrade_ops),
+            render_python_code(script.downgrade_ops))
+
+
+def test_new_table():
+    """Indexes of new tables are created after them, and dropped before
+    them, in the migration's transaction.
+    """
+    upgrade, downgrade = autogenerate(make_metadata())
+    assert 'autocommit_block' not in upgrade + downgrade
+    assert 'postgresql_concurrently' not in upgrade + downgrade
+    assert upgrade.index('op.create_table') < \
+        upgrade.index('op.create_index')
+    assert downgrade.index('op.drop_index') < \
+        downgrade.index('op.drop_table')
+
+
+@pytest.mark.parametrize('existing, indexed', [
+    (make_metadata(indexed=False), True),
+    (make_metadata(indexed=True), False),
+])
+def test_existing_table(existing, indexed):
+    """Index ops on existing tables are run concurrently, outside of
+    the migration's transaction.
+    """
+    upgrade, downgrade = autogenerate(make_metadata(indexed), existing)
+    for code in upgrade, downgrade:
+        assert 'with op.get_context().autocommit_block():' in code
+        assert 'postgresql_concurrently=True' in code
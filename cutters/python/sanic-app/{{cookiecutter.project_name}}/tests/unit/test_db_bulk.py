@@ -0,0 +1,45 @@
+import uuid
+import pytest
+from datetime import datetime
+from {{cookiecutter.module_name}}.db import bulk, schema
+
+
+class TestPrepareRecords:
+    """Tests for prepare_records."""
+
+    def test_fills_standard_columns(self):
+        """Standard columns should be generated client-side when
+        missing from a record.
+        """
+        rows = bulk.prepare_records(
+            schema.greetings, [{'name': 'Bob', 'message': 'Hello Bob!'}])
+        columns = [column.name for column in schema.greetings.columns]
+        row = dict(zip(columns, rows[0]))
+        assert isinstance(row['id'], uuid.UUID)
+        assert isinstance(row['created_at'], datetime)
+        assert row['created_at'] == row['updated_at']
+        assert row['name'] == 'Bob'
+
+    def test_converts_text_values(self):
+        """Text values (as read from CSV) should be converted to the
+        column types, and empty values treated as missing.
+        """
+        id = uuid.uuid4()
+        record = {
+            'id': str(id),
+            'created_at': '2022-07-27T03:34:04.780150',
+            'updated_at': '',
+            'name': 'Bob',
+            'message': 'Hello Bob!',
+        }
+        rows = bulk.prepare_records(schema.greetings, [record])
+        columns = [column.name for column in schema.greetings.columns]
+        row = dict(zip(columns, rows[0]))
+        assert row['id'] == id
+        assert row['created_at'] == datetime(2022, 7, 27, 3, 34, 4, 780150)
+        assert isinstance(row['updated_at'], datetime)
+
+    def test_unknown_table(self):
+        """Only tables in the schema can be loaded."""
+        with pytest.raises(ValueError):
+            bulk.get_table('not_a_table')
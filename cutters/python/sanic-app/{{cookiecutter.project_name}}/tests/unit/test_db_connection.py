@@ -0,0 +1,150 @@
+import pytest
+import sqlalchemy as sa
+from types import SimpleNamespace
+from {{cookiecutter.module_name}}.db import connection
+from {{cookiecutter.module_name}}.db import replicas
+
+
+class MockConnection:
+    def __init__(self):
+        self.calls = []
+        self.transaction = False
+
+    async def start(self):
+        self.calls.append('start')
+
+    def in_transaction(self):
+        return self.transaction
+
+    async def begin(self):
+        self.calls.append('begin')
+        self.transaction = True
+
+    async def commit(self):
+        self.calls.append('commit')
+
+    async def rollback(self):
+        self.calls.append('rollback')
+
+    async def close(self):
+        self.calls.append('close')
+
+
+def make_request(conn):
+    engine = SimpleNamespace(connect=lambda: conn)
+    app = SimpleNamespace(ctx=SimpleNamespace(db=engine))
+    request = SimpleNamespace(app=app, ctx=SimpleNamespace())
+    connection.init_connection(request)
+    return request
+
+
+class TestRequestConnection:
+    @pytest.mark.asyncio
+    async def test_checked_out_once(self):
+        """Repeated calls within a request share one connection."""
+        conn = MockConnection()
+        request = make_request(conn)
+        assert await connection.get_connection(request) is conn
+        assert await connection.get_connection(request) is conn
+        assert conn.calls == ['start']
+
+    @pytest.mark.asyncio
+    async def test_not_checked_out_if_unused(self):
+        """Releasing a request that never used the DB is a no-op."""
+        conn = MockConnection()
+        request = make_request(conn)
+        await connection.release_connection(request)
+        assert conn.calls == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('status, outcome', [
+        (200, 'commit'),
+        (500, 'rollback'),
+    ])
+    async def test_transaction_outcome(self, status, outcome):
+        """Open transactions are committed on success, rolled back on
+        errors, and the connection is always released.
+        """
+        conn = MockConnection()
+        request = make_request(conn)
+        await connection.get_connection(request, transaction=True)
+        await connection.release_connection(
+            request, SimpleNamespace(status=status))
+        assert conn.calls == ['start', 'begin', outcome, 'close']
+        assert request.ctx.conn is None
+
+
+class TestRequestLoaders:
+    table = sa.Table('things', sa.MetaData(),
+                     sa.Column('id', sa.Integer, primary_key=True))
+
+    @pytest.mark.asyncio
+    async def test_loader_per_table(self):
+        """A request reuses its loader for a table, until released."""
+        conn = MockConnection()
+        request = make_request(conn)
+        loader = await connection.get_loader(request, self.table)
+        assert await connection.get_loader(request, self.table) is loader
+        assert await connection.get_loader(
+            request, self.table, many=True) is not loader
+
+        await connection.release_connection(request)
+        assert request.ctx.loaders == {}
+
+
+class FailingConnection(MockConnection):
+    async def start(self):
+        raise ConnectionRefusedError('replica down')
+
+
+def make_replica_request(primary, *replica_conns):
+    engines = [
+        SimpleNamespace(connect=lambda conn=conn: conn,
+                        url=SimpleNamespace(host=f'replica-{i}'))
+        for i, conn in enumerate(replica_conns)
+    ]
+    request = make_request(primary)
+    request.app.ctx.replicas = replicas.ReplicaSet(engines)
+    return request
+
+
+class TestReadRouting:
+    @pytest.mark.asyncio
+    async def test_reads_use_replica(self):
+        primary, replica = MockConnection(), MockConnection()
+        request = make_replica_request(primary, replica)
+        assert await connection.get_connection(
+            request, read_only=True) is replica
+        assert await connection.get_connection(request) is primary
+
+    @pytest.mark.asyncio
+    async def test_reads_own_writes(self):
+        """Once a request has used the primary, its reads stay there."""
+        primary, replica = MockConnection(), MockConnection()
+        request = make_replica_request(primary, replica)
+        await connection.get_connection(request, transaction=True)
+        assert await connection.get_connection(
+            request, read_only=True) is primary
+        assert replica.calls == []
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_primary(self):
+        """Failing replicas are marked unhealthy, and reads go to the
+        primary while no replica is healthy.
+        """
+        primary, replica = MockConnection(), FailingConnection()
+        request = make_replica_request(primary, replica)
+        assert await connection.get_connection(
+            request, read_only=True) is primary
+        assert request.app.ctx.replicas.healthy() == []
+
+    @pytest.mark.asyncio
+    async def test_releases_both(self):
+        primary, replica = MockConnection(), MockConnection()
+        request = make_replica_request(primary, replica)
+        await connection.get_connection(request, read_only=True)
+        await connection.get_connection(request, transaction=True)
+        await connection.release_connection(
+            request, SimpleNamespace(status=200))
+        assert replica.calls == ['start', 'close']
+        assert primary.calls == ['start', 'begin', 'commit', 'close']
@@ -0,0 +1,12 @@
+import importlib
+import pytest
+from {{cookiecutter.module_name}}.db import env as dbenv
+
+
+def test_unknown_count_strategy(monkeypatch):
+    """A bad DB_COUNT_STRATEGY fails at startup, not on every request."""
+    monkeypatch.setenv('DB_COUNT_STRATEGY', 'nope')
+    with pytest.raises(ValueError):
+        importlib.reload(dbenv)
+    monkeypatch.undo()
+    importlib.reload(dbenv)
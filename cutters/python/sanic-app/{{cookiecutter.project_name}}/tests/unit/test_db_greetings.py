@@ -0,0 +1,83 @@
+import uuid
+import pytest
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import asyncpg
+from {{cookiecutter.module_name}}.db import schema
+from {{cookiecutter.module_name}}.db.repositories import greetings as greet_repo
+
+
+class TestGetGreetingVersion:
+    @pytest.mark.asyncio
+    async def test_cached(self, mocker):
+        """Cached greetings' versions are used without a query."""
+        greeting = {
+            'id': uuid.uuid4(),
+            'name': 'Bob',
+            'updated_at': datetime(2022, 1, 1),
+        }
+        await greet_repo.greeting_cache.set(
+            greet_repo._cache_key(greeting['id']), greeting)
+        conn = mocker.AsyncMock()
+        try:
+            version = await greet_repo.get_greeting_version(
+                conn, str(greeting['id']))
+        finally:
+            await greet_repo.greeting_cache.clear()
+        assert version == {
+            'id': greeting['id'],
+            'updated_at': greeting['updated_at'],
+        }
+        conn.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_not_cached(self, mocker):
+        conn = mocker.AsyncMock()
+        conn.execute.return_value = mocker.Mock(
+            first=mocker.Mock(return_value=None))
+        version = await greet_repo.get_greeting_version(
+            conn, str(uuid.uuid4()))
+        assert version is None
+        conn.execute.assert_awaited_once()
+
+
+class TestAddGreetings:
+    @pytest.mark.parametrize('item', [
+        {'name': 'Bob', 'message': 'Hello Bob!'},
+        greet_repo.new_greeting('Bob', 'Hello Bob!'),
+    ])
+    def test_params_per_row(self, item):
+        stmt = greet_repo._add_greetings_statement(tuple(item), 3)
+        params = stmt.compile(dialect=asyncpg.dialect()).positiontup
+        assert greet_repo._params_per_row(item) * 3 == len(params)
+
+    @pytest.mark.parametrize('n_rows, max_rows, sizes', [
+        (0, 8, []),
+        (1, 8, [1]),
+        (7, 8, [4, 2, 1]),
+        (20, 8, [8, 8, 4]),
+        (20, 10, [8, 8, 4]),
+    ])
+    def test_batch_sizes(self, n_rows, max_rows, sizes):
+        assert list(greet_repo._batch_sizes(n_rows, max_rows)) == sizes
+
+    @pytest.mark.asyncio
+    async def test_split_by_params(self, mocker):
+        """Rows are inserted in as many statements as the parameter
+        limit needs, and returned in order.
+        """
+        items = [{'name': str(i), 'message': 'Hello'} for i in range(5)]
+        # Two rows per statement, with the made up id.
+        mocker.patch.object(greet_repo, '_MAX_PARAMS', 6)
+        conn = mocker.AsyncMock()
+        conn.execute.side_effect = [
+            mocker.Mock(all=mocker.Mock(return_value=rows))
+            for rows in (items[:2], items[2:4], items[4:])
+        ]
+        greetings = await greet_repo.add_greetings(conn, items)
+        assert greetings == items
+        assert conn.execute.await_count == 3
+        stmts = [call.args[0] for call in conn.execute.await_args_list]
+        # Same sized batches reuse the same statement.
+        assert stmts[0] is stmts[1]
+        assert conn.execute.await_args_list[2].args[1] == {
+            'name_0': '4', 'message_0': 'Hello'}
@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from {{cookiecutter.module_name}}.db.repositories.loader import (
+    DataLoader,
+    keys_query,
+    table_loader,
+    load_related,
+)
+
+
+class MockBatchLoad:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.calls.append(keys)
+        if self.fail:
+            raise ValueError('test')
+        return [f'value {key}' for key in keys]
+
+
+class MockResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class MockConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, stmt, params):
+        self.statements.append((stmt, params))
+        return MockResult([row for row in self.rows
+                           if row['parent_id'] in params['keys']])
+
+
+table = sa.Table(
+    'children', sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('parent_id', sa.Integer),
+    sa.Column('name', sa.String),
+)
+
+
+class TestDataLoader:
+    @pytest.mark.asyncio
+    async def test_batches_concurrent_loads(self):
+        """Keys asked for together are loaded in one batch, once each."""
+        batch_load = MockBatchLoad()
+        loader = DataLoader(batch_load)
+        values = await asyncio.gather(
+            loader.load(1), loader.load(2), loader.load(1))
+        assert values == ['value 1', 'value 2', 'value 1']
+        assert batch_load.calls == [[1, 2]]
+
+        # Loaded keys are cached.
+        assert await loader.load_many([2, 3]) == ['value 2', 'value 3']
+        assert batch_load.calls == [[1, 2], [3]]
+        assert loader.batches == 2
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size(self):
+        batch_load = MockBatchLoad()
+        loader = DataLoader(batch_load, max_batch_size=2)
+        await loader.load_many([1, 2, 3])
+        assert batch_load.calls == [[1, 2], [3]]
+
+    @pytest.mark.asyncio
+    async def test_errors(self):
+        """Failed loads raise for every caller, and aren't cached."""
+        batch_load = MockBatchLoad(fail=True)
+        loader = DataLoader(batch_load)
+        with pytest.raises(ValueError):
+            await loader.load_many([1, 2])
+        with pytest.raises(ValueError):
+            await loader.load(1)
+        assert batch_load.calls == [[1, 2], [1]]
+
+    @pytest.mark.asyncio
+    async def test_prime_and_clear(self):
+        batch_load = MockBatchLoad()
+        loader = DataLoader(batch_load)
+        loader.prime(1, 'primed')
+        assert await loader.load(1) == 'primed'
+        loader.clear(1)
+        assert await loader.load(1) == 'value 1'
+        assert batch_load.calls == [[1]]
+
+
+class TestTableLoader:
+    rows = [
+        {'id': 1, 'parent_id': 10, 'name': 'a'},
+        {'id': 2, 'parent_id': 10, 'name': 'b'},
+        {'id': 3, 'parent_id': 20, 'name': 'c'},
+    ]
+
+    def test_statement(self):
+        """Keys are passed as a single array parameter."""
+        stmt = keys_query(table, 'parent_id', columns=['name'])
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert sql.startswith(
+            'SELECT children.parent_id, children.name \n'
+            'FROM children \n'
+            'WHERE children.parent_id = ANY (%(keys)s')
+
+    @pytest.mark.asyncio
+    async def test_many(self):
+        """Related rows of many parents are loaded in one query."""
+        conn = MockConnection(self.rows)
+        loader = table_loader(conn, table, 'parent_id', many=True)
+        parents = [{'id': 10}, {'id': 20}, {'id': 30}, {'id': None}]
+        await load_related(loader, parents, 'id', 'children')
+        assert [[c['id'] for c in p['children']] for p in parents[:3]] == \
+            [[1, 2], [3], []]
+        assert parents[3]['children'] is None
+        assert len(conn.statements) == 1
+        assert conn.statements[0][1] == {'keys': [10, 20, 30]}
+
+    @pytest.mark.asyncio
+    async def test_single(self):
+        conn = MockConnection(self.rows)
+        loader = table_loader(conn, table, 'parent_id')
+        assert (await loader.load(20))['name'] == 'c'
+        assert await loader.load(30) is None
@@ -0,0 +1,77 @@
+import uuid
+import pytest
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import asyncpg
+from {{cookiecutter.module_name}}.db import schema
+from {{cookiecutter.module_name}}.db.repositories import greetings as greet_repo
+from {{cookiecutter.module_name}}.db.repositories import pagination
+from {{cookiecutter.module_name}}.utils import Cursor
+
+DIALECT = asyncpg.dialect()
+
+
+def compile(stmt):
+    return stmt.compile(dialect=DIALECT)
+
+
+class TestKeysetStatement:
+    @pytest.mark.parametrize('cursor, shape', [
+        (None, (False, False)),
+        (Cursor(None, None, True), (True, False)),
+        (Cursor(datetime(2022, 1, 1), uuid.uuid4(), False), (False, True)),
+        (Cursor(datetime(2022, 1, 1), uuid.uuid4(), True), (True, True)),
+    ])
+    def test_shape(self, cursor, shape):
+        assert pagination.keyset_shape(cursor) == shape
+
+    def test_binds_cursor_and_limit(self):
+        """Cursor keys and limits are bind parameters, not literals."""
+        stmt = pagination.keyset_statement(
+            schema.greetings.select(), schema.greetings,
+            backwards=True, from_key=True, limit=True)
+        assert compile(stmt).positiontup == \
+            ['cursor_created_at', 'cursor_id', 'limit']
+
+    def test_params(self):
+        cursor = Cursor(datetime(2022, 1, 1), uuid.uuid4(), False)
+        assert pagination.keyset_params(cursor, 21) == {
+            'cursor_created_at': cursor.created_at,
+            'cursor_id': cursor.id,
+            'limit': 21,
+        }
+        assert pagination.keyset_params(Cursor(None, None, True)) == {}
+
+    def test_page_same_sql_for_any_cursor(self):
+        """Pages from different cursors compile to the same SQL, with
+        the cursor values as parameters.
+        """
+        cursors = [
+            Cursor(datetime(2022, 1, i), uuid.uuid4(), False)
+            for i in range(1, 3)
+        ]
+        compiled = [
+            compile(pagination.keyset_statement(
+                schema.greetings.select(), schema.greetings,
+                *pagination.keyset_shape(cursor), limit=True))
+            for cursor in cursors
+        ]
+        assert compiled[0].string == compiled[1].string
+        params = pagination.keyset_params(cursors[1], 21)
+        assert params['cursor_id'] == cursors[1].id
+        assert params['limit'] == 21
+
+
+class TestRepositoryStatements:
+    def test_page_statements_built_once(self):
+        """Page statements are built once per shape."""
+        columns = ('id', 'created_at')
+        assert greet_repo._keyset_statement(columns, False, True, True) is \
+            greet_repo._keyset_statement(columns, False, True, True)
+        assert greet_repo._keyset_statement(columns, False, True, True) is \
+            not greet_repo._keyset_statement(None, False, True, True)
+
+    def test_no_inline_values(self):
+        """Prebuilt statements take their values as parameters."""
+        assert compile(greet_repo._GET_GREETING).positiontup[0] == 'id'
+        assert compile(greet_repo._GET_GREETINGS).positiontup == \
+            ['limit', 'offset']
@@ -0,0 +1,92 @@
+import pytest
+from types import SimpleNamespace
+from {{cookiecutter.module_name}}.db import querylog
+
+
+def make_context(server_side=False):
+    return SimpleNamespace(_is_server_side=server_side)
+
+
+class TestNormalizeSql:
+    @pytest.mark.parametrize('statement, expected', [
+        ("SELECT *\n  FROM greetings\n WHERE id = $1 LIMIT 21",
+         'SELECT * FROM greetings WHERE id = ? LIMIT ?'),
+        ("SELECT 'it''s', 1.5, t1.x::text FROM t1",
+         'SELECT ?, ?, t1.x::text FROM t1'),
+        ('INSERT INTO greetings (id, name) VALUES ($1, $2), ($3, $4), ($5, $6)',
+         'INSERT INTO greetings (id, name) VALUES (?, ?), ...'),
+        ('SELECT * FROM t WHERE a = :a AND b = %(b)s',
+         'SELECT * FROM t WHERE a = ? AND b = ?'),
+    ])
+    def test_normalize_sql(self, statement, expected):
+        assert querylog.normalize_sql(statement) == expected
+
+
+class TestParameterShape:
+    def test_positional(self):
+        assert querylog.parameter_shape(('a', 1, None)) == \
+            '(str, int, NoneType)'
+
+    def test_named(self):
+        assert querylog.parameter_shape({'id': 'a'}) == '(id: str)'
+
+    def test_executemany(self):
+        assert querylog.parameter_shape([('a', ), ('b', )], True) == \
+            '2 x (str)'
+
+
+class TestRecord:
+    def test_request_totals(self):
+        """Statements are added up for the current request."""
+        stats = querylog.start_request()
+        querylog.record(None, 'SELECT 1', (), make_context(), False, 0.002)
+        querylog.record(None, 'SELECT 1', (), make_context(), False, 0.003)
+        assert querylog.request_stats() is stats
+        assert stats.count == 2
+        assert stats.duration == pytest.approx(0.005)
+
+    def test_slow_queries_logged(self, mocker):
+        """Only statements over the threshold are logged."""
+        mocker.patch.object(querylog.dbenv, 'DB_SLOW_QUERY_MS', 100)
+        mocker.patch.object(querylog.dbenv, 'DB_EXPLAIN_SLOW_QUERIES', False)
+        log_mock = mocker.patch.object(querylog.db_logger, 'warning')
+
+        querylog.record(
+            None, 'SELECT 1', (), make_context(), False, 0.05)
+        log_mock.assert_not_called()
+
+        querylog.record(
+            None, 'SELECT * FROM t WHERE id = $1', ('a', ), make_context(),
+            False, 0.2)
+        log_mock.assert_called_once_with(
+            'Slow query (200.0 ms): SELECT * FROM t WHERE id = ? '
+            'params=(str)')
+
+    def test_slow_selects_explained(self, mocker):
+        """With EXPLAIN on, slow SELECTs get their plan logged, in a
+        savepoint.
+        """
+        mocker.patch.object(querylog.dbenv, 'DB_SLOW_QUERY_MS', 100)
+        mocker.patch.object(querylog.dbenv, 'DB_EXPLAIN_SLOW_QUERIES', True)
+        log_mock = mocker.patch.object(querylog.db_logger, 'warning')
+        cursor = mocker.MagicMock()
+        cursor.fetchall.return_value = [('Seq Scan', ), ('Buffers: 1', )]
+        conn = SimpleNamespace(
+            connection=SimpleNamespace(cursor=lambda: cursor))
+
+        querylog.record(conn, 'SELECT 1', (), make_context(), False, 0.2)
+        executed = [call.args[0] for call in cursor.execute.call_args_list]
+        assert executed == [
+            'SAVEPOINT explain_slow_query',
+            'EXPLAIN (ANALYZE, BUFFERS) SELECT 1',
+            'RELEASE SAVEPOINT explain_slow_query',
+        ]
+        log_mock.assert_called_with('Query plan:\nSeq Scan\nBuffers: 1')
+        cursor.close.assert_called_once()
+
+        # Writes and server-side cursors aren't run again.
+        cursor.reset_mock()
+        querylog.record(
+            conn, 'INSERT INTO t VALUES (1)', (), make_context(), False, 0.2)
+        querylog.record(conn, 'SELECT 1', (), make_context(True), False, 0.2)
+        cursor.execute.assert_not_called()
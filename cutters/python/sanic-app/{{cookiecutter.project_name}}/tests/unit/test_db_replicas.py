@@ -0,0 +1,80 @@
+import pytest
+from types import SimpleNamespace
+from {{cookiecutter.module_name}} import metrics
+from {{cookiecutter.module_name}}.db import replicas
+
+
+class MockConnection:
+    def __init__(self, lag):
+        self.lag = lag
+
+    async def __aenter__(self):
+        if isinstance(self.lag, Exception):
+            raise self.lag
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def execute(self, stmt):
+        return SimpleNamespace(scalar=lambda: self.lag)
+
+
+def make_engine(name, lag=0.0):
+    engine = SimpleNamespace(url=SimpleNamespace(host=name), lag=lag)
+    engine.connect = lambda: MockConnection(engine.lag)
+    return engine
+
+
+class TestReplicaSet:
+    def test_round_robin(self):
+        engines = [make_engine('a'), make_engine('b')]
+        replica_set = replicas.ReplicaSet(engines)
+        chosen = [replica_set.choose() for _ in range(4)]
+        assert chosen == engines * 2
+
+    def test_skips_unhealthy(self):
+        engines = [make_engine('a'), make_engine('b')]
+        replica_set = replicas.ReplicaSet(engines)
+        replica_set.set_healthy(engines[0], False)
+        assert [replica_set.choose() for _ in range(2)] == [engines[1]] * 2
+
+        replica_set.set_healthy(engines[1], False)
+        assert replica_set.choose() is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('lag, healthy', [
+        (0.0, True),
+        (5.0, True),
+        (30.0, False),
+        (ConnectionRefusedError('down'), False),
+    ])
+    async def test_check(self, lag, healthy):
+        """Replicas that can't be queried, or lag too far behind, are
+        unhealthy.
+        """
+        engine = make_engine('a', lag)
+        replica_set = replicas.ReplicaSet([engine], max_lag=10)
+        await replica_set.check_all()
+        assert (replica_set.healthy() == [engine]) == healthy
+
+    @pytest.mark.asyncio
+    async def test_recovers(self):
+        """Unhealthy replicas serve reads again once they pass a check."""
+        engine = make_engine('a', ConnectionRefusedError('down'))
+        replica_set = replicas.ReplicaSet([engine])
+        await replica_set.check(engine)
+        assert replica_set.choose() is None
+
+        engine.lag = 0.0
+        await replica_set.check(engine)
+        assert replica_set.choose() is engine
+
+    def test_metrics(self):
+        engines = [make_engine('a'), make_engine('b')]
+        replica_set = replicas.ReplicaSet(engines)
+        replica_set.set_healthy(engines[0], False)
+        metrics.watch_replicas(replica_set)
+        text = metrics.db_replicas.render()
+        assert 'db_replicas{state="healthy"} 1' in text
+        assert 'db_replicas{state="unhealthy"} 1' in text
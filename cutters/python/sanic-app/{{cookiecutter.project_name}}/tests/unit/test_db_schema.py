@@ -0,0 +1,60 @@
+import time
+import uuid
+import pytest
+import sqlalchemy as sa
+from {{cookiecutter.module_name}} import validate
+from {{cookiecutter.module_name}}.db import schema
+
+
+class TestStandardIndexes:
+    def test_opt_in(self):
+        """Tables get no standard indexes unless asked for."""
+        assert schema.standard_indexes() == []
+
+    def test_named_by_convention(self):
+        metadata = sa.MetaData(naming_convention=schema.metadata.naming_convention)
+        table = sa.Table(
+            'things', metadata, *schema.standard_colums(),
+            *schema.standard_indexes(pagination=True, updated_at=True))
+        indexes = {
+            index.name: [column.name for column in index.columns]
+            for index in table.indexes
+        }
+        assert indexes == {
+            'ix_things_created_at_id': ['created_at', 'id'],
+            'ix_things_updated_at': ['updated_at'],
+        }
+
+
+class TestIds:
+    def test_uuid7(self):
+        """uuid7s are valid version 7 UUIDs, starting with the time."""
+        before = int(time.time() * 1000)
+        id = schema.uuid7()
+        after = int(time.time() * 1000)
+        assert id.version == 7
+        assert id.variant == uuid.RFC_4122
+        assert before <= id.int >> 80 <= after + 1
+        validate.validate_uuid(str(id))
+
+    def test_uuid7_ordered(self):
+        """uuid7s made one after the other sort in that order."""
+        ids = [schema.uuid7() for _ in range(10000)]
+        assert sorted(ids) == ids
+        assert len(set(ids)) == len(ids)
+
+    @pytest.mark.parametrize('time_ordered, version', [
+        (False, 4),
+        (True, 7),
+    ])
+    def test_id_column(self, time_ordered, version):
+        column = schema.id_column(time_ordered=time_ordered)
+        assert column.default.arg(None).version == version
+
+    def test_new_id(self):
+        """Ids made up front come from the table's id column default."""
+        table = sa.Table(
+            'time_ordered_things', sa.MetaData(),
+            schema.id_column(time_ordered=True))
+        assert schema.new_id(table).version == 7
+        assert schema.new_id(table) != schema.new_id(table)
@@ -0,0 +1,83 @@
+import pytest
+import asyncio
+from {{cookiecutter.module_name}} import metrics
+from {{cookiecutter.module_name}}.db import writebehind
+
+
+class MockWriter:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, rows):
+        if self.fail:
+            raise ConnectionRefusedError('down')
+        self.batches.append(rows)
+
+
+def make_queue(name, writer, **kwargs):
+    kwargs.setdefault('max_size', 100)
+    kwargs.setdefault('batch_size', 3)
+    kwargs.setdefault('flush_interval', 0.01)
+    return writebehind.WriteBehindQueue(name, writer, **kwargs)
+
+
+class TestWriteBehindQueue:
+    @pytest.mark.asyncio
+    async def test_batches_by_size(self):
+        """Rows queued together are written batch_size at a time."""
+        writer = MockWriter()
+        queue = make_queue('by_size', writer)
+        for i in range(7):
+            queue.put({'i': i})
+        queue.start()
+        await queue.drain()
+        assert [len(batch) for batch in writer.batches] == [3, 3, 1]
+        assert [row['i'] for batch in writer.batches for row in batch] == \
+            list(range(7))
+
+    @pytest.mark.asyncio
+    async def test_batches_by_time(self):
+        """A batch that doesn't fill up is written after flush_interval."""
+        writer = MockWriter()
+        queue = make_queue('by_time', writer, flush_interval=0.05)
+        queue.start()
+        queue.put({'i': 0})
+        await asyncio.sleep(0.01)
+        assert writer.batches == []
+        await asyncio.sleep(0.1)
+        assert writer.batches == [[{'i': 0}]]
+        await queue.drain()
+
+    def test_full(self):
+        queue = make_queue('full', MockWriter(), max_size=2)
+        queue.put({})
+        queue.put({})
+        with pytest.raises(asyncio.QueueFull):
+            queue.put({})
+        assert queue.qsize() == 2
+
+    @pytest.mark.asyncio
+    async def test_drain(self):
+        """Draining writes the queued rows, and stops accepting more."""
+        writer = MockWriter()
+        queue = make_queue('drain', writer, flush_interval=10)
+        queue.start()
+        queue.put({'i': 0})
+        await asyncio.wait_for(queue.drain(), 1)
+        assert writer.batches == [[{'i': 0}]]
+        with pytest.raises(asyncio.QueueFull):
+            queue.put({'i': 1})
+
+    @pytest.mark.asyncio
+    async def test_failures_counted(self):
+        """Failed batches are counted (and logged), and the queue goes on."""
+        queue = make_queue('failing', MockWriter(fail=True))
+        for i in range(4):
+            queue.put({'i': i})
+        queue.start()
+        await queue.drain()
+        assert metrics.write_behind_rows.get(
+            queue='failing', outcome='failed') == 4
+        assert 'write_behind_queued{queue="failing"} 0' in \
+            metrics.write_behind_queued.render()
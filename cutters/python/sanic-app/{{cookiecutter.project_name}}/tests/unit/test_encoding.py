@@ -0,0 +1,75 @@
+import pytest
+import json
+import uuid
+from datetime import date, datetime, timezone
+from {{cookiecutter.module_name}} import encoding
+
+
+ROW = {
+    'id': uuid.UUID('0183a5b4-3c5e-7a4d-8f2e-6c1b2a3d4e5f'),
+    'created_at': datetime(2022, 7, 27, 3, 34, 4, 780150),
+    'updated_at': datetime(2022, 7, 27, 3, 34, 4, tzinfo=timezone.utc),
+    'day': date(2022, 7, 27),
+    'name': 'Bob',
+    'link': 'example.com/greetings',
+    'count': 3,
+}
+
+
+@pytest.mark.parametrize('backend', encoding.available_backends())
+class TestBackends:
+    """Tests that every backend encodes the same way."""
+
+    def test_native_types(self, backend):
+        """UUIDs and datetimes are encoded as canonical/ISO strings."""
+        encoded = encoding.get_dumps(backend)(ROW)
+        assert json.loads(encoded) == {
+            'id': '0183a5b4-3c5e-7a4d-8f2e-6c1b2a3d4e5f',
+            'created_at': '2022-07-27T03:34:04.780150',
+            'updated_at': '2022-07-27T03:34:04+00:00',
+            'day': '2022-07-27',
+            'name': 'Bob',
+            'link': 'example.com/greetings',
+            'count': 3,
+        }
+
+    def test_compact(self, backend):
+        """Output has no whitespace or escaped slashes."""
+        encoded = encoding.get_dumps(backend)({'a': [1, '/b']})
+        assert encoding.as_bytes(encoded) == b'{"a":[1,"/b"]}'
+
+    def test_non_ascii(self, backend):
+        """Non-ASCII text is left unescaped."""
+        encoded = encoding.get_dumps(backend)({'name': 'Zoë'})
+        assert encoding.as_bytes(encoded) == '{"name":"Zoë"}'.encode()
+
+    def test_non_str_keys(self, backend):
+        """Keys like the status codes in the API spec are allowed."""
+        encoded = encoding.get_dumps(backend)({200: 'OK'})
+        assert encoding.as_bytes(encoded) == b'{"200":"OK"}'
+
+    def test_unknown_types(self, backend):
+        with pytest.raises(TypeError):
+            encoding.get_dumps(backend)({'a': object()})
+
+    def test_kwargs(self, backend):
+        """Options (e.g. from sanic.response.json) are still honoured."""
+        encoded = encoding.get_dumps(backend)({'b': 1, 'a': 2},
+                                              sort_keys=True)
+        assert encoding.as_bytes(encoded) == b'{"a":2,"b":1}'
+
+    def test_loads_bytes(self, backend):
+        """Request bodies (bytes) can be decoded."""
+        assert encoding.get_loads(backend)(b'{"name":"Bob"}') == \
+            {'name': 'Bob'}
+
+
+def test_auto_backend():
+    """The fastest installed backend is picked by default."""
+    assert encoding.get_backend() == encoding.available_backends()[0]
+    assert encoding.get_backend('auto') == encoding.get_backend()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        encoding.get_backend('simplejson')
@@ -0,0 +1,76 @@
+import pytest
+from {{cookiecutter.module_name}}.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    operation,
+)
+
+
+class TestMetrics:
+    """Tests for the metric types."""
+
+    def test_counter(self):
+        """Counters add up per label set, and render sorted by labels."""
+        counter = Counter('reqs_total', 'Requests', ['route'])
+        counter.inc(route='/b')
+        counter.inc(route='/a')
+        counter.inc(2, route='/b')
+        assert counter.get(route='/b') == 3
+        assert counter.render() == '\n'.join([
+            '# HELP reqs_total Requests',
+            '# TYPE reqs_total counter',
+            'reqs_total{route="/a"} 1.0',
+            'reqs_total{route="/b"} 3.0',
+        ])
+
+    def test_missing_label(self):
+        """Every label needs a value."""
+        counter = Counter('reqs_total', 'Requests', ['route'])
+        with pytest.raises(ValueError):
+            counter.inc()
+
+    def test_label_escaping(self):
+        gauge = Gauge('g', 'Gauge', ['name'])
+        gauge.set(1, name='say "hi"\n')
+        assert 'g{name="say \\"hi\\"\\n"} 1.0' in gauge.render()
+
+    def test_gauge_function(self):
+        """Gauges can be collected from a function."""
+        gauge = Gauge('pool', 'Pool', ['state'])
+        gauge.set_function(lambda: {('in_use', ): 4})
+        assert gauge.render().endswith('pool{state="in_use"} 4.0')
+
+    def test_histogram(self):
+        """Buckets are cumulative, and always include +Inf."""
+        histogram = Histogram('t', 'Time', ['route'], buckets=[1, 0.1])
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value, route='/')
+        assert histogram.count(route='/') == 4
+        assert histogram.render().split('\n')[2:] == [
+            't_bucket{route="/",le="0.1"} 2.0',
+            't_bucket{route="/",le="1.0"} 3.0',
+            't_bucket{route="/",le="+Inf"} 4.0',
+            't_sum{route="/"} 5.65',
+            't_count{route="/"} 4.0',
+        ]
+
+    def test_registry(self):
+        """Registries render all their metrics, and refuse duplicates."""
+        registry = Registry()
+        Counter('a_total', 'A', registry=registry).inc()
+        Gauge('b', 'B', registry=registry).set(2)
+        assert registry.render() == (
+            '# HELP a_total A\n# TYPE a_total counter\na_total 1.0\n'
+            '# HELP b B\n# TYPE b gauge\nb 2.0\n')
+        with pytest.raises(ValueError):
+            Counter('a_total', 'A', registry=registry)
+
+    @pytest.mark.parametrize('statement, expected', [
+        ('SELECT 1', 'SELECT'),
+        ('\n  insert into greetings', 'INSERT'),
+        ('', ''),
+    ])
+    def test_operation(self, statement, expected):
+        assert operation(statement) == expected
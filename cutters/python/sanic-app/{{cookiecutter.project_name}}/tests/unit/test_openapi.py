@@ -0,0 +1,49 @@
+import pytest
+from sanic_openapi.openapi3 import operations
+from {{cookiecutter.module_name}} import env
+from {{cookiecutter.module_name}} import openapi as docs
+
+
+class Attributes:
+    name: str
+
+
+def make_handler():
+    @docs.openapi.summary('Get things')
+    @docs.openapi.parameter('limit', int)
+    @docs.openapi.parameter('offset', int)
+    async def handler(request):
+        pass
+    return handler
+
+
+class TestDeferredDocs:
+    def test_deferred(self):
+        """Docs are only added to the spec once applied, in order."""
+        handler = make_handler()
+        assert handler not in operations
+        docs.apply_docs()
+        operation = operations[handler]
+        assert operation.summary == 'Get things'
+        assert [p.fields['name'] for p in operation.parameters] == \
+            ['offset', 'limit']
+
+    def test_docs_off(self, monkeypatch):
+        monkeypatch.setattr(env, 'DOCS', False)
+        handler = make_handler()
+        docs.apply_docs()
+        assert handler not in operations
+
+    def test_not_a_decorator(self):
+        with pytest.raises(AttributeError):
+            docs.openapi.String
+
+
+@pytest.mark.parametrize('factory', [
+    docs.jsonapi_data,
+    docs.jsonapi_item,
+    docs.jsonapi_list,
+])
+def test_models_memoized(factory):
+    """Models are made once per attributes class."""
+    assert factory(Attributes) is factory(Attributes)
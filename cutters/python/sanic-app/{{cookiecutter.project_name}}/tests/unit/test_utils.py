@@ -1,8 +1,13 @@
 import pytest
+import uuid
+import json
+from datetime import datetime
 from collections import namedtuple
+from types import SimpleNamespace
 import {{cookiecutter.module_name}}.exceptions as expns
 
 from {{cookiecutter.module_name}} import utils
+from {{cookiecutter.module_name}} import encoding
 
 
 class TestGetOffsetLimit:
@@ -103,6 +108,254 @@ class TestMakePaginationLinks:
         assert links['first'] == 'test.com?offset=0&limit=20'
         assert links['last'] == 'test.com?offset=60&limit=20'
 
+    def test_query_kept(self):
+        """Other query args are kept in every link."""
+        links = utils.make_pagination_links(
+            'test.com', 20, page_size=20, count=64, query='fields=name')
+        for link in links.values():
+            assert link.endswith('&limit=20&fields=name')
+
+
+class TestCursors:
+    """Tests for keyset pagination cursors."""
+
+    def test_round_trip(self):
+        """Decoding an encoded cursor gives back the original."""
+        cursor = utils.Cursor(
+            datetime(2022, 7, 27, 3, 34, 4, 780150), uuid.uuid4(), False)
+        assert utils.decode_cursor(utils.encode_cursor(cursor)) == cursor
+
+    def test_end_cursor(self):
+        """Cursors without a key are valid (they point at an end)."""
+        cursor = utils.Cursor(None, None, True)
+        assert utils.decode_cursor(utils.encode_cursor(cursor)) == cursor
+
+    @pytest.mark.parametrize('token', [
+        'abc',
+        'not base64!',
+        utils.encode_cursor(utils.Cursor(None, None, True))[:-2],
+    ])
+    def test_rejects_invalid_tokens(self, token):
+        """Raises 400 error on tokens not made by encode_cursor."""
+        with pytest.raises(expns.QueryException):
+            utils.decode_cursor(token)
+
+    def test_parse_cursor_exception(self):
+        """Invalid cursor args raise the exception of their location."""
+        with pytest.raises(expns.BodyException):
+            utils.parse_cursor('abc', expns.BodyException)
+
+
+class TestMakeCursorPaginationLinks:
+    """Tests for make_cursor_pagination_links."""
+
+    items = [
+        {'id': uuid.uuid4(), 'created_at': datetime(2022, 1, 1)},
+        {'id': uuid.uuid4(), 'created_at': datetime(2022, 1, 2)},
+    ]
+
+    def test_first_page(self):
+        """First page should have no prev page, and only a next page
+        if there are more items.
+        """
+        links = utils.make_cursor_pagination_links(
+            'test.com', self.items, 2, has_more=True)
+        assert links['self'] == 'test.com?limit=2'
+        assert 'prev' not in links
+        next_cursor = utils.decode_cursor(
+            links['next'].split('cursor=')[1].split('&')[0])
+        assert next_cursor.id == self.items[-1]['id']
+        assert not next_cursor.backwards
+
+        links = utils.make_cursor_pagination_links(
+            'test.com', self.items, 2, has_more=False)
+        assert 'next' not in links
+
+    def test_backwards_page(self):
+        """Pages fetched backwards always have a next page, and only
+        a prev page if there are more items.
+        """
+        cursor = utils.Cursor(datetime(2022, 1, 3), uuid.uuid4(), True)
+        links = utils.make_cursor_pagination_links(
+            'test.com', self.items, 2, cursor, has_more=False)
+        assert 'prev' not in links
+        assert 'next' in links
+        assert utils.encode_cursor(cursor) in links['self']
+
+        links = utils.make_cursor_pagination_links(
+            'test.com', self.items, 2, cursor, has_more=True)
+        prev_cursor = utils.decode_cursor(
+            links['prev'].split('cursor=')[1].split('&')[0])
+        assert prev_cursor.id == self.items[0]['id']
+        assert prev_cursor.backwards
+
+    def test_without_ends(self):
+        links = utils.make_cursor_pagination_links(
+            'test.com', self.items, 2, has_more=True, ends=False)
+        assert 'first' not in links
+        assert 'last' not in links
+
+    def test_ends(self):
+        """The first page has no cursor, and the last page reads
+        backwards from the end of the listing.
+        """
+        links = utils.make_cursor_pagination_links(
+            'test.com', self.items, 2, has_more=True)
+        assert links['first'] == 'test.com?limit=2'
+        last_cursor = utils.decode_cursor(
+            links['last'].split('cursor=')[1].split('&')[0])
+        assert last_cursor == utils.Cursor(None, None, True)
+
+    def test_last_page(self):
+        """The last page should have no next page."""
+        cursor = utils.Cursor(None, None, True)
+        links = utils.make_cursor_pagination_links(
+            'test.com', self.items, 2, cursor, has_more=True)
+        assert 'next' not in links
+        assert 'prev' in links
+
+
+class TestFieldsets:
+    """Tests for get_fieldsets and its helpers."""
+
+    class MockReq:
+        def __init__(self, args):
+            self.args = args
+            self.ctx = SimpleNamespace()
+
+        def get_args(self, keep_blank_values=False):
+            return {key: [value] for key, value in self.args.items()}
+
+    def test_parse(self):
+        req = self.MockReq({
+            'fields[greetings]': 'name, message',
+            'include': 'town,pets.owner',
+            'limit': '20',
+        })
+        fieldsets = utils.get_fieldsets(req)
+        assert fieldsets.fields == {'greetings': {'name', 'message'}}
+        assert fieldsets.include == {('town', ), ('pets', ), ('pets', 'owner')}
+        # Parsed once per request.
+        assert utils.get_fieldsets(req) is fieldsets
+
+    def test_defaults(self):
+        fieldsets = utils.get_fieldsets(self.MockReq({}))
+        assert fieldsets == utils.Fieldsets({}, None)
+        assert utils.fieldsets_query(fieldsets) == ''
+
+    def test_blank_values(self):
+        """Blank values ask for no fields/relationships."""
+        fieldsets = utils.get_fieldsets(self.MockReq({
+            'fields[greetings]': '',
+            'include': '',
+        }))
+        assert fieldsets == utils.Fieldsets({'greetings': frozenset()},
+                                            frozenset())
+
+    @pytest.mark.parametrize('args', [
+        {'fields': 'name'},
+        {'fields[]': 'name'},
+        {'fields[greetings]': 'na me'},
+        {'include': 'town..owner'},
+    ])
+    def test_rejects_invalid_args(self, args):
+        with pytest.raises(expns.QueryException):
+            utils.get_fieldsets(self.MockReq(args))
+
+    def test_fieldset_columns(self):
+        columns = ['id', 'created_at', 'name', 'message']
+        fieldsets = utils.Fieldsets({'greetings': {'name'}}, None)
+        assert utils.fieldset_columns(
+            fieldsets, 'greetings', columns, ['id']) == ['id', 'name']
+        assert utils.fieldset_columns(fieldsets, 'other', columns) is None
+
+        fieldsets = utils.Fieldsets({'greetings': {'age'}}, None)
+        with pytest.raises(expns.QueryException):
+            utils.fieldset_columns(fieldsets, 'greetings', columns)
+
+    def test_check_include(self):
+        fieldsets = utils.Fieldsets({}, {('town', ), ('town', 'mayor')})
+        utils.check_include(fieldsets, ['town.mayor', 'town'])
+        with pytest.raises(expns.QueryException):
+            utils.check_include(fieldsets, ['town'])
+        utils.check_include(utils.Fieldsets({}, None))
+
+    def test_query(self):
+        """Fieldsets are encoded canonically, for links and ETags."""
+        fieldsets = utils.Fieldsets(
+            {'b': {'y', 'x'}, 'a': {'z'}},
+            {('town', ), ('town', 'mayor'), ('pets', )})
+        assert utils.fieldsets_query(fieldsets) == (
+            'fields%5Ba%5D=z&fields%5Bb%5D=x%2Cy&include=pets%2Ctown.mayor')
+
+    def test_links_keep_query(self):
+        links = utils.make_cursor_pagination_links(
+            'test.com', TestMakeCursorPaginationLinks.items, 2,
+            has_more=True, query='include=')
+        assert all(link.endswith('&include=') for link in links.values())
+
+    def test_item_version_variant(self):
+        item = {'id': 1, 'updated_at': datetime(2022, 1, 1)}
+        assert utils.item_version(item) == utils.item_version(item, '')
+        assert utils.item_version(item)[0] != \
+            utils.item_version(item, 'include=')[0]
+
+
+class TestConditionalRequests:
+    """Tests for ETag/Last-Modified helpers."""
+
+    MockReq = namedtuple('MockReq', ['headers'])
+    item = {
+        'id': uuid.uuid4(),
+        'updated_at': datetime(2022, 7, 27, 3, 34, 4, 780150),
+    }
+
+    def test_etag_changes_with_version(self):
+        """ETags should change when updated_at does."""
+        etag, _ = utils.item_version(self.item)
+        newer = dict(self.item, updated_at=datetime(2022, 7, 28))
+        assert utils.item_version(newer)[0] != etag
+        assert utils.item_version(dict(self.item))[0] == etag
+
+    @pytest.mark.parametrize('if_none_match, not_modified', [
+        ('{etag}', True),
+        ('{strong}', True),
+        ('"other", {etag}', True),
+        ('*', True),
+        ('"other"', False),
+    ])
+    def test_if_none_match(self, if_none_match, not_modified):
+        """Matching ETags (compared weakly) mean not modified."""
+        etag, last_modified = utils.item_version(self.item)
+        req = self.MockReq({
+            'if-none-match': if_none_match.format(
+                etag=etag, strong=etag.removeprefix('W/')),
+        })
+        assert utils.is_not_modified(
+            req, etag, last_modified) == not_modified
+
+    @pytest.mark.parametrize('if_modified_since, not_modified', [
+        ('Wed, 27 Jul 2022 03:34:04 GMT', True),
+        ('Thu, 28 Jul 2022 00:00:00 GMT', True),
+        ('Wed, 27 Jul 2022 03:34:03 GMT', False),
+        ('not a date', False),
+    ])
+    def test_if_modified_since(self, if_modified_since, not_modified):
+        """Resources modified no later than the given date are
+        not modified.
+        """
+        etag, last_modified = utils.item_version(self.item)
+        req = self.MockReq({'if-modified-since': if_modified_since})
+        assert utils.is_not_modified(
+            req, etag, last_modified) == not_modified
+
+    def test_cache_headers(self):
+        """Last-Modified should be an HTTP date."""
+        etag, last_modified = utils.item_version(self.item)
+        headers = utils.cache_headers(etag, last_modified)
+        assert headers['ETag'] == etag
+        assert headers['Last-Modified'] == 'Wed, 27 Jul 2022 03:34:04 GMT'
+
 
 class TestJsonapiResponse:
     """Tests for jsonapi_response"""
@@ -267,3 +520,232 @@ class TestJsonapiResponse:
         assert res_dict['data']['type'] == 'nested'
         assert len(res_dict['data']['attributes']) == 1
         assert res_dict['data']['attributes']['name'] == 'alice'
+
+    def test_does_not_mutate_data_types(self):
+        """The caller's data_types map should be left as it was."""
+        data_types = {
+            'root': utils.ResponseDataType('tests', '/tests'),
+            'dict': utils.ResponseDataType('nested', '/nested'),
+        }
+        original = dict(data_types)
+        data = {
+            'id': 'a',
+            'dict': {'id': 'b'},
+        }
+        utils.jsonapi_response(data, data_types)
+        assert data_types == original
+
+
+class TestJSONAPISerializer:
+    """Tests for JSONAPISerializer"""
+
+    data_types = {
+        'root': utils.ResponseDataType('tests', '/tests'),
+        'dict': utils.ResponseDataType('nested', '/nested'),
+        'list': utils.ResponseDataType('listed', '/listed'),
+    }
+
+    def test_serialize_many_matches_single(self):
+        """Transforming a batch should give the same results as
+        transforming each item on its own.
+        """
+        items = [
+            {
+                'id': i,
+                'name': f'item {i}',
+                'dict': {'id': f'd{i}', 'list': [{'id': f'l{i}'}]},
+                'list': [{'id': f'l{i}', 'dict': {'id': f'd{i}'}}],
+            }
+            for i in range(3)
+        ]
+        serializer = utils.JSONAPISerializer(self.data_types)
+        batch = serializer.serialize_many(items)
+        assert batch == [
+            utils.jsonapi_response(item, self.data_types) for item in items
+        ]
+
+    def test_nested_types_do_not_leak(self):
+        """Each item in a list relationship should keep the
+        list's type, whatever its own relationships are.
+        """
+        data = {
+            'id': 'a',
+            'list': [
+                {'id': 'b', 'dict': {'id': 'c'}},
+                {'id': 'd'},
+            ],
+        }
+        res = utils.jsonapi_response(data, self.data_types)
+        res_list = res['data']['relationships']['list']['data']
+        assert res_list[0]['data']['type'] == 'listed'
+        assert res_list[1]['data']['type'] == 'listed'
+        nested = res_list[0]['data']['relationships']['dict']
+        assert nested['data']['type'] == 'nested'
+
+
+    def test_sparse_fieldsets(self):
+        """Only the asked for fields of each type are given."""
+        data = {
+            'id': 'a',
+            'name': 'A',
+            'age': 1,
+            'dict': {'id': 'b', 'name': 'B', 'age': 2},
+        }
+        fieldsets = utils.Fieldsets({'tests': {'age', 'dict'},
+                                     'nested': {'name'}}, None)
+        res = utils.jsonapi_response(data, self.data_types, fieldsets)
+        assert res['data']['attributes'] == {'age': 1}
+        nested = res['data']['relationships']['dict']['data']
+        assert nested['attributes'] == {'name': 'B'}
+
+    def test_include(self):
+        """Relationships are only given if their path is included."""
+        data = {
+            'id': 'a',
+            'dict': {'id': 'b', 'list': [{'id': 'c'}]},
+            'list': [{'id': 'd', 'dict': {'id': 'e'}}],
+        }
+        fieldsets = utils.Fieldsets({}, {('dict', ), ('dict', 'list')})
+        res = utils.jsonapi_response(data, self.data_types, fieldsets)
+        relationships = res['data']['relationships']
+        assert list(relationships) == ['dict']
+        nested = relationships['dict']['data']['relationships']
+        assert nested['list']['data'][0]['data']['id'] == 'c'
+
+        fieldsets = utils.Fieldsets({}, frozenset())
+        res = utils.jsonapi_response(data, self.data_types, fieldsets)
+        assert res['data'] == {'id': 'a', 'type': 'tests'}
+
+    def test_native_types_left_for_encoder(self):
+        """UUIDs and datetimes aren't converted to strings, as the
+        encoder handles them.
+        """
+        data = {
+            'id': uuid.uuid4(),
+            'created_at': datetime(2022, 1, 1),
+            'owner_id': uuid.uuid4(),
+        }
+        res = utils.jsonapi_response(data, self.data_types)
+        attributes = res['data']['attributes']
+        assert attributes == {
+            'created_at': data['created_at'],
+            'owner_id': data['owner_id'],
+        }
+        assert json.loads(encoding.dumps(attributes)) == {
+            'created_at': '2022-01-01T00:00:00',
+            'owner_id': str(data['owner_id']),
+        }
+
+    def test_serializers_cached_per_fieldsets(self):
+        fieldsets = utils.Fieldsets({'tests': frozenset({'name'})}, None)
+        assert utils.jsonapi_serializer(self.data_types, fieldsets) is \
+            utils.jsonapi_serializer(self.data_types, fieldsets)
+        assert utils.jsonapi_serializer(self.data_types, fieldsets) is not \
+            utils.jsonapi_serializer(self.data_types)
+
+
+class TestStreamJsonapiList:
+    """Tests for stream_jsonapi_list"""
+
+    class MockResponse:
+        def __init__(self):
+            self.chunks = []
+            self.ended = False
+
+        async def send(self, data):
+            self.chunks.append(data)
+
+        async def eof(self):
+            self.ended = True
+
+    class MockRequest:
+        def __init__(self, response, transport=None):
+            self.response = response
+            self.transport = transport
+
+        async def respond(self, content_type=None):
+            return self.response
+
+    @staticmethod
+    async def as_async_iter(items):
+        for item in items:
+            yield item
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('n_items', [0, 1, 5])
+    async def test_matches_unstreamed_response(self, n_items):
+        """The streamed body should decode to the same response
+        as serializing the whole list at once.
+        """
+        data_types = {
+            'root': utils.ResponseDataType('tests', '/tests')
+        }
+        items = [{'id': i, 'name': f'item {i}'} for i in range(n_items)]
+        links = {'self': '/tests?limit=2'}
+        response = self.MockResponse()
+        serializer = utils.jsonapi_serializer(data_types)
+        await utils.stream_jsonapi_list(
+            self.MockRequest(response), links, self.as_async_iter(items),
+            serializer, chunk_size=2)
+
+        assert response.ended
+        body = json.loads(b''.join(response.chunks))
+        assert body == {
+            'links': links,
+            'data': serializer.serialize_many(items),
+        }
+
+    @pytest.mark.asyncio
+    async def test_error_while_streaming(self, mocker):
+        """Errors after the response has started are logged, and the
+        response is aborted rather than ended.
+        """
+        async def failing_items():
+            for i in range(3):
+                yield {'id': i}
+            raise ValueError('connection lost')
+
+        log_mock = mocker.patch.object(utils.app_logger, 'exception')
+        transport = mocker.Mock()
+        response = self.MockResponse()
+        serializer = utils.jsonapi_serializer({
+            'root': utils.ResponseDataType('tests', '/tests')
+        })
+        await utils.stream_jsonapi_list(
+            self.MockRequest(response, transport), {}, failing_items(),
+            serializer, chunk_size=2)
+
+        assert len(response.chunks) == 2
+        assert not response.ended
+        transport.close.assert_called_once()
+        log_mock.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_error_before_streaming(self):
+        """Errors fetching the first chunk are raised, to be reported
+        with an error response.
+        """
+        async def failing_items():
+            raise ValueError('no connection')
+            yield
+
+        response = self.MockResponse()
+        with pytest.raises(ValueError):
+            await utils.stream_jsonapi_list(
+                self.MockRequest(response), {}, failing_items(),
+                utils.jsonapi_serializer({}))
+        assert response.chunks == []
+
+
+class TestPrefersAsync:
+    @pytest.mark.parametrize('prefer, expected', [
+        (None, False),
+        ('respond-async', True),
+        ('Respond-Async', True),
+        ('return=minimal, respond-async; wait=10', True),
+        ('return=representation', False),
+    ])
+    def test_prefers_async(self, prefer, expected):
+        headers = {} if prefer is None else {'prefer': prefer}
+        request = SimpleNamespace(headers=headers)
+        assert utils.prefers_async(request) == expected
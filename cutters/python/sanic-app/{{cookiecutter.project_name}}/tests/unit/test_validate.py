@@ -1,6 +1,9 @@
 import pytest
 import uuid
+from types import SimpleNamespace
+import {{cookiecutter.module_name}}.exceptions as expns
 from {{cookiecutter.module_name}} import validate
+from {{cookiecutter.module_name}}.openapi import apply_docs
 
 """Tests to ensure correct id lengths."""
 
@@ -16,3 +19,91 @@ def test_uuids(id, should_fail):
             validate.validate_uuid(id, Exception)
     else:
         validate.validate_uuid(id)
+
+
+@pytest.mark.parametrize('id', [
+    str(uuid.uuid4()).upper(),
+    uuid.uuid4().hex,
+    '{' + str(uuid.uuid4()) + '}',
+])
+def test_uuid_forms(id):
+    """Other forms uuid.UUID accepts are still valid."""
+    assert validate.validate_uuid(id) == id
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('0', 0),
+    ('20', 20),
+    (20, 20),
+])
+def test_parse_natural(value, expected):
+    assert validate.parse_natural(value) == expected
+
+
+@pytest.mark.parametrize('value', ['-1', '1.0', ' 1', '1\n', -1, 1.0, True])
+def test_parse_natural_rejects(value):
+    with pytest.raises(expns.QueryException) as exc_info:
+        validate.parse_natural(value, expns.QueryException)
+    assert str(exc_info.value) == \
+        'Pagination arguments must be natural numbers'
+
+
+class MockReq:
+    def __init__(self, args=None, json=None):
+        self.args = args or {}
+        self.json = json
+        self.ctx = SimpleNamespace()
+
+
+class TestParams:
+    """Tests for the params decorator."""
+
+    declarations = [
+        validate.Param('limit', int, default=20,
+                       parse=validate.parse_positive),
+        validate.Param('item_id', str, 'path', parse=validate.validate_uuid),
+        validate.Param('name', str, 'body', required=True),
+    ]
+
+    @staticmethod
+    def handler():
+        @validate.params(*TestParams.declarations)
+        async def handler(request, item_id):
+            return request.ctx.params
+        return handler
+
+    @pytest.mark.asyncio
+    async def test_parses_args(self):
+        id = str(uuid.uuid4())
+        req = MockReq({'limit': '5'}, {'name': 'Bob'})
+        params = await self.handler()(req, item_id=id)
+        assert params == {'limit': 5, 'item_id': id, 'name': 'Bob'}
+
+    @pytest.mark.asyncio
+    async def test_defaults(self):
+        req = MockReq(json={'name': 'Bob'})
+        params = await self.handler()(req, item_id=str(uuid.uuid4()))
+        assert params['limit'] == 20
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('args, json, item_id, exception_cls', [
+        ({'limit': '0'}, {'name': 'Bob'}, str(uuid.uuid4()),
+         expns.QueryException),
+        ({}, {'name': 'Bob'}, 'abc', expns.URLException),
+        ({}, {}, str(uuid.uuid4()), expns.BodyException),
+        ({}, ['Bob'], str(uuid.uuid4()), expns.BodyException),
+    ])
+    async def test_exception_per_location(self, args, json, item_id,
+                                          exception_cls):
+        """Invalid args raise the exception for where they are."""
+        with pytest.raises(exception_cls):
+            await self.handler()(MockReq(args, json), item_id=item_id)
+
+    def test_documents_params(self):
+        """Query and path args are added to the API spec, in order."""
+        from sanic_openapi.openapi3 import operations
+        handler = self.handler()
+        apply_docs()
+        operation = operations[handler]
+        assert [p.fields['name'] for p in operation.parameters] == \
+            ['limit', 'item_id']
@@ -1,24 +1,51 @@
-import os
+import time
+import asyncio
 from sanic import Sanic
 from sanic.response import json
+from {{cookiecutter.module_name}} import env
+from {{cookiecutter.module_name}} import encoding
+from {{cookiecutter.module_name}} import compression
+from {{cookiecutter.module_name}} import metrics
 from {{cookiecutter.module_name}}.db import env as dbenv
-from sqlalchemy.ext.asyncio import create_async_engine
-from sanic_openapi import openapi, openapi3_blueprint
+from {{cookiecutter.module_name}}.db import engine as dbengine
+from {{cookiecutter.module_name}}.db import connection as dbconnection
+from {{cookiecutter.module_name}}.db import replicas as dbreplicas
+from {{cookiecutter.module_name}}.db import writebehind
+from {{cookiecutter.module_name}}.db.repositories import greetings as greet_repo
+from {{cookiecutter.module_name}}.db import querylog
 from textwrap import dedent
 from {{cookiecutter.module_name}}.exceptions import CustomException
 from {{cookiecutter.module_name}}.log import app_logger
 from {{cookiecutter.module_name}}.blueprints.hello_world import blueprint as hello_world
+from {{cookiecutter.module_name}}.blueprints.metrics import blueprint as metrics_bp
 
-DEBUG_ENV = 'development'
-IS_DEBUG = os.getenv('PYTHON_ENV', DEBUG_ENV) is DEBUG_ENV
+# JSON responses and request bodies use the fastest installed
+# encoder (see encoding.py).
+app = Sanic('{{cookiecutter.project_name}}',
+            dumps=encoding.dumps, loads=encoding.loads)
 
-app = Sanic('{{cookiecutter.project_name}}')
-app.blueprint(openapi3_blueprint)
+# -------------------------------------------
+# Server settings (see env.py)
+# -------------------------------------------
+
+# These also apply to `sanic {{cookiecutter.module_name}}.app:app`. Under an
+# ASGI server the timeouts are that server's own settings instead.
+app.config.KEEP_ALIVE_TIMEOUT = env.KEEP_ALIVE_TIMEOUT
+app.config.REQUEST_TIMEOUT = env.REQUEST_TIMEOUT
+app.config.RESPONSE_TIMEOUT = env.RESPONSE_TIMEOUT
+app.config.ACCESS_LOG = env.ACCESS_LOG
+app.config.USE_UVLOOP = env.USE_UVLOOP
 
 # -------------------------------------------
-# API Docs setup (docs can be found at /docs)
+# API Docs setup (docs can be found at /swagger)
 # -------------------------------------------
 
+# The docs are built on the first request for them (see docs.py), and
+# left out entirely with DOCS=false.
+if env.DOCS:
+    from {{cookiecutter.module_name}} import docs
+    app.blueprint(docs.make_blueprint())
+
 app.config.API_VERSION = '0.1.0'
 app.config.API_TITLE = 'API Title'
 app.config.API_DESCRIPTION = dedent(
@@ -37,6 +64,121 @@ app.config.API_DESCRIPTION = dedent(
 #     bearer_format="JWT",
 # )
 
+# -------------------------------------------
+# Metrics (served at /metrics) and timings
+# -------------------------------------------
+
+# Registered before any other middleware, so that the timings include
+# it (response middleware runs in reverse order).
+
+
+@app.on_request
+async def start_request_timer(request):
+    request.ctx.started_at = time.perf_counter()
+    querylog.start_request()
+
+
+@app.on_response
+async def record_request_metrics(request, response):
+    started_at = getattr(request.ctx, 'started_at', None)
+    if started_at is None:
+        return
+    # Label by route rather than path, to keep the number of series down.
+    route = request.uri_template or 'unmatched'
+    metrics.http_request_duration.observe(
+        time.perf_counter() - started_at,
+        method=request.method, route=route)
+    metrics.http_requests.inc(
+        method=request.method, route=route, status=response.status)
+
+    # Report time spent in the database (see db.querylog).
+    stats = querylog.request_stats()
+    if stats is not None:
+        response.headers['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.1f};'
+            f'desc="{stats.count} queries"')
+
+# -------------------------------------------
+# Compression (see compression.py)
+# -------------------------------------------
+
+# Registered after the metrics middleware, so that the timings include
+# compressing the response.
+
+if env.COMPRESS:
+    app.on_response(compression.compress_response)
+
+# -------------------------------------------
+# Database lifecycle
+# -------------------------------------------
+
+# Listeners run in each worker process (and on ASGI lifespan events),
+# so every worker gets its own engine and connection pool.
+
+
+@app.before_server_start
+async def setup_db(app, loop):
+    # An engine may already have been set up (e.g. by test fixtures).
+    if getattr(app.ctx, 'db', None) is None:
+        app.ctx.db = dbengine.create_engine()
+    dbengine.instrument(app.ctx.db)
+    await dbengine.warm_up(app.ctx.db, dbenv.DB_POOL_WARMUP)
+
+    # Read replicas (if any), and a task checking their health.
+    if getattr(app.ctx, 'replicas', None) is None:
+        app.ctx.replicas = dbreplicas.create_replica_set()
+    app.ctx.replica_monitor = None
+    if app.ctx.replicas:
+        for engine in app.ctx.replicas.engines:
+            dbengine.instrument(engine, watch_pool=False)
+        await app.ctx.replicas.check_all()
+        app.ctx.replica_monitor = asyncio.ensure_future(
+            app.ctx.replicas.monitor())
+
+    # Greetings created with "Prefer: respond-async" are queued, and
+    # inserted in batches (see db.writebehind).
+    app.ctx.greeting_writes = None
+    if dbenv.DB_WRITE_BEHIND_QUEUE_SIZE > 0:
+        app.ctx.greeting_writes = writebehind.WriteBehindQueue(
+            'greetings',
+            writebehind.batch_writer(
+                app.ctx.db, greet_repo.add_greetings,
+                greet_repo.greetings_added))
+        app.ctx.greeting_writes.start()
+
+
+@app.before_server_stop
+async def drain_write_behind(app, loop):
+    # Before teardown_db, while the engine can still write.
+    if app.ctx.greeting_writes is not None:
+        await app.ctx.greeting_writes.drain()
+
+
+@app.after_server_stop
+async def teardown_db(app, loop):
+    # The replica monitor is stopped first, so that it isn't checking
+    # replicas while their engines are disposed.
+    if app.ctx.replica_monitor is not None:
+        app.ctx.replica_monitor.cancel()
+        try:
+            await app.ctx.replica_monitor
+        except asyncio.CancelledError:
+            pass
+    # Disposing closes the pooled connections. The engine stays
+    # usable, and would reconnect if the server were started again.
+    await app.ctx.db.dispose()
+    await app.ctx.replicas.dispose()
+
+
+@app.on_request
+async def open_request_connection(request):
+    dbconnection.init_connection(request)
+
+
+@app.on_response
+async def close_request_connection(request, response):
+    await dbconnection.release_connection(request, response)
+
 # -------------------------------------------
 # Exception Handlers
 # -------------------------------------------
@@ -53,7 +195,8 @@ async def intercepted_exceptions(request, exception):
             }
         ]
     }
-    return json(resp, status=exception.status_code)
+    return json(resp, status=exception.status_code,
+                headers=getattr(exception, 'headers', None))
 
 
 @app.exception(Exception)
@@ -87,7 +230,17 @@ async def exception_handler(request, exception):
 
 # App routes are split into sub-modules for easier consumption
 app.blueprint(hello_world)
+app.blueprint(metrics_bp)
 
 if __name__ == "__main__":
-    app.ctx.db = create_async_engine(dbenv.POSTGRES_URL)
-    app.run(host='0.0.0.0', port=8000, access_log=False, debug=IS_DEBUG)
+    # Sanic doesn't accept both fast and workers.
+    workers = {'fast': True} if env.FAST else {'workers': env.WORKERS}
+    app.run(
+        host=env.HOST,
+        port=env.PORT,
+        backlog=env.BACKLOG,
+        access_log=env.ACCESS_LOG,
+        debug=env.IS_DEBUG,
+        motd=env.IS_DEBUG,
+        **workers,
+    )
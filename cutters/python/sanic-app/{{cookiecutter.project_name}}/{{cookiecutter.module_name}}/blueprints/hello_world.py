@@ -4,20 +4,40 @@ This module adds routes to the app for testing basic functionality
 such as simple GET requests, error pages, and simple DB accesses.
 """
 
+import asyncio
 from sanic.blueprints import Blueprint
-from sanic.response import json
+from sanic.response import json, empty
 from sanic.exceptions import NotFound
-from sanic_openapi import openapi
 import {{cookiecutter.module_name}}.exceptions as expns
 from {{cookiecutter.module_name}}.utils import (
-    get_offset_limit,
+    cursor_params,
+    get_fieldsets,
+    fieldset_columns,
+    fieldsets_query,
+    check_include,
+    make_cursor_pagination_links,
     make_pagination_links,
+    get_offset_limit,
     jsonapi_response,
+    jsonapi_serializer,
+    stream_jsonapi_list,
+    has_conditional_headers,
+    prefers_async,
+    is_not_modified,
+    cache_headers,
+    item_version,
+    page_version,
     ResponseDataType)
 from {{cookiecutter.module_name}} import validate
+from {{cookiecutter.module_name}}.validate import Param
 import {{cookiecutter.module_name}}.db.repositories.greetings as greet_repo
+import {{cookiecutter.module_name}}.db.env as dbenv
+from {{cookiecutter.module_name}}.db.connection import (
+    checkout_read_only,
+    get_connection)
 from {{cookiecutter.module_name}}.log import app_logger
 from {{cookiecutter.module_name}}.openapi import (
+    openapi,
     jsonapi_item,
     jsonapi_list,
     JSONAPIErrorResponse,
@@ -41,9 +61,33 @@ class NewGreetingBody:
     name: str
 
 
+class NewGreetingsBatchBody:
+    data: list[NewGreetingBody]
+
+
 def make_greeting_msg(name: str):
     return f'Hello {name}!'
 
+
+# Default number of greetings per export.
+EXPORT_PAGE_SIZE = 1000
+
+# Enough columns to work out the version of a page of greetings
+# (and its pagination links).
+VERSION_COLUMNS = ['id', 'created_at', 'updated_at']
+
+
+def get_greeting_fieldsets(request):
+    """Gets the fieldsets of a request for greetings, and the columns
+    needed for them (or None for all columns).
+    """
+    fieldsets = get_fieldsets(request)
+    # Greetings have no relationships to include.
+    check_include(fieldsets)
+    columns = fieldset_columns(
+        fieldsets, 'greetings', greet_repo.COLUMNS, VERSION_COLUMNS)
+    return fieldsets, columns
+
 # --------------------
 # Routes
 # --------------------
@@ -98,58 +142,215 @@ async def query_error(request):
 
 @blueprint.route('/greetings', methods=['GET'])
 @openapi.summary('List greetings')
-@openapi.description("""Lists all greetings that have occurred""")
+@openapi.description("""Lists all greetings that have occurred.
+
+    Pages are fetched with cursors (from the links of the previous
+    page). Offset pagination (offset=n) is still supported, but pages
+    further in cost more to fetch.
+
+    meta.count is the (possibly approximate) number of greetings,
+    unless counting is turned off (see DB_COUNT_STRATEGY).""")
 @openapi.response(
     200,
     {"application/json": jsonapi_list(GreetingAttributes)},
 )
-@openapi.parameter('offset', int, 'query')
-@openapi.parameter('limit', int, 'query')
+@validate.params(
+    *cursor_params(),
+    Param('offset', int, parse=validate.parse_natural,
+          description='Rows to skip (instead of a cursor). Offset and '
+                      'limit must be multiples of 20.'),
+    Param('fields[greetings]', str),
+)
 async def list_greetings(request):
-    offset, limit = get_offset_limit(request)
-    async with request.app.ctx.db.connect() as conn:
-        try:
-            items = await greet_repo.get_greetings(conn, offset, limit)
-        except Exception as exp:
-            app_logger.exception(exp)
-            raise expns.DBException('Error fetching greetings.')
-
+    cursor = request.ctx.params['cursor']
+    offset = request.ctx.params['offset']
+    limit = request.ctx.params['limit']
+    fieldsets, columns = get_greeting_fieldsets(request)
+    if offset is not None:
+        if cursor is not None:
+            raise expns.QueryException(
+                'Use either a cursor or an offset, not both.')
+        return await list_greetings_by_offset(request, fieldsets, columns)
+
+    query = fieldsets_query(fieldsets)
     url = request.url_for('hello_world.list_greetings')
-    links = make_pagination_links(url, offset, limit)
+    try:
+        conn = await get_connection(request, read_only=True)
+        if has_conditional_headers(request):
+            # Check the requestor's copy against just the ids and
+            # timestamps of the page, before fetching the whole page.
+            versions, has_more = await greet_repo.get_greetings_page(
+                conn, cursor, limit, columns=VERSION_COLUMNS)
+            links = make_cursor_pagination_links(
+                url, versions, limit, cursor, has_more, query=query)
+            etag, last_modified = page_version(links, versions)
+            if is_not_modified(request, etag, last_modified):
+                return empty(
+                    status=304, headers=cache_headers(etag, last_modified))
+
+        items, has_more = await greet_repo.get_greetings_page(
+            conn, cursor, limit, columns=columns)
+        # Only counted for the body: like the count itself (see
+        # DB_COUNT_STRATEGY), meta.count may lag behind the ETag.
+        count = await greet_repo.count_greetings(conn)
+    except Exception as exp:
+        app_logger.exception(exp)
+        raise expns.DBException('Error fetching greetings.')
+
+    links = make_cursor_pagination_links(
+        url, items, limit, cursor, has_more, query=query)
+    etag, last_modified = page_version(links, items)
     response_types = {
         'root': ResponseDataType('greetings', url)
     }
-    response_items = [
-        jsonapi_response(item, response_types) for item in items
-    ]
+    response_items = jsonapi_serializer(
+        response_types, fieldsets).serialize_many(items)
 
     response = {
         'links': links,
         'data': response_items
     }
-    return json(response)
+    if count is not None:
+        response['meta'] = {'count': count}
+    return json(response, headers=cache_headers(etag, last_modified))
+
+
+async def list_greetings_by_offset(request, fieldsets,
+                                   columns: list[str]):
+    """Lists a page of greetings using offset pagination (as the list
+    endpoint did before cursors), with its args checked the same way
+    (see get_offset_limit).
+    """
+    offset, limit = get_offset_limit(request)
+
+    url = request.url_for('hello_world.list_greetings')
+    query = fieldsets_query(fieldsets)
+    try:
+        conn = await get_connection(request, read_only=True)
+        # The links (so the ETag) depend on the count.
+        count = await greet_repo.count_greetings(conn)
+        links = make_pagination_links(url, offset, limit, count, query)
+        if has_conditional_headers(request):
+            # As with cursors, check the requestor's copy against just
+            # the ids and timestamps of the page first.
+            versions = await greet_repo.get_greetings(
+                conn, offset, limit, columns=VERSION_COLUMNS)
+            etag, last_modified = page_version(links, versions)
+            if is_not_modified(request, etag, last_modified):
+                return empty(
+                    status=304, headers=cache_headers(etag, last_modified))
+
+        items = await greet_repo.get_greetings(
+            conn, offset, limit, columns=columns)
+    except Exception as exp:
+        app_logger.exception(exp)
+        raise expns.DBException('Error fetching greetings.')
+
+    etag, last_modified = page_version(links, items)
+
+    response_types = {
+        'root': ResponseDataType('greetings', url)
+    }
+    response = {
+        'links': links,
+        'data': jsonapi_serializer(
+            response_types, fieldsets).serialize_many(items),
+    }
+    if count is not None:
+        response['meta'] = {'count': count}
+    return json(response, headers=cache_headers(etag, last_modified))
+
+
+@blueprint.route('/greetings/export', methods=['GET'])
+@openapi.summary('Export greetings')
+@openapi.description("""Streams greetings in large pages.
+    Rows are written as they are read from the database,
+    so (unlike the list endpoint) the response only has a self link.""")
+@openapi.response(
+    200,
+    {"application/json": jsonapi_list(GreetingAttributes)},
+)
+@validate.params(
+    *cursor_params(page_size=EXPORT_PAGE_SIZE),
+    Param('fields[greetings]', str),
+)
+async def export_greetings(request):
+    cursor = request.ctx.params['cursor']
+    limit = request.ctx.params['limit']
+    fieldsets, columns = get_greeting_fieldsets(request)
+
+    # The page bounds aren't known until all rows have been sent,
+    # so only the self link can be given.
+    url = request.url_for('hello_world.list_greetings')
+    links = make_cursor_pagination_links(
+        request.url_for('hello_world.export_greetings'), [], limit, cursor,
+        ends=False, query=fieldsets_query(fieldsets))
+    response_types = {
+        'root': ResponseDataType('greetings', url)
+    }
+
+    # Streamed responses can't use the request's connection (see
+    # get_connection), so this checks out its own. Only errors raised
+    # before streaming starts get here (see stream_jsonapi_list).
+    conn = None
+    try:
+        conn = await checkout_read_only(request.app)
+        items = greet_repo.stream_greetings(conn, cursor, limit, columns)
+        await stream_jsonapi_list(
+            request, links, items,
+            jsonapi_serializer(response_types, fieldsets))
+    except Exception as exp:
+        app_logger.exception(exp)
+        raise expns.DBException('Error exporting greetings.')
+    finally:
+        if conn is not None:
+            await conn.close()
 
 
 @blueprint.route('/greetings', methods=['POST'])
 @openapi.summary('Create greeting')
-@openapi.description("""Creates a new greeting and saves it""")
+@openapi.description("""Creates a new greeting and saves it.
+
+    With a "Prefer: respond-async" header (and the write-behind queue
+    enabled), the greeting is queued to be saved in a batch, and a 202
+    is returned straight away, with its link in the Location header. A
+    429 is returned if too many greetings are queued.""")
 @openapi.body({"application/json": NewGreetingBody})
+@openapi.parameter(
+    'Prefer', str, 'header',
+    description='"respond-async" to queue the greeting, and be answered '
+                'before it is saved (if the write-behind queue is enabled)')
 @openapi.response(
     200,
     {"application/json": jsonapi_item(GreetingAttributes)},
 )
+@openapi.response(
+    202,
+    {"application/json": jsonapi_item(GreetingAttributes)},
+)
+@openapi.response(
+    429,
+    {"application/json": JSONAPIErrorResponse},
+)
+@validate.params(
+    Param('name', str, 'body', required=True),
+)
 async def new_greeting(request):
-    name = request.json.get('name')
-    if name is None:
-        raise expns.BodyException('"name" arg not set')
-
-    async with request.app.ctx.db.connect() as conn:
-        try:
-            greeting = await greet_repo.add_greeting(
-                conn, name, make_greeting_msg(name))
-        except Exception as exp:
-            app_logger.exception(exp)
-            raise expns.DBException('Error creating greeting.')
+    name = request.ctx.params['name']
+
+    queue = request.app.ctx.greeting_writes
+    if queue is not None and prefers_async(request):
+        return queue_new_greeting(request, queue, name)
+
+    try:
+        conn = await get_connection(request, transaction=True)
+        greeting = await greet_repo.add_greeting(
+            conn, name, make_greeting_msg(name))
+        await conn.commit()
+    except Exception as exp:
+        app_logger.exception(exp)
+        raise expns.DBException('Error creating greeting.')
+    await greet_repo.greetings_added([greeting])
 
     url = request.url_for('hello_world.new_greeting')
     response_types = {
@@ -158,10 +359,81 @@ async def new_greeting(request):
     return json(jsonapi_response(greeting, response_types))
 
 
+def queue_new_greeting(request, queue, name: str):
+    """Queues a greeting to be saved, and responds with a 202 and a link
+    to where it will be.
+    """
+    greeting = greet_repo.new_greeting(name, make_greeting_msg(name))
+    try:
+        queue.put(greeting)
+    except asyncio.QueueFull:
+        raise expns.TooManyRequestsException(
+            'Too many greetings are waiting to be saved.', retry_after=1)
+
+    url = request.url_for('hello_world.new_greeting')
+    response_types = {
+        'root': ResponseDataType('greetings', url)
+    }
+    response = jsonapi_response(greeting, response_types)
+    headers = {
+        'Location': response['links']['self'],
+        'Preference-Applied': 'respond-async',
+    }
+    return json(response, status=202, headers=headers)
+
+
+@blueprint.route('/greetings/batch', methods=['POST'])
+@openapi.summary('Create greetings in bulk')
+@openapi.description(f"""Creates many greetings in one transaction.
+    At most {dbenv.DB_MAX_INSERT_BATCH_SIZE} greetings can be created
+    per request.""")
+@openapi.body({"application/json": NewGreetingsBatchBody})
+@openapi.response(
+    200,
+    {"application/json": jsonapi_list(GreetingAttributes)},
+)
+async def new_greetings_batch(request):
+    body = request.json
+    batch = body.get('data') if isinstance(body, dict) else None
+    if not isinstance(batch, list):
+        raise expns.BodyException('"data" arg should be a list')
+    if len(batch) > dbenv.DB_MAX_INSERT_BATCH_SIZE:
+        raise expns.BodyException(
+            f'At most {dbenv.DB_MAX_INSERT_BATCH_SIZE} greetings '
+            'can be created at once')
+
+    items = []
+    for i, item in enumerate(batch):
+        name = item.get('name') if isinstance(item, dict) else None
+        if name is None:
+            raise expns.BodyException(f'"name" arg not set in item {i}')
+        items.append({'name': name, 'message': make_greeting_msg(name)})
+
+    try:
+        conn = await get_connection(request, transaction=True)
+        greetings = await greet_repo.add_greetings(conn, items)
+        await conn.commit()
+    except Exception as exp:
+        app_logger.exception(exp)
+        raise expns.DBException('Error creating greetings.')
+    await greet_repo.greetings_added(greetings)
+
+    url = request.url_for('hello_world.list_greetings')
+    response_types = {
+        'root': ResponseDataType('greetings', url)
+    }
+    response = {
+        'links': {
+            'self': request.url_for('hello_world.new_greetings_batch'),
+        },
+        'data': jsonapi_serializer(response_types).serialize_many(greetings),
+    }
+    return json(response)
+
+
 @blueprint.route('/greetings/<greeting_id>', methods=['GET'])
 @openapi.summary('Get greeting')
 @openapi.description("""Get a specific greeting from earlier""")
-@openapi.parameter('greeting_id', str, 'path')
 @openapi.response(
     200,
     {"application/json": jsonapi_item(GreetingAttributes)},
@@ -170,21 +442,41 @@ async def new_greeting(request):
     404,
     {"application/json": JSONAPIErrorResponse},
 )
+@validate.params(
+    Param('greeting_id', str, 'path', parse=validate.validate_uuid),
+    Param('fields[greetings]', str),
+)
 async def get_greeting(request, greeting_id):
-    validate.validate_uuid(greeting_id, expns.URLException)
-    print('ID:', greeting_id)
-    async with request.app.ctx.db.connect() as conn:
-        try:
-            greeting = await greet_repo.get_greeting(conn, greeting_id)
-        except Exception as exp:
-            app_logger.exception(exp)
-            raise expns.DBException('Error fetching greeting.')
+    # Single greetings are cached whole, so only the response is
+    # restricted to the fieldset (rather than the query).
+    fieldsets, _ = get_greeting_fieldsets(request)
+    variant = fieldsets_query(fieldsets)
+    try:
+        conn = await get_connection(request, read_only=True)
+        if has_conditional_headers(request):
+            # Check the requestor's copy against just the greeting's
+            # timestamp (cached, or else queried), before fetching the
+            # whole greeting.
+            version = await greet_repo.get_greeting_version(conn, greeting_id)
+            if version is not None:
+                etag, last_modified = item_version(version, variant)
+                if is_not_modified(request, etag, last_modified):
+                    return empty(
+                        status=304,
+                        headers=cache_headers(etag, last_modified))
+
+        greeting = await greet_repo.get_greeting(conn, greeting_id)
+    except Exception as exp:
+        app_logger.exception(exp)
+        raise expns.DBException('Error fetching greeting.')
 
     if greeting is None:
         raise NotFound(f'Greeting "{greeting_id}" does not exist')
 
+    etag, last_modified = item_version(greeting, variant)
     url = request.url_for('hello_world.list_greetings')
     response_types = {
         'root': ResponseDataType('greetings', url)
     }
-    return json(jsonapi_response(greeting, response_types))
+    return json(jsonapi_response(greeting, response_types, fieldsets),
+                headers=cache_headers(etag, last_modified))
@@ -0,0 +1,20 @@
+"""Route exposing the app's metrics (see metrics.py).
+
+Point a Prometheus scraper (or anything reading its text format) at
+/metrics.
+"""
+
+from sanic.blueprints import Blueprint
+from sanic.response import text
+from {{cookiecutter.module_name}}.openapi import openapi
+from {{cookiecutter.module_name}} import metrics
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+blueprint = Blueprint('metrics')
+
+
+@blueprint.route('/metrics', methods=['GET'])
+@openapi.exclude()
+async def get_metrics(request):
+    return text(metrics.REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,102 @@
+"""Pluggable async caches.
+
+Caches implement the CacheBackend interface, so that the in-process
+LRUCache can be swapped for a shared cache (e.g. redis) without
+changing the code using it.
+"""
+import abc
+import time
+from collections import OrderedDict
+
+
+class CacheBackend(abc.ABC):
+    """Interface for async caches.
+
+    Values of None can't be cached, as get returns None on a miss.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str):
+        """Gets a value, or None if the key isn't cached."""
+
+    @abc.abstractmethod
+    async def set(self, key: str, value):
+        """Caches a value."""
+
+    @abc.abstractmethod
+    async def delete(self, key: str):
+        """Removes a key from the cache, if it is cached."""
+
+    @abc.abstractmethod
+    async def clear(self):
+        """Removes all keys from the cache."""
+
+    def stats(self) -> dict[str, int]:
+        """Gets counters of cache usage (e.g. hits and misses)."""
+        return {}
+
+
+class LRUCache(CacheBackend):
+    """In-process cache with least-recently-used eviction and a TTL.
+
+    Args:
+        max_entries:
+            The most keys to keep. Adding keys beyond this evicts the
+            least recently used.
+        ttl:
+            Seconds that values stay valid for.
+        clock:
+            Function giving the current time in seconds.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
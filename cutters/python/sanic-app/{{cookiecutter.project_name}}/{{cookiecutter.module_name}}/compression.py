@@ -0,0 +1,199 @@
+"""Compression of response bodies (gzip, and brotli if installed).
+
+app.py installs compress_response as response middleware. Bodies are
+compressed when the requestor accepts it (see choose_encoding) and they
+are worth it: their content type is text-like (e.g. JSON), and they are
+at least COMPRESS_MIN_SIZE bytes (see env.py), as smaller bodies gain
+little for the CPU time spent on both ends. jsonapi responses repeat
+keys like "attributes", "links" and "type" for every item, so list
+pages shrink several times over.
+
+Bodies over COMPRESS_OFFLOAD_SIZE bytes are compressed in a thread (zlib
+and brotli release the GIL while compressing), so that other requests
+on the event loop aren't held up. Streamed responses (see
+utils.stream_jsonapi_list) are left alone, as their headers go out
+before their body is known.
+
+Compressed responses get weak ETags (as with nginx), as their bytes
+depend on the encoder. The app's own ETags are weak already (see
+utils.make_etag), so that 304s, which aren't compressed, carry the same
+validator as compressed 200s.
+
+Bodies that never change (e.g. the API spec) can be compressed once,
+with Precompressed.
+"""
+import zlib
+import asyncio
+from sanic.response import HTTPResponse
+from {{cookiecutter.module_name}} import env
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Content types worth compressing, besides any text/* or +json type.
+COMPRESSIBLE_TYPES = frozenset([
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+])
+
+# Responses without a body to compress, or whose body can't be replaced.
+_SKIPPED_STATUSES = frozenset([204, 206, 304])
+
+
+def available_encodings() -> list[str]:
+    """The content codings that can be used, preferred first."""
+    if brotli is not None:
+        return ['br', 'gzip']
+    return ['gzip']
+
+
+def _parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, *params = part.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def choose_encoding(accept_encoding: str, encodings: list[str] = None) -> str:
+    """Picks the content coding to respond with.
+
+    Args:
+        accept_encoding:
+            The request's Accept-Encoding header.
+        encodings:
+            The codings to choose from, preferred first (by default,
+            available_encodings()).
+
+    Returns:
+        The coding with the highest q-value, our preference breaking
+        ties, or None to send the body as is. Codings given q=0 (or
+        matched by "*;q=0") are never picked.
+    """
+    if not accept_encoding:
+        return None
+    if encodings is None:
+        encodings = available_encodings()
+    qualities = _parse_accept_encoding(accept_encoding)
+    default = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in encodings:
+        quality = qualities.get(coding, default)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    """Whether a content type is worth compressing (i.e. is text-like)."""
+    if not content_type:
+        return False
+    mime_type = content_type.split(';', 1)[0].strip().lower()
+    return (mime_type in COMPRESSIBLE_TYPES or
+            mime_type.startswith('text/') or
+            mime_type.endswith('+json'))
+
+
+def compress(body: bytes, coding: str, best: bool = False) -> bytes:
+    """Compresses a body with a content coding ('gzip' or 'br').
+
+    Args:
+        best:
+            Compress as small as possible, however long it takes (for
+            bodies compressed once, see Precompressed).
+    """
+    if coding == 'br':
+        quality = 11 if best else env.COMPRESS_BROTLI_QUALITY
+        return brotli.compress(body, quality=quality)
+    # wbits=31 gives a gzip header (with no timestamp, so the output
+    # only depends on the body).
+    compressor = zlib.compressobj(
+        9 if best else env.COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def _add_vary(response):
+    vary = response.headers.get('vary')
+    if vary is None:
+        response.headers['vary'] = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower():
+        response.headers['vary'] = f'{vary}, Accept-Encoding'
+
+
+async def compress_response(request, response):
+    """Response middleware compressing bodies that are worth it."""
+    body = getattr(response, 'body', None)
+    if (not body or
+            len(body) < env.COMPRESS_MIN_SIZE or
+            request.method == 'HEAD' or
+            response.status < 200 or
+            response.status in _SKIPPED_STATUSES or
+            'content-encoding' in response.headers or
+            not is_compressible(response.content_type)):
+        return
+
+    # The body depends on Accept-Encoding, whether or not it's
+    # compressed for this requestor.
+    _add_vary(response)
+    coding = choose_encoding(request.headers.get('accept-encoding', ''))
+    if coding is None:
+        return
+
+    if len(body) > env.COMPRESS_OFFLOAD_SIZE:
+        loop = asyncio.get_running_loop()
+        compressed = await loop.run_in_executor(None, compress, body, coding)
+    else:
+        compressed = compress(body, coding)
+    if len(compressed) >= len(body):
+        return
+
+    response.body = compressed
+    response.headers['content-encoding'] = coding
+    if 'content-length' in response.headers:
+        response.headers['content-length'] = str(len(compressed))
+    etag = response.headers.get('etag')
+    if etag is not None and not etag.startswith('W/'):
+        response.headers['etag'] = f'W/{etag}'
+
+
+class Precompressed:
+    """A body compressed once with each available coding, and served as
+    is (for bodies that don't change while the app runs).
+
+    Args:
+        body:
+            The uncompressed body.
+        content_type:
+            The body's content type.
+    """
+
+    def __init__(self, body: bytes, content_type: str):
+        self.content_type = content_type
+        self.bodies = {None: body}
+        for coding in available_encodings():
+            self.bodies[coding] = compress(body, coding, best=True)
+
+    def response(self, request) -> HTTPResponse:
+        """Makes a response with the body the requestor accepts."""
+        coding = choose_encoding(request.headers.get('accept-encoding', ''))
+        headers = {'Vary': 'Accept-Encoding'}
+        if coding is not None:
+            headers['Content-Encoding'] = coding
+        return HTTPResponse(
+            self.bodies[coding], headers=headers,
+            content_type=self.content_type)
@@ -0,0 +1,73 @@
+"""Hooks into alembic's autogenerate (see migrations/env.py).
+
+Creating an index normally locks its table against writes until the
+index is built, which can take a long time on big tables. So indexes
+on existing tables are autogenerated as CREATE/DROP INDEX CONCURRENTLY.
+That can't run inside a transaction, so they're rendered in an
+autocommit block at the end of the migration, i.e.
+
+    with op.get_context().autocommit_block():
+        op.create_index(..., postgresql_concurrently=True)
+
+Indexes of tables that the same migration creates or drops are left as
+they are: new tables are still empty, and dropping a table drops its
+indexes, so their index ops have to stay in order with the table ops.
+"""
+from alembic.autogenerate import renderers
+from alembic.autogenerate.render import render_op
+from alembic.operations import ops
+
+
+class AutocommitBlockOp(ops.MigrateOperation):
+    """Operations run outside of the migration's transaction."""
+
+    def __init__(self, operations):
+        self.ops = operations
+
+    def reverse(self):
+        return AutocommitBlockOp([op.reverse() for op in reversed(self.ops)])
+
+
+@renderers.dispatch_for(AutocommitBlockOp)
+def render_autocommit_block(autogen_context, op):
+    lines = ['with op.get_context().autocommit_block():']
+    for inner_op in op.ops:
+        lines.extend(render_op(autogen_context, inner_op))
+    lines.append('')
+    return lines
+
+
+def concurrent_index_ops(op_container):
+    """Moves index ops on existing tables into an autocommit block.
+
+    Tables created or dropped in the same container (the upgrade or
+    downgrade of a migration) keep their index ops where they are.
+    """
+    new_or_dropped = {
+        (op.schema, op.table_name) for op in op_container.ops
+        if isinstance(op, (ops.CreateTableOp, ops.DropTableOp))
+    }
+    index_ops = []
+    for table_ops in op_container.ops:
+        if not isinstance(table_ops, ops.ModifyTableOps):
+            continue
+        if (table_ops.schema, table_ops.table_name) in new_or_dropped:
+            continue
+        for op in list(table_ops.ops):
+            if isinstance(op, (ops.CreateIndexOp, ops.DropIndexOp)):
+                op.kw['postgresql_concurrently'] = True
+                table_ops.ops.remove(op)
+                index_ops.append(op)
+
+    op_container.ops = [
+        op for op in op_container.ops
+        if not (isinstance(op, ops.ModifyTableOps) and not op.ops)
+    ]
+    if index_ops:
+        op_container.ops.append(AutocommitBlockOp(index_ops))
+
+
+def process_revision_directives(context, revision, directives):
+    script = directives[0]
+    for op_container in script.upgrade_ops_list + script.downgrade_ops_list:
+        concurrent_index_ops(op_container)
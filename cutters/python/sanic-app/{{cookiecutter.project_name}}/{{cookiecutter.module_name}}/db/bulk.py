@@ -0,0 +1,282 @@
+"""Bulk loading and exporting of schema tables.
+
+Rows go through Postgres' COPY protocol on the raw asyncpg connection,
+which is far faster than INSERTs through SQLAlchemy Core. Records are
+handled in batches, so inputs and outputs of any size can be streamed.
+
+Can also be run as a script (see scripts/bulk.sh):
+
+    python -m {{cookiecutter.module_name}}.db.bulk load greetings greetings.csv
+    python -m {{cookiecutter.module_name}}.db.bulk export greetings - --format ndjson
+"""
+import sys
+import csv
+import json
+import uuid
+import asyncio
+import argparse
+from datetime import date, datetime
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import create_async_engine
+from {{cookiecutter.module_name}}.db import env as dbenv
+from {{cookiecutter.module_name}}.db import schema
+
+DEFAULT_BATCH_SIZE = 10000
+
+# -------
+# Helpers
+# -------
+
+
+def get_table(name: str):
+    """Gets a table from schema.tables by name."""
+    for table in schema.tables:
+        if table.name == name:
+            return table
+    raise ValueError(f'Unknown table "{name}"')
+
+
+async def _driver_connection(conn):
+    """Gets the asyncpg connection underlying a SQLAlchemy one."""
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+
+def _parse_bool(value: str) -> bool:
+    return value.lower() in ('true', 't', '1')
+
+
+def _coercer(column):
+    """Makes a function that converts text values (e.g. from CSV or
+    JSON) to the python type asyncpg expects for the column.
+    """
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return None
+
+    parse = {
+        uuid.UUID: uuid.UUID,
+        datetime: datetime.fromisoformat,
+        date: date.fromisoformat,
+        bool: _parse_bool,
+    }.get(python_type, python_type)
+
+    def coerce(value):
+        if value is None or isinstance(value, python_type):
+            return value
+        if value == '':
+            return None
+        return parse(value)
+    return coerce
+
+
+def _default_fillers(table) -> dict:
+    """Makes a function per column with a default, which generates
+    the default client-side.
+
+    Python defaults (e.g. uuid ids) are called, and SQL defaults
+    (e.g. the standard timestamps) are given the batch's timestamp.
+    """
+    fillers = {}
+    for column in table.columns:
+        default = column.default
+        if default is None:
+            continue
+        if default.is_callable:
+            fillers[column.name] = (
+                lambda now, default=default: default.arg(None))
+        elif default.is_clause_element:
+            fillers[column.name] = lambda now: now
+        elif default.is_scalar:
+            fillers[column.name] = (
+                lambda now, default=default: default.arg)
+    return fillers
+
+
+def prepare_records(table, records: list[dict]) -> list[tuple]:
+    """Turns records into tuples in table column order, filling in
+    defaults and converting text values.
+    """
+    columns = list(table.columns)
+    coercers = [_coercer(column) for column in columns]
+    fillers = _default_fillers(table)
+    now = datetime.utcnow()
+
+    rows = []
+    for record in records:
+        row = []
+        for column, coerce in zip(columns, coercers):
+            value = record.get(column.name)
+            if coerce is not None:
+                value = coerce(value)
+            if value is None and column.name in fillers:
+                value = fillers[column.name](now)
+            row.append(value)
+        rows.append(tuple(row))
+    return rows
+
+
+async def _batches(records, batch_size: int):
+    """Groups an (async) iterable into lists of batch_size."""
+    batch = []
+    if hasattr(records, '__aiter__'):
+        async for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    else:
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+# ---------------
+# Loading/Exports
+# ---------------
+
+
+async def copy_in(conn, table, records,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Loads records into a table with COPY.
+
+    Args:
+        conn:
+            A SQLAlchemy async connection.
+        table:
+            A table from schema.tables.
+        records:
+            An iterable (or async iterable) of dicts keyed by column name.
+            Missing columns are filled with their defaults.
+        batch_size:
+            Records per COPY.
+
+    Returns:
+        The number of records loaded.
+
+    Notes:
+        Each batch is its own COPY, so unless a transaction has been
+        begun on conn, batches are committed as they are loaded.
+    """
+    driver = await _driver_connection(conn)
+    columns = [column.name for column in table.columns]
+    n_loaded = 0
+    async for batch in _batches(records, batch_size):
+        await driver.copy_records_to_table(
+            table.name,
+            records=prepare_records(table, batch),
+            columns=columns,
+            schema_name=table.schema)
+        n_loaded += len(batch)
+    return n_loaded
+
+
+async def copy_out_csv(conn, table, output):
+    """Exports a table as CSV (with a header row) with COPY.
+
+    Args:
+        conn:
+            A SQLAlchemy async connection.
+        table:
+            A table from schema.tables.
+        output:
+            A path, a binary file-like object, or a coroutine function
+            that takes each chunk of bytes.
+    """
+    driver = await _driver_connection(conn)
+    columns = [column.name for column in table.columns]
+    query = 'SELECT {} FROM {}'.format(
+        ', '.join(f'"{column}"' for column in columns),
+        f'"{table.schema}"."{table.name}"' if table.schema
+        else f'"{table.name}"')
+    await driver.copy_from_query(
+        query, output=output, format='csv', header=True)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+async def copy_out_ndjson(conn, table, output,
+                          batch_size: int = DEFAULT_BATCH_SIZE):
+    """Exports a table as newline-delimited JSON.
+
+    Rows are read through a server-side cursor, as COPY's text format
+    would escape the JSON.
+
+    Args:
+        conn:
+            A SQLAlchemy async connection.
+        table:
+            A table from schema.tables.
+        output:
+            A text file-like object.
+    """
+    res = await conn.stream(table.select())
+    async for partition in res.partitions(batch_size):
+        output.write(''.join(
+            json.dumps(dict(r), default=_json_default) + '\n'
+            for r in partition))
+
+# ---
+# CLI
+# ---
+
+
+def _read_records(file, fmt: str):
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def _main(args):
+    table = get_table(args.table)
+    engine = create_async_engine(dbenv.POSTGRES_URL, poolclass=pool.NullPool)
+    try:
+        async with engine.connect() as conn:
+            if args.command == 'load':
+                file = (sys.stdin if args.file == '-'
+                        else open(args.file, newline=''))
+                with file:
+                    n_loaded = await copy_in(
+                        conn, table, _read_records(file, args.format),
+                        args.batch_size)
+                print(f'Loaded {n_loaded} rows into {table.name}',
+                      file=sys.stderr)
+            elif args.format == 'csv':
+                file = (sys.stdout.buffer if args.file == '-'
+                        else open(args.file, 'wb'))
+                with file:
+                    await copy_out_csv(conn, table, file)
+            else:
+                file = (sys.stdout if args.file == '-'
+                        else open(args.file, 'w'))
+                with file:
+                    await copy_out_ndjson(
+                        conn, table, file, args.batch_size)
+    finally:
+        await engine.dispose()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(
+        description='Bulk load or export schema tables.')
+    parser.add_argument('command', choices=['load', 'export'])
+    parser.add_argument('table', help='Name of a table in the schema')
+    parser.add_argument('file', help='File to read/write ("-" for stdin/out)')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
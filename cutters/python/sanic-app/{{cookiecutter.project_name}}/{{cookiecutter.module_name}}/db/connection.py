@@ -0,0 +1,152 @@
+"""Request-scoped database connections.
+
+Rather than each handler (or middleware) checking out its own
+connection from the pool, a request checks out at most one, on first
+use, and releases it when its response is sent. All repository calls
+made while handling the request then share that connection.
+
+Reads that don't need the latest writes can be routed to a read
+replica (see db.replicas) with get_connection(request, read_only=True).
+A request then has (at most) one replica connection too.
+"""
+import time
+import asyncio
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from {{cookiecutter.module_name}} import metrics
+from {{cookiecutter.module_name}}.log import db_logger
+from {{cookiecutter.module_name}}.db.repositories.loader import (
+    DataLoader,
+    table_loader)
+
+
+async def checkout(engine: AsyncEngine) -> AsyncConnection:
+    """Checks a connection out of the engine's pool.
+
+    The caller needs to close it when done.
+    """
+    started_at = time.perf_counter()
+    conn = engine.connect()
+    await conn.start()
+    metrics.db_pool_checkout_wait.observe(time.perf_counter() - started_at)
+    return conn
+
+
+async def checkout_read_only(app) -> AsyncConnection:
+    """Checks a connection out of a healthy replica's pool, or the
+    primary's if there are no healthy replicas (see db.replicas).
+
+    Replicas that fail to give a connection are marked unhealthy, and
+    another one (or the primary) is tried. The caller needs to close
+    the connection when done.
+    """
+    replicas = getattr(app.ctx, 'replicas', None)
+    while replicas:
+        engine = replicas.choose()
+        if engine is None:
+            break
+        try:
+            return await checkout(engine)
+        except Exception as exp:
+            replicas.set_healthy(
+                engine, False, f'{type(exp).__name__}: {exp}')
+    return await checkout(app.ctx.db)
+
+
+def init_connection(request):
+    """Sets up the request for lazily checking out a connection."""
+    request.ctx.conn = None
+    request.ctx.read_conn = None
+    request.ctx.loaders = {}
+
+
+async def get_connection(request, transaction: bool = False,
+                         read_only: bool = False) -> AsyncConnection:
+    """Gets the request's connection, checking it out on first use.
+
+    Args:
+        request:
+            The current request.
+        transaction:
+            If True, make sure a transaction has been begun. It will be
+            committed when the response is sent (or rolled back if the
+            response is an error).
+        read_only:
+            If True, the connection is only used for reads that may be
+            slightly stale, so may be a replica's (see
+            checkout_read_only). Once the request has used the primary
+            its reads stay there, so that it reads its own writes.
+
+    Notes:
+        Don't use this in handlers that stream their response. Response
+        middleware (which releases the connection) runs when streaming
+        starts, not when it ends.
+    """
+    conn = request.ctx.conn
+    if conn is None and read_only:
+        conn = request.ctx.read_conn
+        if conn is None:
+            conn = await checkout_read_only(request.app)
+            request.ctx.read_conn = conn
+    elif conn is None:
+        conn = await checkout(request.app.ctx.db)
+        request.ctx.conn = conn
+    if transaction and not conn.in_transaction():
+        await conn.begin()
+    return conn
+
+
+async def get_loader(request, table: sa.Table, key: str = 'id',
+                     many: bool = False,
+                     columns: list[str] = None) -> DataLoader:
+    """Gets the request's loader of a table's rows (see
+    repositories.loader.table_loader), making it on first use.
+
+    Loaders (and so their caches) last until the response is sent.
+    They use the request's connection (a replica's, unless the request
+    has used the primary), so their loads shouldn't run concurrently
+    with other queries of the request.
+    """
+    loader_key = (table.name, key, many, tuple(columns or ()))
+    loader = request.ctx.loaders.get(loader_key)
+    if loader is None:
+        conn = await get_connection(request, read_only=True)
+        if not request.ctx.loaders:
+            request.ctx.loader_lock = asyncio.Lock()
+        loader = table_loader(
+            conn, table, key, many, columns,
+            lock=request.ctx.loader_lock)
+        request.ctx.loaders[loader_key] = loader
+    return loader
+
+
+async def release_connection(request, response=None):
+    """Releases the request's connections back to their pools, if it has
+    any.
+
+    Any transaction still open is committed if the response was
+    successful, and rolled back otherwise.
+    """
+    request.ctx.loaders = {}
+    read_conn = getattr(request.ctx, 'read_conn', None)
+    if read_conn is not None:
+        request.ctx.read_conn = None
+        try:
+            # Nothing to commit, as replicas are read only.
+            await read_conn.close()
+        except Exception as exp:
+            db_logger.exception(exp)
+
+    conn = getattr(request.ctx, 'conn', None)
+    if conn is None:
+        return
+
+    request.ctx.conn = None
+    try:
+        if conn.in_transaction():
+            if response is not None and response.status < 400:
+                await conn.commit()
+            else:
+                await conn.rollback()
+    finally:
+        await conn.close()
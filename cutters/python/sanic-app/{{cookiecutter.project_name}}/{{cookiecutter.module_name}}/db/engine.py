@@ -0,0 +1,81 @@
+"""Creation and lifecycle of the app's database engine."""
+import asyncio
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from {{cookiecutter.module_name}}.db import env as dbenv
+from {{cookiecutter.module_name}}.db import querylog
+from {{cookiecutter.module_name}}.log import db_logger
+from {{cookiecutter.module_name}} import metrics
+
+
+def create_engine(url: str = dbenv.POSTGRES_URL) -> AsyncEngine:
+    """Creates an engine with the pool settings from db.env."""
+    return create_async_engine(
+        url,
+        pool_size=dbenv.DB_POOL_SIZE,
+        max_overflow=dbenv.DB_POOL_MAX_OVERFLOW,
+        pool_timeout=dbenv.DB_POOL_TIMEOUT,
+        pool_recycle=dbenv.DB_POOL_RECYCLE,
+        pool_pre_ping=dbenv.DB_POOL_PRE_PING,
+        query_cache_size=dbenv.DB_COMPILED_CACHE_SIZE,
+        connect_args={
+            'prepared_statement_cache_size': dbenv.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+
+
+async def warm_up(engine: AsyncEngine, n_connections: int):
+    """Opens connections up front so that they are pooled.
+
+    This moves the cost of connection setup from the first requests
+    a worker serves to its startup.
+
+    Notes:
+        At most pool_size connections are opened, as any more would
+        be closed again on release.
+    """
+    n_connections = min(n_connections, engine.pool.size())
+    if n_connections <= 0:
+        return
+
+    conns = [engine.connect() for _ in range(n_connections)]
+    await asyncio.gather(*[conn.start() for conn in conns])
+    await asyncio.gather(*[conn.close() for conn in conns])
+    db_logger.info(f'Warmed up {n_connections} database connections')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    context._started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    elapsed = time.perf_counter() - context._started_at
+    metrics.db_statement_duration.observe(
+        elapsed, operation=metrics.operation(statement))
+    querylog.record(
+        conn, statement, parameters, context, executemany, elapsed)
+
+
+def instrument(engine: AsyncEngine, watch_pool: bool = True):
+    """Records statement timings and pool usage in the app's metrics,
+    and statements in the slow-query log (see db.querylog).
+
+    Safe to call more than once for the same engine.
+
+    Args:
+        watch_pool:
+            Report the engine's pool usage. Only one pool (the
+            primary's) can be reported.
+    """
+    sync_engine = engine.sync_engine
+    if not event.contains(
+            sync_engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(
+            sync_engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(
+            sync_engine, 'after_cursor_execute', _after_cursor_execute)
+    if watch_pool:
+        metrics.watch_pool(engine.pool)
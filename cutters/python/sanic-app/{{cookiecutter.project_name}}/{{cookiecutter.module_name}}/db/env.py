@@ -1,4 +1,5 @@
 import os
+from {{cookiecutter.module_name}}.env import IS_DEBUG, _flag
 
 DB_HOST = 'db'
 
@@ -7,3 +8,68 @@ POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'password')
 POSTGRES_DB = os.getenv('POSTGRES_DB', 'postgres')
 
 POSTGRES_URL = f'postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_HOST}/{POSTGRES_DB}'
+
+# Hosts of streaming read replicas of the primary (comma separated, e.g.
+# 'db-replica-1,db-replica-2'), with the same database and credentials.
+# Reads that allow it are routed to them (see db.replicas).
+DB_REPLICA_HOSTS = [
+    host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',')
+    if host.strip()
+]
+POSTGRES_REPLICA_URLS = [
+    f'postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{host}/{POSTGRES_DB}'
+    for host in DB_REPLICA_HOSTS
+]
+# Seconds between replica health checks.
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+# Replicas lagging further behind the primary than this many seconds
+# stop serving reads (-1 for no limit).
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 10))
+
+# Connection pool settings (per worker process).
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+# Seconds after which connections are replaced (-1 to never recycle).
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+# Test connections on checkout (costs a round trip per checkout).
+DB_POOL_PRE_PING = _flag('DB_POOL_PRE_PING', False)
+# Connections to open before the server starts accepting requests.
+DB_POOL_WARMUP = int(os.getenv('DB_POOL_WARMUP', 0))
+# Size of asyncpg's per-connection prepared statement cache.
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+# Size of SQLAlchemy's cache of compiled statements (per engine). It
+# should hold every distinct statement the repositories run, so that
+# each is compiled (and prepared by asyncpg) only once per connection.
+DB_COMPILED_CACHE_SIZE = int(os.getenv('DB_COMPILED_CACHE_SIZE', 500))
+# Most rows to insert in a single multi-row INSERT.
+DB_MAX_INSERT_BATCH_SIZE = int(os.getenv('DB_MAX_INSERT_BATCH_SIZE', 1000))
+
+# Write-behind queues (see db.writebehind), which inserts asked to be done
+# asynchronously (with a 'Prefer: respond-async' header) wait in before
+# being inserted in batches of up to DB_MAX_INSERT_BATCH_SIZE rows. The
+# most rows queued (per worker process) before requests are turned away
+# (0, the default, disables write-behind), and the most seconds a row
+# waits for a batch to fill up.
+DB_WRITE_BEHIND_QUEUE_SIZE = int(os.getenv('DB_WRITE_BEHIND_QUEUE_SIZE', 0))
+DB_WRITE_BEHIND_FLUSH_INTERVAL = float(
+    os.getenv('DB_WRITE_BEHIND_FLUSH_INTERVAL', 0.05))
+
+# Read-through cache of single rows (per worker process).
+# Set DB_CACHE_MAX_ENTRIES to 0 to disable.
+DB_CACHE_MAX_ENTRIES = int(os.getenv('DB_CACHE_MAX_ENTRIES', 10000))
+DB_CACHE_TTL = float(os.getenv('DB_CACHE_TTL', 60))
+
+# How to count rows for listings' meta.count and offset pagination links
+# ('exact', 'estimate' or 'none', see db.repositories.counts), and how
+# long exact counts are cached.
+DB_COUNT_STRATEGY = os.getenv('DB_COUNT_STRATEGY', 'exact').lower()
+if DB_COUNT_STRATEGY not in ('exact', 'estimate', 'none'):
+    raise ValueError(f'Unknown DB_COUNT_STRATEGY "{DB_COUNT_STRATEGY}"')
+DB_COUNT_TTL = float(os.getenv('DB_COUNT_TTL', 30))
+
+# Statements taking longer than this many ms are logged to db_logger.
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 100))
+# Also log the EXPLAIN (ANALYZE, BUFFERS) plan of slow SELECTs. This runs
+# them a second time, so is only on by default in development.
+DB_EXPLAIN_SLOW_QUERIES = _flag('DB_EXPLAIN_SLOW_QUERIES', IS_DEBUG)
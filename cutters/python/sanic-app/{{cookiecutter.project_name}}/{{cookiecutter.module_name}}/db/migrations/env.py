@@ -6,6 +6,8 @@ from alembic import context
 
 import {{cookiecutter.module_name}}.db.env as dbenv
 from {{cookiecutter.module_name}}.db import schema
+# Index ops on existing tables are made concurrent (see db.autogen).
+from {{cookiecutter.module_name}}.db.autogen import process_revision_directives
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -47,6 +49,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={'paramstyle': 'named'},
+        process_revision_directives=process_revision_directives,
     )
 
     with context.begin_transaction():
@@ -54,7 +57,11 @@ def run_migrations_offline() -> None:
 
 
 def do_migrations(connection):
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        process_revision_directives=process_revision_directives,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
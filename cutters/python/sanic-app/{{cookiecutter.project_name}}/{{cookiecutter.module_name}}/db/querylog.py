@@ -0,0 +1,125 @@
+"""Slow-query log and per-request database timings.
+
+db.engine.instrument hooks these into the engine, so that every
+statement the repositories run is timed. Statements slower than
+DB_SLOW_QUERY_MS are logged to db_logger, with their SQL normalized
+(literals and placeholders replaced by ?) so that the same query always
+logs the same way, and the shape (types) of their parameters rather
+than the values.
+
+Totals per request (number of statements and time spent in them) are
+kept in a context variable, so that they can be reported in a
+Server-Timing header. A high count for a single request usually means
+an N+1 pattern, and a slow statement a missing index.
+"""
+import re
+from contextvars import ContextVar
+from {{cookiecutter.module_name}}.db import env as dbenv
+from {{cookiecutter.module_name}}.log import db_logger
+
+
+class QueryStats:
+    """Totals of the statements run while handling a request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, duration: float):
+        self.count += 1
+        self.duration += duration
+
+
+_request_stats: ContextVar[QueryStats] = ContextVar('query_stats')
+
+
+def start_request() -> QueryStats:
+    """Starts collecting totals for the current request (or task)."""
+    stats = QueryStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def request_stats() -> QueryStats:
+    """Gets the totals for the current request, or None if not collecting."""
+    return _request_stats.get(None)
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'\$\d+|%\(\w+\)s|(?<!:):\w+\b')
+_REPEATED_GROUP_RE = re.compile(r'(\([?, ]+\))(?:\s*,\s*\1)+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(statement: str) -> str:
+    """Normalizes a statement, so that statements differing only in
+    their values (or number of rows inserted) are the same.
+    """
+    sql = _SPACE_RE.sub(' ', statement).strip()
+    sql = _STRING_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _REPEATED_GROUP_RE.sub(r'\1, ...', sql)
+
+
+def parameter_shape(parameters, executemany: bool = False) -> str:
+    """Describes parameters by their types, e.g. "(str, int)"."""
+    if executemany:
+        parameters = list(parameters or [])
+        first = parameter_shape(parameters[0]) if parameters else '()'
+        return f'{len(parameters)} x {first}'
+
+    if isinstance(parameters, dict):
+        types = [f'{key}: {type(value).__name__}'
+                 for key, value in parameters.items()]
+    else:
+        types = [type(value).__name__ for value in parameters or ()]
+    return '(' + ', '.join(types) + ')'
+
+
+def explain(cursor, statement: str, parameters) -> str:
+    """Gets the plan of a statement, running it again to do so.
+
+    This runs in a savepoint, so that a failure doesn't abort the
+    transaction the statement was run in.
+    """
+    cursor.execute('SAVEPOINT explain_slow_query')
+    try:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + statement, parameters)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+    except Exception:
+        cursor.execute('ROLLBACK TO SAVEPOINT explain_slow_query')
+        raise
+    cursor.execute('RELEASE SAVEPOINT explain_slow_query')
+    return plan
+
+
+def record(conn, statement: str, parameters, context, executemany: bool,
+           duration: float):
+    """Adds a statement to the request totals, and logs it if slow."""
+    stats = request_stats()
+    if stats is not None:
+        stats.add(duration)
+
+    if duration * 1000 < dbenv.DB_SLOW_QUERY_MS:
+        return
+
+    db_logger.warning(
+        f'Slow query ({duration * 1000:.1f} ms): {normalize_sql(statement)} '
+        f'params={parameter_shape(parameters, executemany)}')
+
+    # ANALYZE runs the statement again, so only do it for plain SELECTs
+    # (and not for server-side cursors, which are still being read).
+    if (dbenv.DB_EXPLAIN_SLOW_QUERIES
+            and not executemany
+            and not context._is_server_side
+            and statement.lstrip()[:6].upper() == 'SELECT'):
+        cursor = conn.connection.cursor()
+        try:
+            plan = explain(cursor, statement, parameters)
+            db_logger.warning(f'Query plan:\n{plan}')
+        except Exception as exp:
+            db_logger.warning(f'Could not explain slow query: {exp}')
+        finally:
+            cursor.close()
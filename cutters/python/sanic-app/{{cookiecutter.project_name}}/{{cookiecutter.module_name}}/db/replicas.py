@@ -0,0 +1,127 @@
+"""Read replicas, and routing reads to them.
+
+The app keeps an engine per replica (see db.env.DB_REPLICA_HOSTS) in a
+ReplicaSet on app.ctx.replicas. Reads that allow it (see
+db.connection.get_connection's read_only arg) are spread over the
+healthy replicas, and go to the primary while there are none, so the
+app keeps working (if busier) when replicas fail.
+
+Replicas are checked every DB_REPLICA_CHECK_INTERVAL seconds. A replica
+is unhealthy if it can't be queried, or lags the primary by more than
+DB_REPLICA_MAX_LAG seconds. A replica that fails when a connection is
+checked out from it is marked unhealthy straight away, until the next
+check finds it healthy again.
+
+Replicas are behind the primary (if only slightly), so reads that must
+see the latest writes (e.g. a request's own) need to use the primary.
+"""
+import asyncio
+import itertools
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine
+from {{cookiecutter.module_name}}.db import env as dbenv
+from {{cookiecutter.module_name}}.db import engine as dbengine
+from {{cookiecutter.module_name}}.log import db_logger
+from {{cookiecutter.module_name}} import metrics
+
+# Seconds the replica's replayed state is behind the primary. A replica
+# that has replayed everything it received isn't lagging, however long
+# ago the last write was.
+LAG_QUERY = sa.text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+        THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM
+            now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaSet:
+    """The engines of the read replicas, and which of them are healthy.
+
+    Args:
+        engines:
+            The replicas' engines.
+        max_lag:
+            The most seconds a replica may lag the primary by and still
+            be healthy (-1 for no limit).
+    """
+
+    def __init__(self, engines: list[AsyncEngine],
+                 max_lag: float = dbenv.DB_REPLICA_MAX_LAG):
+        self.engines = list(engines)
+        self.max_lag = max_lag
+        # Healthy until a check says otherwise.
+        self._healthy = set(range(len(self.engines)))
+        self._turns = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def healthy(self) -> list[AsyncEngine]:
+        """The engines of the healthy replicas."""
+        return [
+            engine for i, engine in enumerate(self.engines)
+            if i in self._healthy
+        ]
+
+    def choose(self) -> AsyncEngine:
+        """Picks a healthy replica (in turn), or None if there are none."""
+        healthy = self.healthy()
+        if not healthy:
+            return None
+        return healthy[next(self._turns) % len(healthy)]
+
+    def set_healthy(self, engine: AsyncEngine, healthy: bool,
+                    reason: str = ''):
+        """Marks a replica as (un)healthy, logging changes."""
+        i = self.engines.index(engine)
+        if healthy == (i in self._healthy):
+            return
+        host = engine.url.host
+        if healthy:
+            self._healthy.add(i)
+            db_logger.info(f'Replica {host} is healthy again')
+        else:
+            self._healthy.discard(i)
+            db_logger.warning(f'Replica {host} is unhealthy: {reason}')
+
+    async def check(self, engine: AsyncEngine):
+        """Checks the health of a replica."""
+        try:
+            async with engine.connect() as conn:
+                lag = (await conn.execute(LAG_QUERY)).scalar()
+        except Exception as exp:
+            self.set_healthy(engine, False, f'{type(exp).__name__}: {exp}')
+            return
+        if 0 <= self.max_lag < lag:
+            self.set_healthy(engine, False, f'lagging by {lag:.1f}s')
+        else:
+            self.set_healthy(engine, True)
+
+    async def check_all(self):
+        """Checks the health of every replica."""
+        await asyncio.gather(*[self.check(engine) for engine in self.engines])
+
+    async def monitor(self, interval: float = dbenv.DB_REPLICA_CHECK_INTERVAL):
+        """Checks the replicas every interval seconds, until cancelled."""
+        while True:
+            await self.check_all()
+            await asyncio.sleep(interval)
+
+    async def dispose(self):
+        """Closes the replicas' pooled connections."""
+        await asyncio.gather(*[engine.dispose() for engine in self.engines])
+
+
+def create_replica_set(urls: list[str] = None) -> ReplicaSet:
+    """Creates a ReplicaSet with an engine per url (see
+    db.env.POSTGRES_REPLICA_URLS), with the pool settings from db.env.
+    """
+    if urls is None:
+        urls = dbenv.POSTGRES_REPLICA_URLS
+    replicas = ReplicaSet([dbengine.create_engine(url) for url in urls])
+    metrics.watch_replicas(replicas)
+    return replicas
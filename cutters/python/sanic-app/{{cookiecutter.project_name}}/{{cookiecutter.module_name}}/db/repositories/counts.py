@@ -0,0 +1,80 @@
+"""Row counts for repository tables.
+
+COUNT(*) has to scan the whole table in Postgres, so counting on every
+request is expensive for big tables. Counts are instead given by one of
+these strategies (see db.env.DB_COUNT_STRATEGY):
+
+    exact:      COUNT(*), cached per worker for DB_COUNT_TTL seconds (so
+                it lags behind writes by up to that long).
+    estimate:   The planner's estimate from pg_class.reltuples (kept up to
+                date by autovacuum/analyze). Falls back to 'exact' for
+                tables that have never been analyzed.
+    none:       No count.
+"""
+import sqlalchemy as sa
+from {{cookiecutter.module_name}}.db import env as dbenv
+from {{cookiecutter.module_name}}.cache import LRUCache
+from {{cookiecutter.module_name}} import metrics
+
+EXACT = 'exact'
+ESTIMATE = 'estimate'
+NONE = 'none'
+
+STRATEGIES = (EXACT, ESTIMATE, NONE)
+
+_exact_counts = LRUCache(max_entries=1024, ttl=dbenv.DB_COUNT_TTL)
+metrics.watch_cache('row_counts', _exact_counts)
+
+
+def _cache_key(table) -> str:
+    return f'{table.schema}.{table.name}' if table.schema else table.name
+
+
+async def _estimate_rows(conn, table) -> int:
+    stmt = sa.text(
+        'SELECT reltuples::bigint FROM pg_class '
+        'WHERE oid = to_regclass(:table_name)')
+    res = await conn.execute(stmt, {'table_name': _cache_key(table)})
+    estimate = res.scalar()
+    # Tables that have never been analyzed have no estimate
+    # (reltuples is -1, or 0 before Postgres 14).
+    if estimate is None or estimate <= 0:
+        return None
+    return estimate
+
+
+async def _exact_rows(conn, table) -> int:
+    key = _cache_key(table)
+    count = await _exact_counts.get(key)
+    if count is None:
+        stmt = sa.select(sa.func.count()).select_from(table)
+        res = await conn.execute(stmt)
+        count = res.scalar()
+        await _exact_counts.set(key, count)
+    return count
+
+
+async def count_rows(conn, table,
+                     strategy: str = dbenv.DB_COUNT_STRATEGY) -> int:
+    """Counts the rows of a table.
+
+    Returns:
+        The (possibly approximate) number of rows, or None
+        if the strategy is 'none'.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown count strategy "{strategy}"')
+    if strategy == NONE:
+        return None
+
+    if strategy == ESTIMATE:
+        estimate = await _estimate_rows(conn, table)
+        if estimate is not None:
+            return estimate
+
+    return await _exact_rows(conn, table)
+
+
+async def invalidate(table):
+    """Drops the cached exact count of a table (e.g. after clearing it)."""
+    await _exact_counts.delete(_cache_key(table))
@@ -1,36 +1,314 @@
+import uuid
+import functools
 from {{cookiecutter.module_name}}.db import schema
+from {{cookiecutter.module_name}}.db import env as dbenv
+from {{cookiecutter.module_name}}.cache import CacheBackend, LRUCache
+from {{cookiecutter.module_name}} import metrics
+from {{cookiecutter.module_name}}.db.repositories import counts
+from {{cookiecutter.module_name}}.db.repositories.pagination import (
+    keyset_statement,
+    keyset_shape,
+    keyset_params,
+    split_page)
+import sqlalchemy as sa
 from sqlalchemy import literal_column
 
+# Read-through cache for get_greeting, kept up to date by greetings_added.
+# Assign another CacheBackend to this to use a shared cache (and pass it
+# to metrics.watch_cache too).
+greeting_cache: CacheBackend = LRUCache(
+    dbenv.DB_CACHE_MAX_ENTRIES, dbenv.DB_CACHE_TTL)
+metrics.watch_cache('greetings', greeting_cache)
 
-async def get_greetings(conn, offset: int = 0, limit: int = 20) -> list[dict]:
-    """List all greetings that have occurred."""
-    stmt = schema.greetings.select()
-    stmt = stmt.offset(offset).limit(limit)
-    res = await conn.execute(stmt)
+
+# Names of the columns of a greeting, in order.
+COLUMNS = [column.name for column in schema.greetings.columns]
+
+
+def _select(columns: list[str] = None):
+    if columns is None:
+        return schema.greetings.select()
+    return sa.select(*[schema.greetings.c[name] for name in columns])
+
+
+# Statements are built once (or once per shape, for those depending on
+# args) with their values as bind parameters, rather than on every call.
+# Their SQL is then always the same, so they're compiled once per engine
+# (see db.env.DB_COMPILED_CACHE_SIZE) and prepared once per connection
+# (see db.env.DB_STATEMENT_CACHE_SIZE).
+
+
+@functools.lru_cache(maxsize=128)
+def _offset_statement(columns: tuple):
+    return (
+        _select(columns)
+        .order_by(schema.greetings.c.created_at, schema.greetings.c.id)
+        .offset(sa.bindparam('offset', type_=sa.Integer))
+        .limit(sa.bindparam('limit', type_=sa.Integer))
+    )
+
+
+_GET_GREETINGS = _offset_statement(None)
+
+_GET_GREETING = (
+    schema.greetings.select()
+    .where(schema.greetings.c.id == sa.bindparam('id'))
+    .limit(1)
+)
+
+_GET_GREETING_VERSION = (
+    sa.select(schema.greetings.c.id, schema.greetings.c.updated_at)
+    .where(schema.greetings.c.id == sa.bindparam('id'))
+)
+
+_ADD_GREETING = schema.greetings.insert().returning(literal_column('*'))
+
+# asyncpg's limit on the bind parameters of a single statement.
+_MAX_PARAMS = 32767
+
+
+def _params_per_row(keys) -> int:
+    """The bind parameters a row inserted with these keys takes: one per
+    value, and one per Python-side default (e.g. a made up id) of the
+    columns it leaves out.
+    """
+    defaults = [
+        column for column in schema.greetings.columns
+        if column.name not in keys and column.default is not None
+        and not column.default.is_clause_element
+    ]
+    return len(keys) + len(defaults)
+
+
+def _batch_sizes(n_rows: int, max_rows: int):
+    """Splits n_rows into batches of power of two sizes, at most
+    max_rows each, so inserts only ever take a few shapes.
+    """
+    largest = 1 << (max_rows.bit_length() - 1)
+    while n_rows > 0:
+        size = min(largest, 1 << (n_rows.bit_length() - 1))
+        yield size
+        n_rows -= size
+
+
+@functools.lru_cache(maxsize=128)
+def _add_greetings_statement(keys: tuple, rows: int):
+    # Multi-row inserts aren't in SQLAlchemy's compiled cache, but the
+    # same statement always compiles to the same SQL, so it's only
+    # prepared once per connection.
+    values = [
+        {
+            key: sa.bindparam(f'{key}_{i}', type_=schema.greetings.c[key].type)
+            for key in keys
+        }
+        for i in range(rows)
+    ]
+    return (
+        schema.greetings.insert()
+        .values(values)
+        .returning(literal_column('*'))
+    )
+
+
+@functools.lru_cache(maxsize=128)
+def _keyset_statement(columns: tuple, backwards: bool, from_key: bool,
+                      limit: bool):
+    return keyset_statement(
+        _select(columns), schema.greetings, backwards, from_key, limit)
+
+
+def _cache_key(id) -> str:
+    # Normalised, so that e.g. upper and lower case ids share an entry.
+    if not isinstance(id, uuid.UUID):
+        id = uuid.UUID(str(id))
+    return str(id)
+
+
+async def _cache_greeting(greeting: dict):
+    await greeting_cache.set(_cache_key(greeting['id']), greeting)
+
+
+async def get_greetings(conn, offset: int = 0, limit: int = 20,
+                        columns: list[str] = None) -> list[dict]:
+    """List all greetings that have occurred (using offset pagination).
+
+    Args:
+        columns:
+            Names of the columns to select (all by default).
+    """
+    columns = tuple(columns) if columns is not None else None
+    res = await conn.execute(
+        _offset_statement(columns), {'offset': offset, 'limit': limit})
     return [dict(r) for r in res.all()]
 
 
-async def get_greeting(conn, id: str) -> dict:
-    """Get a specific greeting"""
-    stmt = schema.greetings.select()
-    stmt = stmt.where(schema.greetings.c.id == str(id))
-    stmt = stmt.limit(1)
-    res = await conn.execute(stmt)
+async def count_greetings(conn) -> int:
+    """Count greetings (see counts.count_rows)."""
+    return await counts.count_rows(conn, schema.greetings)
+
+
+async def get_greetings_page(conn, cursor=None, limit: int = 20,
+                             columns: list[str] = None) -> tuple[list[dict], bool]:
+    """List a page of greetings using keyset pagination.
+
+    Args:
+        columns:
+            Names of the columns to select (all by default). The
+            'id' and 'created_at' columns are needed for pagination
+            links, so should always be included.
+
+    Returns:
+        The greetings, and whether there are more beyond the page.
+    """
+    columns = tuple(columns) if columns is not None else None
+    stmt = _keyset_statement(columns, *keyset_shape(cursor), True)
+    # One more row than the page, to tell if there are more.
+    res = await conn.execute(stmt, keyset_params(cursor, limit + 1))
+    return split_page([dict(r) for r in res.all()], cursor, limit)
+
+
+async def stream_greetings(conn, cursor=None, limit: int = None,
+                           columns: list[str] = None):
+    """Stream greetings in keyset order.
+
+    Rows are read through a server-side cursor, so memory use does
+    not grow with the limit.
+
+    Args:
+        columns:
+            Names of the columns to select (all by default).
+
+    Notes:
+        This is an async generator, and the connection must stay
+        open until it is exhausted. Unlike get_greetings_page,
+        backwards cursors yield rows in descending order.
+    """
+    columns = tuple(columns) if columns is not None else None
+    stmt = _keyset_statement(
+        columns, *keyset_shape(cursor), limit is not None)
+    res = await conn.stream(stmt, keyset_params(cursor, limit))
+    async for r in res:
+        yield dict(r)
+
+
+async def get_greeting(conn, id: str, use_cache: bool = True) -> dict:
+    """Get a specific greeting
+
+    Greetings are read through greeting_cache, unless use_cache is False.
+    """
+    if use_cache:
+        greeting = await greeting_cache.get(_cache_key(id))
+        if greeting is not None:
+            # Copied so that callers can't change the cached value.
+            return dict(greeting)
+
+    res = await conn.execute(_GET_GREETING, {'id': str(id)})
+    res = res.first()
+    if res is not None:
+        greeting = dict(res)
+        await _cache_greeting(greeting)
+        return dict(greeting)
+
+
+async def get_greeting_version(conn, id: str,
+                               use_cache: bool = True) -> dict:
+    """Get just the id and updated_at of a greeting.
+
+    This is a cheap way to check whether a requestor's copy of a
+    greeting is current (see utils.is_not_modified). The version of
+    the greeting in greeting_cache is used if it's there (unless
+    use_cache is False), so only cache misses are queried.
+    """
+    if use_cache:
+        greeting = await greeting_cache.get(_cache_key(id))
+        if greeting is not None:
+            return {
+                'id': greeting['id'],
+                'updated_at': greeting['updated_at'],
+            }
+
+    res = await conn.execute(_GET_GREETING_VERSION, {'id': str(id)})
     res = res.first()
     if res is not None:
         return dict(res)
 
 
 async def add_greeting(conn, name: str, greeting: str) -> dict:
-    """Add a new greeting"""
-    stmt = schema.greetings.insert()
-    stmt = stmt.returning(literal_column('*'))
+    """Add a new greeting.
+
+    The caller owns the transaction: once it's committed, pass the new
+    greeting to greetings_added.
+    """
     data = {
         'name': name,
         'message': greeting,
     }
-    res = await conn.execute(stmt, data)
-    await conn.commit()
+    res = await conn.execute(_ADD_GREETING, data)
     res = res.first()
     if res is not None:
         return dict(res)
+
+
+def new_greeting(name: str, greeting: str) -> dict:
+    """Makes the columns of a greeting to be added later (e.g. by a
+    write-behind queue), with its id made up front.
+    """
+    return {
+        'id': schema.new_id(schema.greetings),
+        'name': name,
+        'message': greeting,
+    }
+
+
+async def add_greetings(conn, items: list[dict]) -> list[dict]:
+    """Add many greetings with multi-row INSERT ... RETURNINGs.
+
+    Each row takes a bind parameter per column (see _params_per_row),
+    so the rows are split into batches that stay under asyncpg's
+    parameter limit. Batches have power of two sizes (see _batch_sizes),
+    so a connection only prepares a few insert statements.
+
+    Args:
+        conn:
+            The connection to insert with.
+        items:
+            Dicts of greeting columns ('name' and 'message', and
+            'id' if made up front, see new_greeting).
+            All dicts should have the same keys.
+
+    Returns:
+        The new greetings, in the same order as items.
+
+    The caller owns the transaction: once it's committed, pass the new
+    greetings to greetings_added.
+    """
+    if len(items) == 0:
+        return []
+
+    keys = tuple(items[0])
+    max_rows = _MAX_PARAMS // _params_per_row(keys)
+    greetings = []
+    start = 0
+    for size in _batch_sizes(len(items), max_rows):
+        stmt = _add_greetings_statement(keys, size)
+        params = {
+            f'{key}_{i}': item[key]
+            for i, item in enumerate(items[start:start + size])
+            for key in keys
+        }
+        res = await conn.execute(stmt, params)
+        greetings.extend(dict(r) for r in res.all())
+        start += size
+    return greetings
+
+
+async def greetings_added(greetings: list[dict]):
+    """Caches greetings added by add_greeting(s), once their transaction
+    has been committed (so that nothing rolled back is cached).
+
+    The cached greeting count is left to expire (see DB_COUNT_TTL):
+    dropping it on every insert would make almost every list request
+    count the whole table under steady writes.
+    """
+    for greeting in greetings:
+        await _cache_greeting(dict(greeting))
@@ -0,0 +1,167 @@
+"""Batched loading of related rows.
+
+Filling the relationships of a page of rows one parent at a time takes
+a query per row (the N+1 problem). A DataLoader instead collects the
+keys asked for while a page is being built, and loads them all in one
+query per table on the next turn of the event loop, e.g.
+
+    towns = table_loader(conn, schema.towns)
+    await load_related(towns, people, 'town_id', 'town')
+
+Results are cached by the loader, so the same key is only loaded once.
+Loaders are meant to live for a single request (see
+db.connection.get_loader), so the cache never goes stale for long.
+"""
+import asyncio
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+
+
+class DataLoader:
+    """Batches and caches loads of values by key.
+
+    Args:
+        batch_load:
+            An async function taking a list of (distinct) keys, and
+            returning a list of their values in the same order.
+        max_batch_size:
+            The most keys to pass to batch_load at once.
+        lock:
+            Held while batch_load runs. Loaders sharing a connection
+            should share a lock, as a connection runs one query at a
+            time.
+    """
+
+    def __init__(self, batch_load, max_batch_size: int = None,
+                 lock: asyncio.Lock = None):
+        self._batch_load = batch_load
+        self._max_batch_size = max_batch_size
+        self._lock = lock or asyncio.Lock()
+        self._futures = {}
+        self._queue = []
+        self.batches = 0
+
+    async def load(self, key):
+        """Loads the value of a key."""
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            if not self._queue:
+                # Dispatch once the current callers have all had a
+                # chance to ask for their keys.
+                loop.call_soon(self._dispatch)
+            self._queue.append((key, future))
+        # Shielded, so that one cancelled caller doesn't cancel the
+        # load for all others waiting on the same key.
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: list) -> list:
+        """Loads the values of keys (in one batch)."""
+        return await asyncio.gather(*[self.load(key) for key in keys])
+
+    def prime(self, key, value):
+        """Caches a value (e.g. of a row just written)."""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._futures[key] = future
+
+    def clear(self, key=None):
+        """Drops a key (or all keys) from the cache."""
+        if key is None:
+            self._futures = {}
+        else:
+            self._futures.pop(key, None)
+
+    def _dispatch(self):
+        queue, self._queue = self._queue, []
+        asyncio.ensure_future(self._load_batches(queue))
+
+    async def _load_batches(self, queue: list[tuple]):
+        size = self._max_batch_size or len(queue)
+        for i in range(0, len(queue), size):
+            batch, futures = zip(*queue[i:i + size])
+            batch = list(batch)
+            try:
+                async with self._lock:
+                    self.batches += 1
+                    values = await self._batch_load(batch)
+                if len(values) != len(batch):
+                    raise ValueError(
+                        'batch_load should give one value per key')
+            except Exception as exp:
+                for key, future in zip(batch, futures):
+                    # Not cached, so that the key can be loaded again.
+                    if self._futures.get(key) is future:
+                        del self._futures[key]
+                    if not future.done():
+                        future.set_exception(exp)
+                continue
+
+            for future, value in zip(futures, values):
+                if not future.done():
+                    future.set_result(value)
+
+
+def keys_query(table: sa.Table, key: str = 'id', columns: list[str] = None):
+    """Selects the rows of a table whose key column is in :keys."""
+    key_column = table.c[key]
+    if columns is None:
+        stmt = sa.select(table)
+    else:
+        stmt = sa.select(*[
+            table.c[name] for name in dict.fromkeys([key, *columns])
+        ])
+    return stmt.where(key_column == sa.any_(
+        sa.bindparam('keys', type_=ARRAY(key_column.type))))
+
+
+def table_loader(conn, table: sa.Table, key: str = 'id', many: bool = False,
+                 columns: list[str] = None, **kwargs) -> DataLoader:
+    """Makes a loader of a table's rows, by the values of a column.
+
+    Each batch is loaded with a single WHERE <key> = ANY(:keys) query.
+    Keys need to be of the column's python type (e.g. uuid.UUID for
+    ids), to match the loaded rows.
+
+    Args:
+        key:
+            The column to load rows by.
+        many:
+            Load lists of rows per key (e.g. by a foreign key column),
+            rather than the single row (or None) per key.
+        columns:
+            Names of the columns to select (all by default). The key
+            column is always selected.
+        kwargs:
+            Passed on to DataLoader.
+    """
+    stmt = keys_query(table, key, columns)
+
+    async def batch_load(keys: list) -> list:
+        res = await conn.execute(stmt, {'keys': keys})
+        rows = [dict(r) for r in res.all()]
+        if many:
+            grouped = {k: [] for k in keys}
+            for row in rows:
+                grouped.get(row[key], []).append(row)
+            return [grouped[k] for k in keys]
+        by_key = {row[key]: row for row in rows}
+        return [by_key.get(k) for k in keys]
+
+    return DataLoader(batch_load, **kwargs)
+
+
+async def load_related(loader: DataLoader, items: list[dict], key: str,
+                       name: str):
+    """Sets item[name] to the value loaded for item[key], for each item.
+
+    Items whose key is None get None. The loaded values can then be
+    serialized as relationships (see utils.jsonapi_response).
+    """
+    keys = [item[key] for item in items]
+    values = await loader.load_many([k for k in keys if k is not None])
+    loaded = iter(values)
+    for item, k in zip(items, keys):
+        item[name] = next(loaded) if k is not None else None
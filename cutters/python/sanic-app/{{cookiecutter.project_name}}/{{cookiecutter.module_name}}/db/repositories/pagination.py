@@ -0,0 +1,82 @@
+"""Helpers for keyset (cursor) pagination over the standard columns."""
+import sqlalchemy as sa
+
+
+def keyset_statement(stmt, table, backwards: bool = False,
+                     from_key: bool = False, limit: bool = False):
+    """Orders a select by the keyset, with the cursor key and limit as
+    bind parameters (see keyset_params).
+
+    As the statement only depends on the shape of the cursor (not its
+    values), it can be built once and reused, and always compiles to
+    the same SQL.
+
+    Rows are ordered by (created_at, id), which every table gets from
+    schema.standard_colums. The id breaks ties between rows created in
+    the same transaction, so the ordering is stable.
+
+    Args:
+        stmt:
+            The select to order.
+        table:
+            The table being listed.
+        backwards:
+            Order rows descending (for cursors pointing backwards).
+        from_key:
+            Start after a cursor key (:cursor_created_at, :cursor_id).
+        limit:
+            Limit the rows to :limit.
+    """
+    sort_key = sa.tuple_(table.c.created_at, table.c.id)
+
+    if from_key:
+        cursor_key = sa.tuple_(
+            sa.bindparam('cursor_created_at', type_=table.c.created_at.type),
+            sa.bindparam('cursor_id', type_=table.c.id.type))
+        if backwards:
+            stmt = stmt.where(sort_key < cursor_key)
+        else:
+            stmt = stmt.where(sort_key > cursor_key)
+
+    if backwards:
+        stmt = stmt.order_by(table.c.created_at.desc(), table.c.id.desc())
+    else:
+        stmt = stmt.order_by(table.c.created_at, table.c.id)
+
+    if limit:
+        stmt = stmt.limit(sa.bindparam('limit', type_=sa.Integer))
+    return stmt
+
+
+def keyset_shape(cursor=None) -> tuple[bool, bool]:
+    """The (backwards, from_key) args of keyset_statement for a cursor."""
+    backwards = cursor is not None and cursor.backwards
+    from_key = cursor is not None and cursor.id is not None
+    return backwards, from_key
+
+
+def keyset_params(cursor=None, limit: int = None) -> dict:
+    """The parameters of a keyset_statement for a cursor and limit."""
+    params = {}
+    if cursor is not None and cursor.id is not None:
+        params['cursor_created_at'] = cursor.created_at
+        params['cursor_id'] = cursor.id
+    if limit is not None:
+        params['limit'] = limit
+    return params
+
+
+def split_page(rows: list, cursor=None, limit: int = 20) -> tuple[list, bool]:
+    """Trims the extra row fetched by a keyset_statement (which should
+    be run with limit + 1, so that callers can tell whether there are
+    more rows after the page).
+
+    Returns:
+        The rows of the page in listing order, and whether
+        there are more rows beyond the page.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if cursor is not None and cursor.backwards:
+        rows.reverse()
+    return rows, has_more
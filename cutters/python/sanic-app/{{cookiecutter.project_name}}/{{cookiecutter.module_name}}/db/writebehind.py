@@ -0,0 +1,143 @@
+"""Write-behind queues for high-volume inserts.
+
+Rather than each request inserting its row (and waiting for the commit),
+rows are put on a bounded in-process queue, and a background task
+inserts them in batches: as soon as DB_MAX_INSERT_BATCH_SIZE rows are
+waiting, or DB_WRITE_BEHIND_FLUSH_INTERVAL seconds after the first row
+of a batch was queued.
+
+This trades durability for throughput. The requestor is answered before
+the row is written, so rows still queued when a worker dies are lost,
+and rows that fail to insert can only be logged. Rows need their ids
+made before they are queued (see schema.new_id), so that the requestor
+can be given a link to them.
+
+When the queue is full, put raises asyncio.QueueFull, so that handlers
+can ask requestors to back off (i.e. respond with a 429). Queues are
+drained (and stop accepting rows) when the server stops.
+"""
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncEngine
+from {{cookiecutter.module_name}}.db import env as dbenv
+from {{cookiecutter.module_name}}.log import db_logger
+from {{cookiecutter.module_name}} import metrics
+
+
+class WriteBehindQueue:
+    """Queues rows, and writes them in batches in a background task.
+
+    Args:
+        name:
+            The name of the queue (in logs and metrics).
+        write_batch:
+            An async function writing a list of rows.
+        max_size:
+            The most rows that can be queued.
+        batch_size:
+            The most rows written at once.
+        flush_interval:
+            The most seconds to wait for a batch to fill up.
+    """
+
+    def __init__(self, name: str, write_batch,
+                 max_size: int = dbenv.DB_WRITE_BEHIND_QUEUE_SIZE,
+                 batch_size: int = dbenv.DB_MAX_INSERT_BATCH_SIZE,
+                 flush_interval: float = dbenv.DB_WRITE_BEHIND_FLUSH_INTERVAL):
+        self.name = name
+        self._write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue(max_size)
+        # Set when rows are put, or the queue is drained, to wake up a
+        # batch waiting to fill.
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.closed = False
+        metrics.watch_queue(name, self)
+
+    def qsize(self) -> int:
+        """The number of rows waiting to be written."""
+        return self._queue.qsize()
+
+    def put(self, row: dict):
+        """Queues a row to be written.
+
+        Raises:
+            asyncio.QueueFull: If the queue is full, or draining.
+        """
+        if self.closed:
+            raise asyncio.QueueFull()
+        self._queue.put_nowait(row)
+        self._wakeup.set()
+
+    def start(self):
+        """Starts writing queued rows in a background task."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def drain(self):
+        """Stops accepting rows, and waits for the queued ones to be
+        written.
+        """
+        self.closed = True
+        self._wakeup.set()
+        if self._task is None:
+            return
+        await self._queue.join()
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _next_batch(self) -> list[dict]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0 or self.closed:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write_batch(batch)
+                outcome = 'written'
+            except Exception as exp:
+                outcome = 'failed'
+                db_logger.exception(exp)
+                db_logger.error(
+                    f'Write-behind queue "{self.name}" lost '
+                    f'{len(batch)} rows')
+            metrics.write_behind_rows.inc(
+                len(batch), queue=self.name, outcome=outcome)
+            for _ in batch:
+                self._queue.task_done()
+
+
+def batch_writer(engine: AsyncEngine, add_many, added=None):
+    """Makes a write_batch function for a WriteBehindQueue, which writes
+    rows with a repository's add_* function (e.g. add_greetings), in a
+    transaction on a connection of its own. Once that's committed, the
+    added rows are passed to added (e.g. greetings_added), if given.
+    """
+    async def write_batch(rows: list[dict]):
+        async with engine.begin() as conn:
+            rows = await add_many(conn, rows)
+        if added is not None:
+            await added(rows)
+    return write_batch
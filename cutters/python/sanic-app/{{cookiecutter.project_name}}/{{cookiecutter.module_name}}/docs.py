@@ -0,0 +1,75 @@
+"""The API docs (the Swagger UI and OpenAPI spec at /swagger).
+
+The docs are only built when they're first asked for, rather than by
+every worker as it starts: the routes' docs decorators are only
+recorded when they're imported (see openapi.py), and sanic_openapi's
+listener building the spec when the server starts is taken off its
+blueprint. On the first request for the spec, the decorators are
+applied, the spec is built, and it's encoded and compressed once, to be
+served from memory after that.
+
+app.py only imports this module (and so sanic_openapi) with DOCS on.
+"""
+from sanic.blueprints import Blueprint
+from sanic.response import HTTPResponse
+from sanic_openapi.openapi3 import specification
+from sanic_openapi.openapi3.blueprint import blueprint_factory
+from {{cookiecutter.module_name}} import encoding
+from {{cookiecutter.module_name}}.compression import Precompressed
+from {{cookiecutter.module_name}}.openapi import apply_docs
+
+SPEC_URI = '/swagger.json'
+
+
+class LazySpec:
+    """Builds the OpenAPI spec on the first request for it, and serves
+    it (precompressed) from memory.
+
+    Args:
+        add_routes:
+            sanic_openapi's build_spec listener, which adds the app's
+            routes to the spec.
+    """
+
+    def __init__(self, add_routes):
+        self._add_routes = add_routes
+        self._spec = None
+
+    def build(self, app) -> bytes:
+        """Builds and encodes the spec of the app's routes."""
+        apply_docs()
+        self._add_routes(app, None)
+        return encoding.as_bytes(
+            encoding.dumps(specification.build().serialize()))
+
+    def response(self, request) -> HTTPResponse:
+        """Responds with the spec (building it if need be)."""
+        if self._spec is None:
+            self._spec = Precompressed(
+                self.build(request.app), 'application/json')
+        return self._spec.response(request)
+
+
+def make_blueprint() -> Blueprint:
+    """Makes sanic_openapi's openapi3 blueprint, building the spec
+    lazily (see LazySpec) rather than when the server starts.
+    """
+    blueprint = blueprint_factory()
+
+    # sanic_openapi has no hooks for this, so the blueprint's (future)
+    # listener and spec route are swapped before it is registered.
+    build_spec = next(
+        future for future in blueprint._future_listeners
+        if future.listener.__name__ == 'build_spec')
+    blueprint._future_listeners.remove(build_spec)
+    spec = LazySpec(build_spec.listener)
+
+    def get_spec(request):
+        return spec.response(request)
+
+    blueprint._future_routes = {
+        route._replace(handler=get_spec) if route.uri == SPEC_URI
+        else route
+        for route in blueprint._future_routes
+    }
+    return blueprint
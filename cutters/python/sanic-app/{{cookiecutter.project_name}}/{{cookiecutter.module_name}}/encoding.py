@@ -0,0 +1,133 @@
+"""JSON encoding and decoding for the app.
+
+The backend is the fastest of orjson, ujson and the standard library
+json module that is installed, unless JSON_BACKEND (see env.py) picks
+one. All of them encode the types in NATIVE_TYPES (UUIDs and datetimes,
+as found in repository rows) and non-ASCII text the same way, so that
+rows needn't be converted to strings beforehand (see
+utils.JSONAPISerializer). Non-finite floats do differ: orjson encodes
+them as null, and the others as (invalid JSON) NaN or Infinity.
+
+dumps gives bytes with orjson (saving a decode, as response bodies are
+bytes anyway), and str with the others. Use as_bytes where a body is
+built by hand.
+
+app.py installs dumps and loads app-wide, for sanic.response.json and
+request.json.
+"""
+import json
+import uuid
+from datetime import date, datetime, time
+from {{cookiecutter.module_name}} import env
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+# Types encoded without converting them with str() first. UUIDs are
+# encoded in their canonical form, and dates and times in ISO 8601.
+NATIVE_TYPES = (uuid.UUID, datetime, date, time)
+
+BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def _default(obj):
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    raise TypeError(
+        f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _stdlib_dumps(obj, **kwargs) -> str:
+    kwargs.setdefault('separators', (',', ':'))
+    kwargs.setdefault('default', _default)
+    kwargs.setdefault('ensure_ascii', False)
+    return json.dumps(obj, **kwargs)
+
+
+def _orjson_dumps(obj, **kwargs) -> bytes:
+    if kwargs:
+        # orjson has no options like indent, sort_keys etc.
+        return _stdlib_dumps(obj, **kwargs)
+    # Non-str keys (e.g. status codes in the API spec) are converted
+    # to strings, as the other backends do.
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _ujson_dumps(obj, **kwargs) -> str:
+    if kwargs:
+        return _stdlib_dumps(obj, **kwargs)
+    return ujson.dumps(obj, default=_default, ensure_ascii=False,
+                       escape_forward_slashes=False)
+
+
+_DUMPS = {
+    'orjson': _orjson_dumps,
+    'ujson': _ujson_dumps,
+    'json': _stdlib_dumps,
+}
+
+
+def available_backends() -> list[str]:
+    """The backends that are installed, fastest first."""
+    installed = {'orjson': orjson, 'ujson': ujson, 'json': json}
+    return [name for name in BACKENDS if installed[name] is not None]
+
+
+def get_backend(name: str = None) -> str:
+    """Picks the backend to use.
+
+    Args:
+        name:
+            The backend wanted, or None/'auto' for the fastest
+            installed one.
+
+    Raises:
+        ValueError: If the backend is unknown or not installed.
+    """
+    available = available_backends()
+    if name is None or name == 'auto':
+        return available[0]
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown JSON backend "{name}"')
+    if name not in available:
+        raise ValueError(f'JSON backend "{name}" is not installed')
+    return name
+
+
+def get_dumps(backend: str):
+    """Gets the function encoding objects to JSON with a backend (see
+    as_bytes).
+    """
+    return _DUMPS[backend]
+
+
+def as_bytes(encoded) -> bytes:
+    """Gives JSON encoded by any backend's dumps (str or bytes) as
+    UTF-8 bytes.
+    """
+    if isinstance(encoded, str):
+        return encoded.encode()
+    return encoded
+
+
+def get_loads(backend: str):
+    """Gets the function decoding JSON (str or bytes) with a backend."""
+    return {
+        'orjson': getattr(orjson, 'loads', None),
+        'ujson': getattr(ujson, 'loads', None),
+        'json': json.loads,
+    }[backend]
+
+
+BACKEND = get_backend(env.JSON_BACKEND)
+dumps = get_dumps(BACKEND)
+loads = get_loads(BACKEND)
@@ -0,0 +1,47 @@
+import os
+
+DEBUG_ENV = 'development'
+PYTHON_ENV = os.getenv('PYTHON_ENV', DEBUG_ENV)
+IS_DEBUG = PYTHON_ENV == DEBUG_ENV
+
+
+def _flag(name, default):
+    return os.getenv(name, str(default)).lower() == 'true'
+
+
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', 8000))
+
+# Worker processes. Development runs a single (debug) worker, production
+# one per CPU. FAST=true also starts one worker per CPU.
+WORKERS = int(os.getenv('WORKERS', 1 if IS_DEBUG else (os.cpu_count() or 1)))
+FAST = _flag('FAST', False)
+
+# Seconds to keep idle connections open, and to wait for a request to
+# arrive / a response to be written before giving up.
+KEEP_ALIVE_TIMEOUT = float(os.getenv('KEEP_ALIVE_TIMEOUT', 5))
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 60))
+RESPONSE_TIMEOUT = float(os.getenv('RESPONSE_TIMEOUT', 60))
+# Pending connections the socket queues before refusing new ones.
+BACKLOG = int(os.getenv('BACKLOG', 100))
+
+ACCESS_LOG = _flag('ACCESS_LOG', IS_DEBUG)
+USE_UVLOOP = _flag('USE_UVLOOP', True)
+
+# JSON library used to encode responses and decode requests: orjson, ujson,
+# json (the standard library), or auto for the fastest installed.
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+# Response compression (see compression.py). Bodies under COMPRESS_MIN_SIZE
+# bytes are sent as is, and ones over COMPRESS_OFFLOAD_SIZE bytes are
+# compressed in a thread, off the event loop. COMPRESS_LEVEL is the gzip
+# level (1-9), and COMPRESS_BROTLI_QUALITY the brotli quality (0-11).
+COMPRESS = _flag('COMPRESS', True)
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_OFFLOAD_SIZE = int(os.getenv('COMPRESS_OFFLOAD_SIZE', 64 * 1024))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+# Serve the API docs (the Swagger UI and OpenAPI spec at /swagger). Set to
+# false to leave them out entirely (e.g. in production).
+DOCS = _flag('DOCS', True)
@@ -43,3 +43,19 @@ class BodyException(CustomException):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs, status_code=400)
         self.title = 'Invalid Body Argument'
+
+
+class TooManyRequestsException(CustomException):
+    """Use to ask the requestor to back off (e.g. when a queue is full).
+
+    Args:
+        retry_after:
+            Seconds after which the requestor may retry (sent in a
+            Retry-After header).
+    """
+
+    def __init__(self, *args, retry_after: int = None, **kwargs):
+        super().__init__(*args, **kwargs, status_code=429)
+        self.title = 'Too Many Requests'
+        if retry_after is not None:
+            self.headers = {'Retry-After': str(retry_after)}
@@ -0,0 +1,305 @@
+"""In-process metrics, exposed in the Prometheus text format.
+
+Metrics are aggregated in memory by each worker process, so no external
+services are needed. With several workers, each scrape of /metrics is
+answered by (and reports on) whichever worker handles it.
+
+Example:
+    requests = Counter('requests_total', 'Requests served', ['route'])
+    requests.inc(route='/greetings')
+    REGISTRY.render()
+"""
+import abc
+import bisect
+import math
+from typing import Callable, Iterable
+
+# Latency buckets, in seconds.
+DEFAULT_BUCKETS = (
+    .005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 7.5, 10)
+DB_BUCKETS = (
+    .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+
+
+def _escape(value, quotes: bool = True) -> str:
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n')
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Metric(abc.ABC):
+    """A named metric, with one value per combination of label values.
+
+    Args:
+        name:
+            The metric's name.
+        help:
+            A description of the metric.
+        labels:
+            Names of the metric's labels.
+        registry:
+            The registry to add the metric to (or None to not add it).
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (),
+                 registry: 'Registry' = None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        try:
+            return tuple(labels[name] for name in self.labels)
+        except KeyError as exp:
+            raise ValueError(
+                f'Missing label {exp} for metric "{self.name}"') from None
+
+    @abc.abstractmethod
+    def samples(self):
+        """Yields (name suffix, label names, label values, value)."""
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {_escape(self.help, quotes=False)}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for suffix, names, values, value in self.samples():
+            lines.append(
+                f'{self.name}{suffix}{_format_labels(names, values)} '
+                f'{_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class _Value(Metric):
+    """A metric with a single number per label set.
+
+    Instead of being updated as things happen, the values can come
+    from a function called at collection time (see set_function).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+        self._function = None
+
+    def set_function(self, function: Callable[[], dict]):
+        """Collects values from a function returning a dict of
+        {label values tuple: value}.
+        """
+        self._function = function
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        values = self._function() if self._function else self._values
+        for key, value in sorted(values.items()):
+            yield '', self.labels, key, value
+
+
+class Counter(_Value):
+    """A value that only goes up, e.g. a number of requests."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Value):
+    """A value that goes up and down, e.g. connections in use."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Counts observations (e.g. latencies) into buckets.
+
+    Args:
+        buckets:
+            Upper bounds of the buckets, in increasing order. A +Inf
+            bucket is always added.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (non-cumulative), sum]
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        names = self.labels + ('le',)
+        bounds = self.buckets + (math.inf,)
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield '_bucket', names, key + (_format_value(bound),), \
+                    cumulative
+            yield '_sum', self.labels, key, total
+            yield '_count', self.labels, key, cumulative
+
+
+class Registry:
+    """A collection of metrics, rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric "{metric.name}" is already registered')
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text format."""
+        return ''.join(
+            metric.render() + '\n' for metric in self._metrics.values())
+
+
+REGISTRY = Registry()
+
+# -------------------------------------------
+# App metrics
+# -------------------------------------------
+
+http_requests = Counter(
+    'http_requests_total', 'Responses sent, by route and status.',
+    ['method', 'route', 'status'], registry=REGISTRY)
+http_request_duration = Histogram(
+    'http_request_duration_seconds',
+    'Time from receiving a request to starting its response.',
+    ['method', 'route'], registry=REGISTRY)
+
+db_statement_duration = Histogram(
+    'db_statement_duration_seconds', 'Time spent executing SQL statements.',
+    ['operation'], buckets=DB_BUCKETS, registry=REGISTRY)
+db_pool_checkout_wait = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting to check a connection out of the pool.',
+    buckets=DB_BUCKETS, registry=REGISTRY)
+db_pool = Gauge(
+    'db_pool_connections',
+    'Connections in the pool, by state ("checked_out" connections are '
+    'in use, "overflow" ones were opened beyond the pool size).',
+    ['state'], registry=REGISTRY)
+db_replicas = Gauge(
+    'db_replicas', 'Read replicas, by state ("healthy" or "unhealthy").',
+    ['state'], registry=REGISTRY)
+
+write_behind_queued = Gauge(
+    'write_behind_queued', 'Rows waiting in each write-behind queue.',
+    ['queue'], registry=REGISTRY)
+write_behind_rows = Counter(
+    'write_behind_rows_total',
+    'Rows flushed from each write-behind queue, by outcome ("written" '
+    'or "failed").',
+    ['queue', 'outcome'], registry=REGISTRY)
+
+cache_entries = Gauge(
+    'cache_entries', 'Keys held in each cache.',
+    ['cache'], registry=REGISTRY)
+cache_events = Counter(
+    'cache_events_total', 'Cache hits, misses, evictions and expirations.',
+    ['cache', 'event'], registry=REGISTRY)
+
+_caches = {}
+
+
+def _cache_entries():
+    return {
+        (name, ): cache.stats().get('entries', 0)
+        for name, cache in _caches.items()
+    }
+
+
+def _cache_events():
+    return {
+        (name, event): value
+        for name, cache in _caches.items()
+        for event, value in cache.stats().items()
+        if event != 'entries'
+    }
+
+
+cache_entries.set_function(_cache_entries)
+cache_events.set_function(_cache_events)
+
+
+def watch_cache(name: str, cache):
+    """Reports a cache's stats (see cache.CacheBackend.stats)."""
+    _caches[name] = cache
+
+
+def watch_pool(pool):
+    """Reports the state of a (SQLAlchemy) connection pool."""
+    db_pool.set_function(lambda: {
+        ('size', ): pool.size(),
+        ('checked_out', ): pool.checkedout(),
+        ('overflow', ): max(pool.overflow(), 0),
+    })
+
+
+def watch_replicas(replicas):
+    """Reports the health of read replicas (see db.replicas)."""
+    def states():
+        healthy = len(replicas.healthy())
+        return {
+            ('healthy', ): healthy,
+            ('unhealthy', ): len(replicas) - healthy,
+        }
+    db_replicas.set_function(states)
+
+
+_queues = {}
+
+
+def _write_behind_queued():
+    return {(name, ): queue.qsize() for name, queue in _queues.items()}
+
+
+write_behind_queued.set_function(_write_behind_queued)
+
+
+def watch_queue(name: str, queue):
+    """Reports the size of a write-behind queue (see db.writebehind)."""
+    _queues[name] = queue
+
+
+def operation(statement: str) -> str:
+    """Gets the kind of a SQL statement (e.g. "SELECT")."""
+    words = statement.split(None, 1)
+    return words[0].upper() if words else ''
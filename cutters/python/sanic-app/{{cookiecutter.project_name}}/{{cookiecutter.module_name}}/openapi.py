@@ -1,4 +1,63 @@
-"""Configuration and base models for openapi docs."""
+"""Configuration and base models for openapi docs.
+
+Routes are documented with the decorators of `openapi` (below), which
+stands in for sanic_openapi's openapi module. Rather than building the
+schemas of their models when the routes are imported (i.e. when every
+worker starts), the decorators are recorded, and applied by apply_docs
+when the spec is first asked for (see docs.py). With DOCS off (see
+env.py), nothing is recorded.
+"""
+import functools
+from {{cookiecutter.module_name}} import env
+
+# The sanic_openapi decorators that can be deferred (the ones taking a
+# route handler, and returning it as is).
+DECORATORS = frozenset([
+    'body',
+    'deprecated',
+    'description',
+    'document',
+    'exclude',
+    'operation',
+    'parameter',
+    'response',
+    'summary',
+    'tag',
+])
+
+_deferred = []
+
+
+class _DeferredDocs:
+    def __getattr__(self, name: str):
+        if name not in DECORATORS:
+            raise AttributeError(
+                f'"{name}" is not a docs decorator. Use sanic_openapi\'s '
+                f'openapi module for types etc.')
+
+        def decorator_factory(*args, **kwargs):
+            def decorator(handler):
+                if env.DOCS:
+                    _deferred.append((handler, name, args, kwargs))
+                return handler
+            return decorator
+        return decorator_factory
+
+
+openapi = _DeferredDocs()
+
+
+def apply_docs():
+    """Applies the recorded docs decorators to their handlers, in the
+    order they were recorded, for sanic_openapi to build the spec from.
+    """
+    # Only imported once docs are built, to keep it out of startup.
+    from sanic_openapi import openapi as sanic_openapi
+
+    deferred = list(_deferred)
+    _deferred.clear()
+    for handler, name, args, kwargs in deferred:
+        getattr(sanic_openapi, name)(*args, **kwargs)(handler)
 
 
 class ListLinks:
@@ -28,9 +87,12 @@ class JSONAPIErrorResponse:
     errors: list[JSONAPIError]
 
 
+@functools.lru_cache(maxsize=None)
 def jsonapi_data(attributes_cls):
     """Decorator to turn an openapi response model into
     jsonapi format. (But just the data field).
+
+    Models are made once per attributes class, and then reused.
     """
     class _AttributesModel(attributes_cls):
         created_at: str
@@ -44,6 +106,7 @@ def jsonapi_data(attributes_cls):
     return _DataModel
 
 
+@functools.lru_cache(maxsize=None)
 def jsonapi_item(attributes_cls):
     """Decorator to turn an openapi response model for a single
     item into jsonapi format.
@@ -57,6 +120,7 @@ def jsonapi_item(attributes_cls):
     return _JSONPIItemModel
 
 
+@functools.lru_cache(maxsize=None)
 def jsonapi_list(attributes_cls):
     """Decorator to turn an openapi response model for a list of
     items into jsonapi format.
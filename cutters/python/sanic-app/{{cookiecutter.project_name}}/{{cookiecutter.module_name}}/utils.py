@@ -1,6 +1,18 @@
 import re
+import json
+import functools
+import uuid
+import base64
+import hashlib
+import binascii
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import urlencode
 from collections import namedtuple
 import {{cookiecutter.module_name}}.exceptions as expns
+from {{cookiecutter.module_name}} import validate
+from {{cookiecutter.module_name}} import encoding
+from {{cookiecutter.module_name}}.log import app_logger
 
 
 def get_offset_limit(request, page_size: int = 20,
@@ -14,37 +26,21 @@ def get_offset_limit(request, page_size: int = 20,
             - offset/limit are not multiples of page_size
             (if limit_to_page_size=True)
     """
-    offset = request.args.get('offset', 0)
-    limit = request.args.get('limit', page_size)
-
-    parse_exception = expns.QueryException(
-        'Pagination arguments must be natural numbers')
-
-    for arg in [offset, limit]:
-        # First parse the arg and make sure it has integer form.
-        # (We do this rather than just returning int(arg) because the
-        # query string should be valid in the first place, so that urls in
-        # the REST response match the requested address - which is important
-        # for caching).
-        _arg = arg
-        if isinstance(_arg, str):
-            if not re.match(r'^[0-9]+$', _arg):
-                raise parse_exception
-            else:
-                _arg = int(arg)
-        elif not isinstance(_arg, int):
-            raise parse_exception
-
-        # Then do the validations
-        if _arg < 0:
-            raise parse_exception
-
-        if limit_to_page_size and _arg % page_size != 0:
-            raise expns.QueryException(
-                f'Pagination args must be a multiple of {page_size}')
-
-    offset = int(offset)
-    limit = int(limit)
+    # Parsed strictly (rather than with int()), as the query string
+    # should be valid in the first place, so that urls in the REST
+    # response match the requested address (which matters for caching).
+    offset = validate.parse_natural(
+        request.args.get('offset', 0), expns.QueryException)
+    if limit_to_page_size and offset % page_size != 0:
+        raise expns.QueryException(
+            f'Pagination args must be a multiple of {page_size}')
+    limit = validate.parse_natural(
+        request.args.get('limit', page_size), expns.QueryException)
+    if limit_to_page_size and limit % page_size != 0:
+        raise expns.QueryException(
+            f'Pagination args must be a multiple of {page_size}')
+    if limit == 0:
+        raise expns.QueryException('Limit must be greater than 0.')
     if offset % limit != 0:
         raise expns.QueryException(
             'Offset must be a multiple of limit.')
@@ -53,36 +49,602 @@ def get_offset_limit(request, page_size: int = 20,
 
 
 def make_pagination_links(url, offset: int = 0, page_size: int = 20,
-                          count: int = None) -> dict[str]:
+                          count: int = None, query: str = '') -> dict[str]:
     """Makes pagination links for a jsonapi response.
 
+    Args:
+        query:
+            Other (encoded) query args to keep in every link, e.g.
+            from fieldsets_query.
+
     Notes:
         This method assumes that offset is a natural multiple of
         page_size, so that the smallest offset is 0.
     """
+    if query:
+        query = '&' + query
+
+    def page_url(page_offset: int):
+        return f'{url}?offset={page_offset}&limit={page_size}{query}'
+
     links = {
-        'self': f'{url}?offset={offset}&limit={page_size}'
+        'self': page_url(offset)
     }
 
     if offset != 0:
-        links['prev'] = f'{url}?offset={offset - page_size}&limit={page_size}'
+        links['prev'] = page_url(offset - page_size)
     if count is not None:
         if (offset + page_size) < count:
-            links['next'] = f'{url}?offset={offset + page_size}&limit={page_size}'
-        links['first'] = f'{url}?offset=0&limit={page_size}'
+            links['next'] = page_url(offset + page_size)
+        links['first'] = page_url(0)
         last_offset = int(count / page_size) * page_size
-        links['last'] = f'{url}?offset={last_offset}&limit={page_size}'
+        links['last'] = page_url(last_offset)
     else:
-        links['next'] = f'{url}?offset={offset + page_size}&limit={page_size}'
+        links['next'] = page_url(offset + page_size)
+
+    return links
+
+
+# A position in a keyset-paginated listing. The (created_at, id) pair is
+# the sort key of the last row seen (or the first, when paging backwards).
+# A cursor with no key and backwards=True points at the end of the listing
+# (i.e. the last page).
+Cursor = namedtuple('Cursor', ['created_at', 'id', 'backwards'])
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    """Encodes a cursor as an opaque url-safe token."""
+    created_at = cursor.created_at
+    if created_at is not None:
+        created_at = created_at.isoformat()
+    id = cursor.id
+    if id is not None:
+        id = str(id)
+    raw = json.dumps([created_at, id, bool(cursor.backwards)],
+                     separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str,
+                  exception_cls: Exception = expns.QueryException) -> Cursor:
+    """Decodes a token made by encode_cursor.
+
+    Raises:
+        exception_cls: If the token is not a valid cursor
+            (QueryException by default).
+    """
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding)
+        created_at, id, backwards = json.loads(raw)
+        if (created_at is None) != (id is None):
+            raise ValueError('Incomplete cursor key')
+        if created_at is not None:
+            created_at = datetime.fromisoformat(created_at)
+            id = uuid.UUID(id)
+        if not isinstance(backwards, bool):
+            raise ValueError('Invalid cursor direction')
+    except (ValueError, TypeError, binascii.Error):
+        raise exception_cls('Invalid pagination cursor')
+    return Cursor(created_at, id, backwards)
+
+
+def parse_cursor(token: str,
+                 exception_cls: Exception = expns.QueryException) -> Cursor:
+    """Parses a cursor arg (for validate.Param)."""
+    return decode_cursor(token, exception_cls)
+
+
+def cursor_params(page_size: int = 20) -> list[validate.Param]:
+    """Declares the cursor-limit args for keyset pagination, for the
+    validate.params decorator.
+
+    Unlike offset-limit pagination, every page costs the same to
+    fetch, as the database can seek straight to the cursor position
+    using the (created_at, id) sort key rather than scanning and
+    discarding the preceding rows.
+    """
+    return [
+        validate.Param('cursor', str, parse=parse_cursor),
+        validate.Param('limit', int, default=page_size,
+                       parse=validate.parse_positive),
+    ]
+
+
+def make_cursor_pagination_links(url, items: list[dict], limit: int = 20,
+                                 cursor: Cursor = None,
+                                 has_more: bool = False,
+                                 ends: bool = True,
+                                 query: str = '') -> dict[str]:
+    """Makes keyset pagination links for a jsonapi response.
+
+    Args:
+        url:
+            The collection url.
+        items:
+            The rows of the current page, in listing order. Each row
+            needs its 'created_at' and 'id' keys.
+        limit:
+            The page size.
+        cursor:
+            The cursor the current page was fetched with.
+        has_more:
+            Whether more rows exist beyond the page, in the direction
+            the page was fetched.
+        ends:
+            Whether to give first and last links. Neither needs a count
+            of the rows, as the last page is read backwards from the end
+            of the listing.
+        query:
+            Other (encoded) query args to keep in every link, e.g.
+            from fieldsets_query.
+
+    Notes:
+        The self link is re-encoded from the decoded cursor, so that
+        it is canonical for a given page.
+    """
+    if query:
+        query = '&' + query
+
+    def page_url(page_cursor: Cursor = None):
+        if page_cursor is None:
+            return f'{url}?limit={limit}{query}'
+        return (f'{url}?cursor={encode_cursor(page_cursor)}'
+                f'&limit={limit}{query}')
+
+    links = {'self': page_url(cursor)}
+
+    backwards = cursor is not None and cursor.backwards
+    from_start = cursor is None or cursor.id is None and not backwards
+    from_end = backwards and cursor.id is None
+
+    # Going forwards there are older rows if we started from a cursor,
+    # and newer rows if the query overflowed the limit. Going backwards
+    # it's the other way around.
+    has_prev = has_more if backwards else not from_start
+    has_next = not from_end if backwards else has_more
+
+    if len(items) > 0:
+        first, last = items[0], items[-1]
+        if has_prev:
+            links['prev'] = page_url(
+                Cursor(first['created_at'], first['id'], True))
+        if has_next:
+            links['next'] = page_url(
+                Cursor(last['created_at'], last['id'], False))
+
+    if ends:
+        links['first'] = page_url()
+        links['last'] = page_url(Cursor(None, None, True))
 
     return links
 
 
+# ----------------------------------
+# Sparse fieldsets and includes
+# ----------------------------------
+
+# The fields[type]=a,b and include=a,b.c args of a request.
+# fields maps a type to the names of the fields (attributes and
+# relationships) to keep; types not in it keep all their fields.
+# include is the set of relationship paths (as tuples) to keep,
+# or None to keep all relationships.
+Fieldsets = namedtuple('Fieldsets', ['fields', 'include'])
+
+_FIELDS_ARG_RE = re.compile(r'^fields\[([A-Za-z0-9_-]+)\]$')
+_NAME_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def _parse_names(value: str, arg: str, paths: bool = False) -> list[str]:
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    for name in names:
+        parts = name.split('.') if paths else [name]
+        if not all(_NAME_RE.match(part) for part in parts):
+            raise expns.QueryException(f'Invalid name "{name}" in "{arg}"')
+    return names
+
+
+def get_fieldsets(request) -> Fieldsets:
+    """Extracts fields[type] and include args.
+
+    The args are parsed once per request (the result is kept on
+    request.ctx).
+
+    Raises:
+        SanicException: A 400 error is raised if a field or
+            relationship name is not valid.
+    """
+    fieldsets = getattr(request.ctx, 'fieldsets', None)
+    if fieldsets is not None:
+        return fieldsets
+
+    # Blank values count, as e.g. include= means "no relationships".
+    args = request.get_args(keep_blank_values=True)
+    fields = {}
+    include = None
+    for arg, values in args.items():
+        match = _FIELDS_ARG_RE.match(arg)
+        if match is not None:
+            fields[match.group(1)] = frozenset(_parse_names(values[0], arg))
+        elif arg == 'include':
+            include = set()
+            for path in _parse_names(values[0], arg, paths=True):
+                parts = tuple(path.split('.'))
+                # Including a.b means including a too.
+                for i in range(1, len(parts) + 1):
+                    include.add(parts[:i])
+            include = frozenset(include)
+        elif arg.startswith('fields'):
+            raise expns.QueryException(f'Invalid fields arg "{arg}"')
+
+    fieldsets = Fieldsets(fields, include)
+    request.ctx.fieldsets = fieldsets
+    return fieldsets
+
+
+def fieldset_columns(fieldsets: Fieldsets, type: str, columns: list[str],
+                     required: list[str] = ()) -> list[str]:
+    """Gets the columns to select for a type's sparse fieldset.
+
+    Args:
+        columns:
+            All the columns of the type, in order.
+        required:
+            Columns that are always needed (e.g. for pagination links),
+            whether or not they were asked for.
+
+    Returns:
+        The columns, or None if all of them are needed.
+
+    Raises:
+        QueryException: If a field that isn't a column was asked for.
+    """
+    fields = fieldsets.fields.get(type)
+    if fields is None:
+        return None
+    for field in fields:
+        if field not in columns:
+            raise expns.QueryException(
+                f'Unknown field "{field}" for type "{type}"')
+    return [
+        column for column in columns
+        if column in fields or column in required
+    ]
+
+
+def check_include(fieldsets: Fieldsets, paths: list[str] = ()):
+    """Checks that only the given relationship paths were included.
+
+    Raises:
+        QueryException: If any other relationship was included.
+    """
+    if fieldsets.include is None:
+        return
+    allowed = {tuple(path.split('.')) for path in paths}
+    for path in sorted(fieldsets.include):
+        if path not in allowed:
+            raise expns.QueryException(
+                f'Unknown relationship "{".".join(path)}" in "include"')
+
+
+def fieldsets_query(fieldsets: Fieldsets) -> str:
+    """Encodes fieldsets back into (canonical) query args."""
+    args = [
+        (f'fields[{type}]', ','.join(sorted(fields)))
+        for type, fields in sorted(fieldsets.fields.items())
+    ]
+    if fieldsets.include is not None:
+        # Only the longest paths are needed, the rest are implied.
+        paths = [
+            path for path in fieldsets.include
+            if not any(other[:len(path)] == path and other != path
+                       for other in fieldsets.include)
+        ]
+        args.append(
+            ('include', ','.join(sorted('.'.join(path) for path in paths))))
+    return urlencode(args)
+
+
+# ---------------------------------
+# Conditional requests (ETags etc.)
+# ---------------------------------
+
+
+def make_etag(*parts) -> str:
+    """Makes a weak ETag from the parts that identify a version of a
+    resource (e.g. its id and updated_at).
+
+    The ETag is weak as it identifies the version, not the bytes of a
+    response (which e.g. compression changes), so that 304s and 200s
+    carry the same one.
+    """
+    raw = '|'.join(str(part) for part in parts)
+    digest = hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def item_version(item: dict, variant: str = '') -> tuple[str, datetime]:
+    """Gets the ETag and Last-Modified of a single row.
+
+    Only the 'id' and 'updated_at' keys of the row are needed,
+    so they can be checked without fetching the whole row.
+
+    Args:
+        variant:
+            Distinguishes different representations of the same row
+            (e.g. the fieldsets_query of a sparse fieldset).
+    """
+    parts = (item['id'], item['updated_at'])
+    if variant:
+        parts += (variant, )
+    return make_etag(*parts), item['updated_at']
+
+
+def page_version(links: dict, items: list[dict]) -> tuple[str, datetime]:
+    """Gets the ETag and Last-Modified of a page of rows.
+
+    The ETag covers the page's links (which capture its bounds) and the
+    id and updated_at of each row, so as with item_version, the rows
+    need only have those keys.
+    """
+    etag = make_etag(
+        *sorted(links.items()),
+        *[(item['id'], item['updated_at']) for item in items])
+    last_modified = max(
+        (item['updated_at'] for item in items), default=None)
+    return etag, last_modified
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # DB timestamps have no timezone, and are in UTC.
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def cache_headers(etag: str = None,
+                  last_modified: datetime = None) -> dict[str]:
+    """Makes ETag/Last-Modified response headers."""
+    headers = {}
+    if etag is not None:
+        headers['ETag'] = etag
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(
+            _as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def is_not_modified(request, etag: str = None,
+                    last_modified: datetime = None) -> bool:
+    """Checks a request's If-None-Match/If-Modified-Since headers.
+
+    Returns:
+        True if the requestor's copy of the resource is current,
+        and a 304 response can be sent.
+
+    Notes:
+        As in RFC 7232, If-Modified-Since is ignored when If-None-Match
+        is given, and ETags are compared weakly.
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        etag = etag.removeprefix('W/')
+        return any(
+            tag.strip().removeprefix('W/') == etag
+            for tag in if_none_match.split(','))
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # HTTP dates only have second precision.
+        last_modified = _as_utc(last_modified).replace(microsecond=0)
+        return last_modified <= since
+
+    return False
+
+
+def prefers_async(request) -> bool:
+    """Whether a request has a "Prefer: respond-async" header (RFC 7240),
+    i.e. would rather be answered before its work is done.
+    """
+    prefer = request.headers.get('prefer', '')
+    return any(
+        preference.split(';')[0].strip().lower() == 'respond-async'
+        for preference in prefer.split(','))
+
+
+def has_conditional_headers(request) -> bool:
+    """Whether a request has If-None-Match/If-Modified-Since headers."""
+    return ('if-none-match' in request.headers or
+            'if-modified-since' in request.headers)
+
+
 ResponseDataType = namedtuple('ResponseDataType', ['type', 'collection_url'])
 
+# Attribute values of these types are passed through as is (as the
+# encoder handles them), everything else is converted with str().
+_ENCODABLE_TYPES = (int, float, bool, str, *encoding.NATIVE_TYPES)
+
+
+class JSONAPISerializer:
+    """Transforms (nested) dicts into jsonapi responses.
+
+    The data_types map is compiled once into per-key plans, which are
+    then applied to each item without recursion. See jsonapi_response
+    for the output format.
+
+    Args:
+        data_types:
+            A dict of ResponseDataType explaining how nested objects
+            can be transformed, and links generated.
+            The root type should be listed as 'root'.
+        fieldsets:
+            Restricts the fields and relationships given (see
+            get_fieldsets). Relationships that aren't included are
+            left out altogether.
+    """
+
+    # Bounds the number of distinct key layouts we keep plans for.
+    max_plans = 128
+
+    def __init__(self, data_types: dict[ResponseDataType],
+                 fieldsets: Fieldsets = None):
+        # Copied so that later changes to the caller's map
+        # can't change the compiled plans.
+        self._data_types = dict(data_types)
+        self._root = self._data_types.get('root')
+        self._fields = dict(fieldsets.fields) if fieldsets else {}
+        self._include = fieldsets.include if fieldsets else None
+        self._plans = {}
+
+    def _plan(self, keys: tuple, data_type: ResponseDataType,
+              path: tuple) -> list[tuple]:
+        """Pairs each key of an item with its relationship type
+        (or None if the key can only ever be an attribute), and
+        whether the relationship is included.
+        """
+        plan_key = (keys, data_type, path)
+        plan = self._plans.get(plan_key)
+        if plan is None:
+            if len(self._plans) >= self.max_plans:
+                self._plans.clear()
+            fields = None
+            if data_type is not None:
+                fields = self._fields.get(data_type.type)
+            plan = [
+                (key, self._data_types.get(key),
+                 self._include is None or path + (key, ) in self._include)
+                for key in keys
+                if key != 'id' and (fields is None or key in fields)
+            ]
+            self._plans[plan_key] = plan
+        return plan
+
+    def serialize(self, data: dict) -> dict:
+        """Transforms a single item."""
+        return self.serialize_many([data])[0]
+
+    def serialize_many(self, items: list[dict]) -> list[dict]:
+        """Transforms a list of items in one pass."""
+        responses = [{} for _ in items]
+        # Each entry is an item still to transform, its data type, the
+        # (already placed) dict that its response should be written into,
+        # and its relationship path (only tracked if includes are given).
+        pending = [
+            (data, self._root, resp, ())
+            for data, resp in zip(items, responses)
+        ]
+        pending.reverse()
+        track_paths = self._include is not None
+
+        while pending:
+            data, data_type, resp, path = pending.pop()
+
+            id = data.get('id')
+            if id is None:
+                # This is not a SanicExeption. Code should not be merged
+                # into production that causes this problem.
+                raise Exception("All API entities should have IDs")
+            id = str(id)
+            resp_data = {'id': id}
+            resp['data'] = resp_data
+            if data_type is not None:
+                resp_data['type'] = data_type.type
+                resp['links'] = {
+                    'self': f'{data_type.collection_url}/{id}'
+                }
+
+            attributes = {}
+            singular_relationships = []
+            list_relationships = []
+            plan = self._plan(tuple(data), data_type, path)
+            for item_key, rel_type, included in plan:
+                item_val = data[item_key]
+                if isinstance(item_val, _ENCODABLE_TYPES):
+                    attributes[item_key] = item_val
+                elif isinstance(item_val, dict):
+                    if rel_type is None:
+                        attributes[item_key] = item_val
+                    elif included:
+                        singular_relationships.append(
+                            (item_key, item_val, rel_type))
+                elif isinstance(item_val, list):
+                    if rel_type is None or len(item_val) == 0:
+                        attributes[item_key] = item_val
+                    elif included:
+                        list_relationships.append(
+                            (item_key, item_val, rel_type))
+                else:
+                    attributes[item_key] = str(item_val)
+
+            if len(attributes) > 0:
+                resp_data['attributes'] = attributes
+            if not (singular_relationships or list_relationships):
+                continue
+
+            # Relationship responses are placed now (to keep key order),
+            # and filled in when their items are popped.
+            relationships = {}
+            resp_data['relationships'] = relationships
+            for rel_key, rel_val, rel_type in singular_relationships:
+                rel_resp = {}
+                relationships[rel_key] = rel_resp
+                rel_path = path + (rel_key, ) if track_paths else ()
+                pending.append((rel_val, rel_type, rel_resp, rel_path))
+            for rel_key, rel_vals, rel_type in list_relationships:
+                rel_resps = [{} for _ in rel_vals]
+                relationships[rel_key] = {
+                    'links': {
+                        'self': rel_type.collection_url,
+                    },
+                    'data': rel_resps,
+                }
+                rel_path = path + (rel_key, ) if track_paths else ()
+                pending.extend(zip(
+                    rel_vals,
+                    [rel_type] * len(rel_vals),
+                    rel_resps,
+                    [rel_path] * len(rel_vals)))
+
+        return responses
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_serializer(data_types: tuple, fields: tuple,
+                       include: frozenset) -> JSONAPISerializer:
+    fieldsets = Fieldsets(dict(fields), include)
+    return JSONAPISerializer(dict(data_types), fieldsets)
+
+
+def jsonapi_serializer(data_types: dict[ResponseDataType],
+                       fieldsets: Fieldsets = None) -> JSONAPISerializer:
+    """Gets a compiled serializer for data_types (and fieldsets).
+
+    Serializers are cached, so calling this per request with an
+    equal data_types map does not recompile it.
+    """
+    fields, include = (), None
+    if fieldsets is not None:
+        fields = tuple(sorted(
+            (type, frozenset(names))
+            for type, names in fieldsets.fields.items()))
+        if fieldsets.include is not None:
+            include = frozenset(fieldsets.include)
+    return _cached_serializer(tuple(data_types.items()), fields, include)
+
 
 def jsonapi_response(data: dict,
-                     data_types: dict[ResponseDataType]) -> dict:
+                     data_types: dict[ResponseDataType],
+                     fieldsets: Fieldsets = None) -> dict:
     """Takes a (nested) dictionary and turns it into a jsonapi response.
 
     Args:
@@ -92,16 +654,27 @@ def jsonapi_response(data: dict,
             A dict of ResponseDataType explaining how nested objects
             can be transformed, and links generated.
             The root type should be listed as 'root'.
+        fieldsets:
+            Restricts the fields and relationships given (see
+            get_fieldsets).
     Returns:
         A jsonapi response
 
     Notes:
-        The function runs recursively on nested dicts and arrays. If
+        The function transforms nested dicts and arrays too. If
         the function encounters a nested dict whose key is not listed
         in 'data_types', or if the dict does not have an id, then
-        the recursion will stop, and all further nested objects will
+        the transformation will stop, and all further nested objects will
         be returned as is.
 
+        To transform many items with the same data_types (e.g. the rows
+        of a list endpoint), prefer calling
+        jsonapi_serializer(data_types).serialize_many(items).
+
+        UUID and datetime attributes are left for the JSON encoder
+        (see encoding.py), so the response should be encoded with
+        encoding.dumps (as sanic.response.json does in the app).
+
     Examples:
         Given data like so:
         {
@@ -162,69 +735,77 @@ def jsonapi_response(data: dict,
             }
         }
     """
-    resp = {'data': {}}
+    return jsonapi_serializer(data_types, fieldsets).serialize(data)
+
+
+async def _next_chunk(items, chunk_size: int) -> list:
+    chunk = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            break
+    return chunk
+
+
+async def stream_jsonapi_list(request, links: dict, items,
+                              serializer: JSONAPISerializer,
+                              chunk_size: int = 100):
+    """Streams a jsonapi list response to the requestor.
+
+    The links are written first, then the data array in chunks of
+    serialized items, so that memory use does not grow with the
+    number of items, and the first bytes go out before the last item
+    has been fetched.
+
+    Args:
+        request:
+            The request to respond to.
+        links:
+            The links of the response.
+        items:
+            An async iterable of dicts (e.g. rows from a
+            repository 'stream_*' function).
+        serializer:
+            The serializer to transform each item with.
+        chunk_size:
+            How many items to serialize and send at a time.
+
+    Notes:
+        The first chunk is fetched before the response is started, so
+        that errors raised while starting the query are raised to the
+        caller, to be reported with a normal error response. Once the
+        headers have been sent that can't be done any more, so errors
+        are logged, and the response is aborted (see _abort_response).
+    """
+    items = items.__aiter__()
+    chunk = await _next_chunk(items, chunk_size)
+
+    response = await request.respond(content_type='application/json')
+    try:
+        await response.send(
+            b'{"links":' + encoding.as_bytes(encoding.dumps(links)) +
+            b',"data":[')
+        separator = b''
+        while chunk:
+            body = b','.join(
+                encoding.as_bytes(encoding.dumps(item))
+                for item in serializer.serialize_many(chunk))
+            await response.send(separator + body)
+            separator = b','
+            chunk = await _next_chunk(items, chunk_size)
+    except Exception as exp:
+        app_logger.exception(exp)
+        _abort_response(request)
+        return
+    await response.send(b']}')
+    await response.eof()
 
-    id = data.get('id')
-    data_type = data_types.get('root')
-    if id is not None:
-        id = str(id)
-        resp['data']['id'] = id
-    else:
-        # This is not a SanicExeption. Code should not be merged
-        # into production that causes this problem.
-        raise Exception("All API entities should have IDs")
-    if data_type is not None:
-        resp['data']['type'] = data_type.type
-        resp['links'] = {}
-        resp['links']['self'] = f'{data_type.collection_url}/{id}'
-
-    # First we triage the data dict items into
-    # their respective lists.
-    attributes = {}
-    singular_relationships = {}
-    list_relationships = {}
-    for item_key, item_val in data.items():
-        if item_key == 'id':
-            continue
-        elif isinstance(item_val, dict):
-            if item_key not in data_types:
-                attributes[item_key] = item_val
-            else:
-                singular_relationships[item_key] = item_val
-        elif isinstance(item_val, list):
-            if (len(item_val) == 0 or
-                    item_key not in data_types):
-                attributes[item_key] = item_val
-            else:
-                list_relationships[item_key] = item_val
-        elif not (isinstance(item_val, int) or
-                  isinstance(item_val, float) or
-                  isinstance(item_val, bool)):
-            attributes[item_key] = str(item_val)
-        else:
-            attributes[item_key] = item_val
-
-    # Then we add each item type into the response, running
-    # the function recursively on nested elements.
-    if len(attributes) > 0:
-        resp['data']['attributes'] = attributes
-    if (len(singular_relationships) > 0 or
-            len(list_relationships) > 0):
-        resp['data']['relationships'] = {}
-    for rel_key, rel_val in singular_relationships.items():
-        data_types['root'] = data_types[rel_key]
-        resp['data']['relationships'][rel_key] = jsonapi_response(rel_val, data_types)
-    for rel_key, rel_vals in list_relationships.items():
-        data_types['root'] = data_types[rel_key]
-        list_rel = {
-            'links': {
-                'self': data_types[rel_key].collection_url,
-            },
-            'data': [
-                jsonapi_response(rel_val, data_types)
-                for rel_val in rel_vals
-            ]
-        }
-        resp['data']['relationships'][rel_key] = list_rel
 
-    return resp
+def _abort_response(request):
+    # Closing the connection before the end of the (chunked) body tells
+    # the requestor that the response was cut short. Where the transport
+    # can't be closed (e.g. under ASGI), the body is still left as
+    # invalid JSON, as the data array is never closed.
+    close = getattr(request.transport, 'close', None)
+    if close is not None:
+        close()
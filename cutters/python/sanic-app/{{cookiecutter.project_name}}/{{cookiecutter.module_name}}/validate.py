@@ -1,10 +1,187 @@
-"""Utils for validating args to endpoints"""
+"""Utils for validating args to endpoints
+
+Endpoint args can be declared as Params, passed to the params decorator.
+It documents them in the API spec (as openapi.parameter does), and
+validates them before the handler runs, putting the parsed values in
+request.ctx.params so that the handler doesn't parse them again, e.g.
+
+    @blueprint.route('/people/<person_id>', methods=['GET'])
+    @openapi.summary('Get person')
+    @validate.params(
+        Param('person_id', str, 'path', parse=validate_uuid),
+        Param('limit', int, default=20, parse=parse_natural),
+    )
+    async def get_person(request, person_id):
+        limit = request.ctx.params['limit']
+
+The decorator needs to be the innermost one (directly above the
+handler), as the openapi decorators document the function they're
+given, which should be the validating wrapper.
+"""
+import re
 import uuid
+import functools
+from {{cookiecutter.module_name}}.openapi import openapi
+import {{cookiecutter.module_name}}.exceptions as expns
+
+_NATURAL_RE = re.compile(r'[0-9]+')
+# The canonical (and hex-only) forms of a UUID. Other forms uuid.UUID
+# accepts (e.g. with braces) fall back to it.
+_UUID_RE = re.compile(
+    r'[0-9a-fA-F]{8}(-?)[0-9a-fA-F]{4}\1[0-9a-fA-F]{4}\1'
+    r'[0-9a-fA-F]{4}\1[0-9a-fA-F]{12}')
 
 
-def validate_uuid(id: str, exception_cls: Exception = Exception):
+def validate_uuid(id: str, exception_cls: Exception = Exception) -> str:
+    """Checks that id is a UUID.
+
+    Returns:
+        The id, unchanged.
+    """
+    if isinstance(id, str) and _UUID_RE.fullmatch(id):
+        return id
     try:
         uuid.UUID(id)
-    except ValueError:
+    except (ValueError, TypeError, AttributeError):
         raise exception_cls(
             'ID length should be between 32 and 36 chars')
+    return id
+
+
+def parse_natural(value, exception_cls: Exception = Exception) -> int:
+    """Parses a natural number (including 0).
+
+    Strings must be plain digits, so that urls made from the parsed
+    value match the requested address (which matters for caching).
+    """
+    if isinstance(value, str):
+        if _NATURAL_RE.fullmatch(value):
+            return int(value)
+    elif isinstance(value, int) and not isinstance(value, bool) \
+            and value >= 0:
+        return value
+    raise exception_cls('Pagination arguments must be natural numbers')
+
+
+def parse_positive(value, exception_cls: Exception = Exception) -> int:
+    """Parses a natural number greater than 0."""
+    value = parse_natural(value, exception_cls)
+    if value < 1:
+        raise exception_cls('Limit must be greater than 0.')
+    return value
+
+
+# --------------------
+# Declarations
+# --------------------
+
+LOCATION_EXCEPTIONS = {
+    'query': expns.QueryException,
+    'path': expns.URLException,
+    'body': expns.BodyException,
+}
+
+
+class Param:
+    """An arg of an endpoint.
+
+    Args:
+        name:
+            The name of the arg.
+        type:
+            The type of the arg in the API spec.
+        location:
+            Where the arg is: 'query', 'path' or 'body' (a key of a JSON
+            object body). Body args aren't documented as parameters, as
+            the body is documented whole (see openapi.body).
+        required:
+            Whether a missing arg is an error. Path args always are.
+        default:
+            The value of a missing arg.
+        parse:
+            A function taking the arg and the exception class to raise
+            if it is invalid, and returning the parsed value.
+        exception_cls:
+            The class of error to raise for the arg. By default the
+            one for its location (e.g. QueryException for query args).
+        description:
+            A description of the arg for the API spec.
+    """
+
+    def __init__(self, name: str, type=str, location: str = 'query',
+                 required: bool = False, default=None, parse=None,
+                 exception_cls: Exception = None, description: str = None):
+        if location not in LOCATION_EXCEPTIONS:
+            raise ValueError(f'Unknown arg location "{location}"')
+        self.name = name
+        self.type = type
+        self.location = location
+        self.required = required or location == 'path'
+        self.default = default
+        self.parse = parse
+        self.exception_cls = exception_cls or LOCATION_EXCEPTIONS[location]
+        self.description = description
+
+    def document(self, handler):
+        """Adds the arg to the handler's API spec."""
+        if self.location == 'body':
+            return handler
+        kwargs = {'required': self.required}
+        if self.description is not None:
+            kwargs['description'] = self.description
+        return openapi.parameter(
+            self.name, self.type, self.location, **kwargs)(handler)
+
+    def compile(self):
+        """Makes a function getting the parsed arg from a request and
+        its path args, raising exception_cls if it is missing or invalid.
+        """
+        name, default, parse = self.name, self.default, self.parse
+        exception_cls = self.exception_cls
+        required = self.required
+
+        if self.location == 'query':
+            def get(request, path_args):
+                return request.args.get(name)
+        elif self.location == 'path':
+            def get(request, path_args):
+                return path_args.get(name)
+        else:
+            def get(request, path_args):
+                body = request.json
+                return body.get(name) if isinstance(body, dict) else None
+
+        def extract(request, path_args):
+            value = get(request, path_args)
+            if value is None:
+                if required:
+                    raise exception_cls(f'"{name}" arg not set')
+                return default
+            if parse is None:
+                return value
+            return parse(value, exception_cls)
+
+        return extract
+
+
+def params(*declarations: Param):
+    """Documents and validates the args of a handler (see Param).
+
+    The parsed args are put in request.ctx.params, by name.
+    """
+    extractors = tuple(
+        (param.name, param.compile()) for param in declarations)
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def validated(request, *args, **kwargs):
+            request.ctx.params = {
+                name: extract(request, kwargs)
+                for name, extract in extractors
+            }
+            return await handler(request, *args, **kwargs)
+
+        for param in declarations:
+            validated = param.document(validated)
+        return validated
+    return decorator